@@ -1,9 +1,16 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, SubscriptionPlan, VendorSubscription, VendorMenuItem, DailyMenu, UserSubscription, DailyOrder, DailyOrderItem, Payment, MealType
+from .models import CustomUser, SubscriptionPlan, VendorSubscription, VendorMenuItem, DailyMenu, UserSubscription, DailyOrder, DailyOrderItem, Payment, MealType, BulkOrder
+from .usage import stamp_delivery
 
 # Custom User Admin
 
+class OrderAdmin(admin.ModelAdmin):
+    # Settlement selects on delivered_time, so a change into delivered made here is stamped too
+    def save_model(self, request, obj, form, change):
+        stamp_delivery(obj, form.initial.get('status'))
+        super().save_model(request, obj, form, change)
+
 # Register all models
 admin.site.register(MealType)
 admin.site.register(CustomUser)
@@ -12,6 +19,7 @@ admin.site.register(VendorSubscription, )
 admin.site.register(VendorMenuItem, )
 admin.site.register(DailyMenu, )
 admin.site.register(UserSubscription, )
-admin.site.register(DailyOrder, )
+admin.site.register(DailyOrder, OrderAdmin)
+admin.site.register(BulkOrder, OrderAdmin)
 admin.site.register(DailyOrderItem, )
 admin.site.register(Payment, )
\ No newline at end of file
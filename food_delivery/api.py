@@ -0,0 +1,399 @@
+# food_delivery/api.py
+"""JSON API (v1) for mobile clients.
+
+The list endpoints read with ``values()`` projections, so no model instances
+are built, and every response is compact JSON carrying an ETag; clients that
+send it back in If-None-Match get an empty 304 when nothing changed. The only
+write is the delivery agent's bulk status update for their route manifest.
+
+Common query parameters:
+  ``fields=a,b``   only return these fields (see each endpoint's FIELDS)
+  ``limit=n``      page size for list endpoints (max MAX_LIMIT)
+  ``cursor=...``   opaque ``next`` value from the previous page
+"""
+import base64
+import json
+from datetime import date
+from functools import wraps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Prefetch, Q
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
+from django.views.decorators.http import require_http_methods
+from .history import forget_history_total
+from .models import DailyMenu, DailyOrder, DailyOrderItem, SubscriptionPlan, SubscriptionUsage, UserSubscription
+from .notifications import notify_status_change
+from .routers import read_from_replica
+from .sharding import fan_out, tenant_atomic, tenant_database, use_shard
+from .usage import set_status
+
+API_VERSION = 1
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def api_view(*user_types, methods=('GET', 'HEAD')):
+    """Session-authenticated JSON endpoint for the given user types. Errors come
+    back as ``{"error": ...}`` with a status code instead of login redirects."""
+    def decorator(view):
+        @require_http_methods(list(methods))
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                if not request.user.is_authenticated:
+                    raise ApiError(401, 'Authentication required.')
+                if user_types and request.user.user_type not in user_types:
+                    raise ApiError(403, 'Not available for this account type.')
+                return view(request, *args, **kwargs)
+            except ApiError as e:
+                return JsonResponse({'error': e.message}, status=e.status)
+        return wrapper
+    return decorator
+
+
+def json_response(request, payload, max_age=0):
+    """Compact JSON with an ETag; a matching If-None-Match gets a 304.
+
+    With the default ``max_age=0`` clients keep the data but revalidate every
+    time. A positive ``max_age`` also lets them reuse it for up to a day while
+    the server is unreachable (``stale-if-error``)."""
+    response = JsonResponse(payload, encoder=DjangoJSONEncoder, json_dumps_params={'separators': (',', ':')})
+    if max_age:
+        patch_cache_control(response, private=True, max_age=max_age, stale_if_error=86400)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    set_response_etag(response)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+def selected_fields(request, fields):
+    """Public field names requested through ``?fields=`` (all of ``fields`` by default)."""
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(fields)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = sorted(set(names) - set(fields))
+    if unknown:
+        raise ApiError(400, f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(fields)}.")
+    return names
+
+
+def fetch(queryset, fields, names, extra=()):
+    """``values()`` rows holding just the ORM paths behind ``names`` (plus ``extra``),
+    keyed by path."""
+    paths = {fields[name] for name in names if fields[name]} | set(extra)
+    return list(queryset.values(*paths))
+
+
+def present(rows, fields, names):
+    """Rename fetched rows to the public ``names``. Computed fields (those mapped
+    to None in ``fields``) must already be stored on the row under their name."""
+    return [{name: row[fields[name] or name] for name in names} for row in rows]
+
+
+# --- Keyset pagination ---
+
+def encode_cursor(values):
+    raw = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    try:
+        return json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+    except ValueError:
+        raise ApiError(400, 'Invalid cursor.')
+
+
+def page_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError(400, 'limit must be an integer.')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def paginate(request, queryset, ordering, fields, names, extra=()):
+    """One page of ``queryset`` in ascending ``ordering`` (ORM paths, the last one
+    unique), as fetch() rows. Returns (rows, next_cursor)."""
+    cursor = request.GET.get('cursor')
+    if cursor:
+        position = decode_cursor(cursor)
+        if not isinstance(position, list) or len(position) != len(ordering):
+            raise ApiError(400, 'Invalid cursor.')
+        # (a, b) > (x, y)  ==  a > x  OR  (a = x AND b > y)
+        after = Q()
+        for i, path in enumerate(ordering):
+            step = Q(**{f'{path}__gt': position[i]})
+            for earlier, value in zip(ordering[:i], position[:i]):
+                step &= Q(**{earlier: value})
+            after |= step
+        queryset = queryset.filter(after)
+
+    limit = page_limit(request)
+    rows = fetch(queryset.order_by(*ordering)[:limit + 1], fields, names, extra=(*ordering, *extra))
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([rows[-1][path] for path in ordering])
+
+
+def _items_by_order(order_ids):
+    items = {}
+    for row in DailyOrderItem.objects.filter(daily_order_id__in=order_ids).values_list(
+        'daily_order_id', 'menu_item_id', 'menu_item__name', 'quantity', 'price_at_order_time'
+    ):
+        order_id, item_id, name, quantity, price = row
+        items.setdefault(order_id, []).append({'id': item_id, 'name': name, 'quantity': quantity, 'price': price})
+    return items
+
+
+# --- Endpoints ---
+
+MENU_FIELDS = {'id': 'available_items__id', 'name': 'available_items__name',
+               'price': 'available_items__price', 'vendor': 'vendor__username'}
+
+
+@api_view()
+@read_from_replica
+def menu_today(request):
+    """Today's menu items grouped by meal type. ``?meal_type=<name>`` narrows it."""
+    names = selected_fields(request, MENU_FIELDS)
+    menus = DailyMenu.objects.filter(menu_date=date.today(), available_items__isnull=False)
+    if request.GET.get('meal_type'):
+        menus = menus.filter(meal_type__name__iexact=request.GET['meal_type'])
+    rows = fetch(menus.order_by('meal_type__name', 'available_items__name'), MENU_FIELDS, names,
+                 extra=['meal_type__name'])
+    meal_types = {}
+    for row, item in zip(rows, present(rows, MENU_FIELDS, names)):
+        meal_types.setdefault(row['meal_type__name'], []).append(item)
+    return json_response(request, {'version': API_VERSION, 'date': date.today(), 'meal_types': meal_types})
+
+
+ORDER_FIELDS = {'id': 'id', 'date': 'order_date', 'meal_type': 'meal_type__name',
+                'status': 'status', 'delivery_agent': 'delivery_agent__username', 'items': None}
+
+
+@api_view('resident')
+@read_from_replica
+def upcoming_orders(request):
+    names = selected_fields(request, ORDER_FIELDS)
+    orders = DailyOrder.objects.filter(user=request.user, order_date__gte=date.today()).exclude(status='cancelled')
+    rows, next_cursor = paginate(request, orders, ('order_date', 'id'), ORDER_FIELDS, names)
+    if 'items' in names:
+        items = _items_by_order([row['id'] for row in rows])
+        for row in rows:
+            row['items'] = items.get(row['id'], [])
+    return json_response(request, {'version': API_VERSION, 'results': present(rows, ORDER_FIELDS, names),
+                                   'next': next_cursor})
+
+
+SUBSCRIPTION_FIELDS = {'id': 'id', 'plan': 'plan__name', 'status': 'status', 'start_date': 'start_date',
+                       'end_date': 'end_date', 'is_paid': 'is_paid', 'live': None, 'meal_types': None, 'usage': None}
+
+
+@api_view('resident')
+@read_from_replica
+def subscription_status(request):
+    """The resident's subscriptions, oldest first; ``live`` marks the ones they can order on today
+    and ``usage`` has the meals ordered and left per meal type."""
+    names = selected_fields(request, SUBSCRIPTION_FIELDS)
+    subscriptions = UserSubscription.objects.filter(user=request.user)
+    rows, next_cursor = paginate(request, subscriptions, ('id',), SUBSCRIPTION_FIELDS, names, extra=['plan_id'])
+    if 'live' in names:
+        live = set(subscriptions.live().filter(id__in=[row['id'] for row in rows]).values_list('id', flat=True))
+        for row in rows:
+            row['live'] = row['id'] in live
+    if 'meal_types' in names:
+        meal_types = {}
+        for plan_id, meal_type in SubscriptionPlan.meal_types_included.through.objects.filter(
+            subscriptionplan_id__in={row['plan_id'] for row in rows}
+        ).order_by('mealtype__name').values_list('subscriptionplan_id', 'mealtype__name'):
+            meal_types.setdefault(plan_id, []).append(meal_type)
+        for row in rows:
+            row['meal_types'] = meal_types.get(row['plan_id'], [])
+    if 'usage' in names:
+        usage = {}
+        for subscription_id, meal_type, entitled, ordered, delivered in SubscriptionUsage.objects.filter(
+            subscription__in=[row['id'] for row in rows]
+        ).values_list('subscription_id', 'meal_type__name', 'entitled', 'ordered', 'delivered'):
+            usage.setdefault(subscription_id, {})[meal_type] = {
+                'entitled': entitled, 'ordered': ordered, 'delivered': delivered,
+                'remaining': max(entitled - ordered, 0),
+            }
+        for row in rows:
+            row['usage'] = usage.get(row['id'], {})
+    return json_response(request, {'version': API_VERSION, 'results': present(rows, SUBSCRIPTION_FIELDS, names),
+                                   'next': next_cursor})
+
+
+ASSIGNMENT_FIELDS = {'id': 'id', 'date': 'order_date', 'meal_type': 'meal_type__name', 'status': 'status',
+                     'resident': 'user__username', 'assigned_time': 'assigned_time'}
+
+
+@api_view('delivery_agent')
+@read_from_replica
+def agent_assignments(request):
+    """The agent's open assignments from today on."""
+    names = selected_fields(request, ASSIGNMENT_FIELDS)
+    orders = DailyOrder.objects.filter(
+        delivery_agent=request.user, order_date__gte=date.today()
+    ).exclude(status__in=['delivered', 'cancelled'])
+    rows, next_cursor = paginate(request, orders, ('order_date', 'id'), ASSIGNMENT_FIELDS, names)
+    return json_response(request, {'version': API_VERSION, 'results': present(rows, ASSIGNMENT_FIELDS, names),
+                                   'next': next_cursor})
+
+
+# --- Delivery agent route manifest ---
+
+MANIFEST_MAX_AGE = 60
+MAX_BULK_UPDATES = 500
+
+# target status -> (statuses it may follow, timestamp field stamped with now), in route order
+AGENT_TRANSITIONS = {
+    'out_for_delivery': (('submitted', 'prepared'), 'assigned_time'),
+    'reached_location': (('out_for_delivery',), None),
+    'delivered': (('out_for_delivery', 'reached_location'), 'delivered_time'),
+}
+
+
+def _parse_date(value):
+    if not value:
+        return date.today()
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ApiError(400, 'date must be YYYY-MM-DD.')
+
+
+@api_view('delivery_agent')
+@read_from_replica
+def agent_manifest(request):
+    """Everything the agent needs for a delivery run in one response: each
+    assigned order for ``?date=`` (default today) and optional ``?meal_type=``
+    with the resident's address, phone number and items. Built from one query
+    plus one prefetch per hostel database, and cacheable so the run works on a
+    patchy connection. Each order carries its ``database`` for status updates."""
+    day = _parse_date(request.GET.get('date'))
+
+    def assigned(alias):
+        orders = DailyOrder.objects.filter(
+            delivery_agent=request.user, order_date=day
+        ).exclude(status='cancelled').select_related('user', 'meal_type').only(
+            'id', 'status', 'order_date', 'assigned_time', 'delivered_time', 'meal_type__name',
+            'user__username', 'user__first_name', 'user__last_name', 'user__address', 'user__phone_number',
+        ).prefetch_related(Prefetch(
+            'items', queryset=DailyOrderItem.objects.select_related('menu_item').only(
+                'daily_order_id', 'quantity', 'menu_item__name'
+            ).order_by('menu_item__name')
+        )).order_by('meal_type__name', 'user__address', 'id')
+        if request.GET.get('meal_type'):
+            orders = orders.filter(meal_type__name__iexact=request.GET['meal_type'])
+        return list(orders)
+
+    orders = sorted(
+        (order for orders in fan_out(assigned).values() for order in orders),
+        key=lambda order: (order.meal_type.name, order.user.address or '', order.database, order.id),
+    )
+    stops = []
+    counts = {}
+    for order in orders:
+        counts[order.status] = counts.get(order.status, 0) + 1
+        stops.append({
+            'id': order.id,
+            'database': order.database,
+            'meal_type': order.meal_type.name,
+            'status': order.status,
+            'assigned_time': order.assigned_time,
+            'delivered_time': order.delivered_time,
+            'resident': {
+                'username': order.user.username,
+                'name': order.user.get_full_name(),
+                'address': order.user.address,
+                'phone_number': order.user.phone_number,
+            },
+            'items': [{'name': item.menu_item.name, 'quantity': item.quantity} for item in order.items.all()],
+        })
+    payload = {'version': API_VERSION, 'date': day, 'meal_type': request.GET.get('meal_type'),
+               'counts': counts, 'orders': stops}
+    return json_response(request, payload, max_age=MANIFEST_MAX_AGE)
+
+
+def _parse_updates(request):
+    try:
+        updates = json.loads(request.body).get('updates')
+    except (ValueError, AttributeError):
+        raise ApiError(400, 'Expected a JSON object with an "updates" list.')
+    if not isinstance(updates, list) or len(updates) > MAX_BULK_UPDATES:
+        raise ApiError(400, f'"updates" must be a list of at most {MAX_BULK_UPDATES} entries.')
+    wanted = {}
+    for update in updates:
+        if not (isinstance(update, dict) and isinstance(update.get('id'), int)
+                and update.get('status') in AGENT_TRANSITIONS):
+            raise ApiError(400, f'Each update needs an integer "id" and a status in {", ".join(AGENT_TRANSITIONS)}.')
+        database = update.get('database', DEFAULT_DB_ALIAS)
+        if not isinstance(database, str) or tenant_database(database) is None:
+            raise ApiError(400, f'Unknown database {database!r}.')
+        wanted.setdefault(database, {status: [] for status in AGENT_TRANSITIONS})[update['status']].append(update['id'])
+    return wanted
+
+
+@api_view('delivery_agent', methods=('POST',))
+def agent_bulk_status(request):
+    """Apply a batch of status changes queued by the agent, e.g. while offline.
+
+    Body: ``{"updates": [{"id": 12, "database": "default", "status":
+    "delivered"}, ...]}``, with ``database`` as given by the manifest (default
+    ``default``). Changes are applied per database in route order, so one
+    batch can take an order from accepted to delivered. Each target status is
+    one locked read and a conditional UPDATE that keeps the agent and
+    allowed-status checks (through ``usage.set_status``, which moves the
+    subscription ledger along), so a concurrent change such as a cancellation
+    is never overwritten. An update whose order is not the agent's, or whose
+    status cannot follow the order's current one, is skipped and reported with
+    that current status.
+    """
+    wanted = _parse_updates(request)
+    agent = request.user
+    now = timezone.now()
+    applied = []
+    skipped = []
+    for database, by_status in wanted.items():
+        with use_shard(database):
+            done = []
+            with tenant_atomic():
+                for status, (sources, stamp) in AGENT_TRANSITIONS.items():
+                    if not by_status[status]:
+                        continue
+                    eligible = DailyOrder.objects.filter(id__in=by_status[status], delivery_agent=agent, status__in=sources)
+                    ids = set_status(eligible, status, **({stamp: now} if stamp else {}))
+                    done.extend((order_id, status) for order_id in ids)
+            applied.extend((database, order_id, status) for order_id, status in done)
+
+            done = set(done)
+            missed = [(order_id, status) for status, ids in by_status.items() for order_id in ids
+                      if (order_id, status) not in done]
+            current = dict(DailyOrder.objects.filter(
+                id__in={order_id for order_id, _ in missed}, delivery_agent=agent
+            ).values_list('id', 'status')) if missed else {}
+            skipped.extend((database, order_id, status, current.get(order_id)) for order_id, status in missed)
+
+    for database, order_id, status in applied:
+        notify_status_change(order_id, status, database)
+    if any(status == 'delivered' for _, _, status in applied):
+        forget_history_total('delivery_agent', agent.id)
+
+    return JsonResponse({
+        'applied': [{'id': order_id, 'database': database, 'status': status} for database, order_id, status in applied],
+        'skipped': [{'id': order_id, 'database': database, 'status': status, 'current_status': current}
+                    for database, order_id, status, current in skipped],
+    })
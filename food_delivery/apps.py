@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FoodDeliveryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'food_delivery'
+
+    def ready(self):
+        from . import reference  # noqa: F401 - connects the reference registry's invalidation signals
@@ -0,0 +1,123 @@
+# food_delivery/archive.py
+"""Moves finished DailyOrders (and their items) into DailyOrderArchive and back.
+
+Both directions work in small chunks, each in its own transaction, so SQLite's
+single write lock is only held for a fraction of a second at a time and
+ordering keeps going while an archive run is in progress. The chunk size adapts
+so that each transaction stays under ``max_chunk_seconds``.
+"""
+import time
+from .models import DailyOrder, DailyOrderItem, DailyOrderArchive, VendorMenuItem
+from .sharding import tenant_atomic
+
+ARCHIVABLE_STATUSES = ('delivered', 'cancelled')
+MIN_CHUNK = 10
+MAX_CHUNK = 5000
+
+
+def archive_row(order):
+    """Build the DailyOrderArchive copy of ``order`` (items must be prefetched)."""
+    items = [
+        [item.menu_item_id, item.menu_item.name, item.quantity, str(item.price_at_order_time)]
+        for item in order.items.all()
+    ]
+    return DailyOrderArchive(
+        id=order.id,
+        user_id=order.user_id,
+        user_subscription_id=order.user_subscription_id,
+        order_date=order.order_date,
+        meal_type_id=order.meal_type_id,
+        status=order.status,
+        delivery_agent_id=order.delivery_agent_id,
+        assigned_time=order.assigned_time,
+        delivered_time=order.delivered_time,
+        ordered_at=order.ordered_at,
+        items=items,
+        total_cost=sum((item.quantity * item.price_at_order_time for item in order.items.all()), 0),
+    )
+
+
+def _next_chunk_size(chunk_size, elapsed, max_chunk_seconds):
+    if elapsed > max_chunk_seconds:
+        return max(MIN_CHUNK, chunk_size // 2)
+    if elapsed < max_chunk_seconds / 2:
+        return min(MAX_CHUNK, chunk_size * 2)
+    return chunk_size
+
+
+def _run_in_chunks(id_queryset, move_chunk, chunk_size, max_chunk_seconds, progress):
+    moved = 0
+    last_id = 0
+    while True:
+        ids = list(id_queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return moved
+        started = time.monotonic()
+        with tenant_atomic():
+            count = move_chunk(ids)
+        elapsed = time.monotonic() - started
+        moved += count
+        last_id = ids[-1]
+        if progress:
+            progress(count, elapsed)
+        chunk_size = _next_chunk_size(chunk_size, elapsed, max_chunk_seconds)
+
+
+def archive_orders(before_date, statuses=ARCHIVABLE_STATUSES, chunk_size=500, max_chunk_seconds=0.2, progress=None):
+    """Move orders in ``statuses`` dated before ``before_date`` into DailyOrderArchive.
+
+    ``progress(rows, seconds)`` is called after every committed chunk. Returns the
+    number of orders moved.
+    """
+    def move_chunk(ids):
+        # Re-check the status inside the transaction in case an order changed since listing
+        orders = list(
+            DailyOrder.objects.filter(id__in=ids, status__in=statuses).prefetch_related('items__menu_item')
+        )
+        DailyOrderArchive.objects.bulk_create([archive_row(order) for order in orders])
+        DailyOrder.objects.filter(id__in=[order.id for order in orders]).delete()
+        return len(orders)
+
+    candidates = DailyOrder.objects.filter(status__in=statuses, order_date__lt=before_date)
+    return _run_in_chunks(candidates, move_chunk, chunk_size, max_chunk_seconds, progress)
+
+
+def restore_orders(archived, chunk_size=500, max_chunk_seconds=0.2, progress=None):
+    """Move the DailyOrderArchive rows in queryset ``archived`` back into DailyOrder
+    with their original ids and items. Items whose menu item has since been deleted
+    cannot be restored and are dropped. Returns the number of orders restored."""
+    def move_chunk(ids):
+        rows = list(DailyOrderArchive.objects.filter(id__in=ids))
+        existing_items = set(VendorMenuItem.objects.filter(
+            id__in={item[0] for row in rows for item in row.items}
+        ).values_list('id', flat=True))
+
+        orders = DailyOrder.objects.bulk_create([
+            DailyOrder(
+                id=row.id,
+                user_id=row.user_id,
+                user_subscription_id=row.user_subscription_id,
+                order_date=row.order_date,
+                meal_type_id=row.meal_type_id,
+                status=row.status,
+                delivery_agent_id=row.delivery_agent_id,
+                assigned_time=row.assigned_time,
+                delivered_time=row.delivered_time,
+            )
+            for row in rows
+        ])
+        # bulk_create applies auto_now_add; put the original timestamps back
+        for order, row in zip(orders, rows):
+            order.ordered_at = row.ordered_at
+        DailyOrder.objects.bulk_update(orders, ['ordered_at'])
+
+        DailyOrderItem.objects.bulk_create([
+            DailyOrderItem(daily_order_id=row.id, menu_item_id=menu_item_id, quantity=quantity, price_at_order_time=price)
+            for row in rows
+            for menu_item_id, _name, quantity, price in row.items
+            if menu_item_id in existing_items
+        ])
+        DailyOrderArchive.objects.filter(id__in=ids).delete()
+        return len(rows)
+
+    return _run_in_chunks(archived, move_chunk, chunk_size, max_chunk_seconds, progress)
@@ -0,0 +1,178 @@
+# food_delivery/assets.py
+"""Fingerprinted, precompressed static files and the middleware that serves them.
+
+``collectstatic`` with CompressedManifestStaticFilesStorage copies every file to
+STATIC_ROOT under a content-hashed name (``dashboard.3f2a9c1b.css``) and writes
+``.gz`` (and ``.br`` when the ``brotli`` package is installed) next to each
+compressible file. AssetMiddleware then answers /static/ and /media/ requests
+before sessions or auth run: it picks the best precompressed variant for the
+request's Accept-Encoding, marks hashed names ``immutable`` for a year and
+answers conditional requests for media with 304s.
+"""
+import gzip
+import logging
+import mimetypes
+import os
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+try:
+    import brotli
+except ImportError:  # gzip alone is still a large win
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico'}
+# Below this the compressed copy saves less than the extra file costs
+MIN_COMPRESS_SIZE = 256
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# (Accept-Encoding token, file suffix), best first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compress_file(path):
+    """Write ``path``.gz (and ``path``.br) when they are meaningfully smaller.
+    Returns the suffixes written."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return []
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+
+    written = []
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(data) * 0.95:
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also precompresses what it collects.
+
+    Until collectstatic has written a manifest (development, tests) URLs fall
+    back to the plain file names instead of raising, as they do under DEBUG.
+    """
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        compressed = 0
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS and self.exists(name):
+                compressed += bool(compress_file(self.path(name)))
+        logger.info("Precompressed %d static files", compressed)
+
+
+class AssetMiddleware:
+    """Serves STATIC_ROOT (after collectstatic) and, with SERVE_MEDIA, MEDIA_ROOT.
+
+    Requests for files that do not exist fall through to the rest of the stack,
+    so in development runserver's own static handling keeps working.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.mounts = []
+        if settings.STATIC_ROOT:
+            self.mounts.append((settings.STATIC_URL, str(settings.STATIC_ROOT), True))
+        if getattr(settings, 'SERVE_MEDIA', False) and settings.MEDIA_ROOT:
+            self.mounts.append((settings.MEDIA_URL, str(settings.MEDIA_ROOT), False))
+        self._immutable_names = None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        # Only stat() and open() happen here; the body is streamed by the server
+        return self.serve(request) or await self.get_response(request)
+
+    def serve(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        for prefix, root, is_static in self.mounts:
+            if request.path_info.startswith(prefix):
+                name = request.path_info[len(prefix):]
+                try:
+                    path = safe_join(root, name)
+                except SuspiciousFileOperation:  # '..' escaping the root
+                    return None
+                if os.path.isfile(path):
+                    return self.file_response(request, name, path, is_static)
+                return None
+        return None
+
+    def file_response(self, request, name, path, is_static):
+        stat = os.stat(path)
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+            return HttpResponseNotModified()
+
+        content_type, _ = mimetypes.guess_type(name)
+        send_path, encoding = path, None
+        if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            accepted = _accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+            for token, suffix in ENCODINGS:
+                if token in accepted and os.path.isfile(path + suffix):
+                    send_path, encoding = path + suffix, token
+                    break
+
+        response = FileResponse(open(send_path, 'rb'), content_type=content_type or 'application/octet-stream')
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if any(os.path.isfile(path + suffix) for _, suffix in ENCODINGS):
+            patch_vary_headers(response, ('Accept-Encoding',))
+
+        if is_static and name in self.immutable_names():
+            response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        elif is_static:
+            response['Cache-Control'] = f'public, max-age={getattr(settings, "STATIC_MAX_AGE", 60)}'
+        else:
+            response['Cache-Control'] = f'public, max-age={getattr(settings, "MEDIA_MAX_AGE", 86400)}'
+        return response
+
+    def immutable_names(self):
+        # Hashed names change whenever content does, so they can be cached forever
+        if self._immutable_names is None:
+            hashed = getattr(staticfiles_storage, 'hashed_files', {})
+            self._immutable_names = set(hashed.values()) - set(hashed)
+        return self._immutable_names
+
+
+def _accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        token, _, params = part.partition(';')
+        params = params.replace(' ', '')
+        try:
+            quality = float(params[2:]) if params.startswith('q=') else 1.0
+        except ValueError:
+            quality = 1.0
+        if quality > 0:
+            accepted.add(token.strip().lower())
+    return accepted
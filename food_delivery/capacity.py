@@ -0,0 +1,133 @@
+# food_delivery/capacity.py
+"""Portion limits on daily menu items.
+
+An order takes portions with one conditional UPDATE per limited item,
+``remaining = remaining - n WHERE remaining >= n``. Each is a single atomic
+statement, so concurrent submitters can neither oversell an item nor overwrite
+each other's decrements, and nothing is read or locked beforehand. Edits and
+cancellations give portions back the same way.
+
+The remaining counts shown on the order page come from a short-lived cache per
+meal slot. They are advisory; the conditional UPDATE is what decides.
+
+Menus are global, so these rows always live in ``default``, while the orders
+taking portions live in their hostel's database. Callers writing an order
+wrap both in a ``default`` transaction around ``tenant_atomic()``.
+"""
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest, Least
+from .models import DailyMenuItem, DailyOrderItem
+from .sharding import gather
+
+REMAINING_CACHE_SECONDS = 10
+
+
+class SoldOut(Exception):
+    def __init__(self, menu_item_id):
+        super().__init__(f'Menu item {menu_item_id} does not have enough portions left')
+        self.menu_item_id = menu_item_id
+
+
+def _cache_key(order_date, meal_type_id):
+    return f'menu_remaining:{order_date.isoformat()}:{meal_type_id}'
+
+
+def remaining_counts(order_date, meal_type_id):
+    """{menu_item_id: portions left} for the slot's limited items."""
+    key = _cache_key(order_date, meal_type_id)
+    counts = cache.get(key)
+    if counts is None:
+        counts = dict(DailyMenuItem.objects.filter(
+            daily_menu__menu_date=order_date, daily_menu__meal_type_id=meal_type_id, capacity__isnull=False
+        ).values_list('menu_item_id', 'remaining'))
+        cache.set(key, counts, REMAINING_CACHE_SECONDS)
+    return counts
+
+
+def forget_remaining(order_date, meal_type_id):
+    # After commit, so a concurrent reader can't cache the pre-commit counts again
+    transaction.on_commit(lambda: cache.delete(_cache_key(order_date, meal_type_id)), using=DEFAULT_DB_ALIAS)
+
+
+def reserve(order_date, meal_type_id, wanted, previous=None):
+    """Change an order's hold on the slot's portions from ``previous`` to
+    ``wanted`` ({menu_item_id: quantity}); only the difference per item is
+    taken or given back. Raises SoldOut, having changed nothing, when an item
+    does not have enough portions left."""
+    previous = previous or {}
+    deltas = {
+        item_id: wanted.get(item_id, 0) - previous.get(item_id, 0)
+        for item_id in set(wanted) | set(previous)
+    }
+    deltas = {item_id: delta for item_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    limited = dict(DailyMenuItem.objects.filter(
+        daily_menu__menu_date=order_date, daily_menu__meal_type_id=meal_type_id,
+        menu_item_id__in=deltas, capacity__isnull=False
+    ).values_list('menu_item_id', 'id'))
+    if not limited:
+        return
+
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        # A fixed order keeps two submitters from waiting on each other's rows
+        for item_id in sorted(limited):
+            delta = deltas[item_id]
+            entry = DailyMenuItem.objects.filter(id=limited[item_id])
+            if delta > 0:
+                if not entry.filter(remaining__gte=delta).update(remaining=F('remaining') - delta):
+                    raise SoldOut(item_id)
+            else:
+                entry.update(remaining=Least(F('remaining') - delta, F('capacity')))
+    forget_remaining(order_date, meal_type_id)
+
+
+def release_order(order):
+    """Give back every portion held by ``order``, e.g. when it is cancelled."""
+    previous = dict(order.items.values_list('menu_item_id', 'quantity'))
+    reserve(order.order_date, order.meal_type_id, {}, previous)
+
+
+def move_portions(order, old_status):
+    """Release ``order``'s portions when it is cancelled and take them again when it
+    leaves cancelled; raises SoldOut if they have gone in the meantime."""
+    if (old_status == 'cancelled') == (order.status == 'cancelled'):
+        return
+    if order.status == 'cancelled':
+        release_order(order)
+    else:
+        wanted = dict(order.items.values_list('menu_item_id', 'quantity'))
+        reserve(order.order_date, order.meal_type_id, wanted, {})
+
+
+def set_capacities(daily_menu, capacities):
+    """Apply the vendor's limits ({menu_item_id: capacity or None}) to a menu.
+
+    A changed limit moves ``remaining`` by the same amount in one F() update,
+    so portions taken meanwhile are kept. A newly limited item starts from its
+    capacity minus what is already ordered in every hostel.
+    """
+    entries = {entry.menu_item_id: entry for entry in daily_menu.entries.all()}
+    ordered = None
+    for menu_item_id, capacity in capacities.items():
+        entry = entries.get(menu_item_id)
+        if entry is None or entry.capacity == capacity:
+            continue
+        rows = DailyMenuItem.objects.filter(id=entry.id)
+        if capacity is None:
+            rows.update(capacity=None, remaining=None)
+        elif entry.capacity is None:
+            if ordered is None:
+                ordered = {}
+                for counts in gather(lambda: DailyOrderItem.objects.filter(
+                    daily_order__order_date=daily_menu.menu_date, daily_order__meal_type=daily_menu.meal_type_id,
+                    menu_item__in=list(entries),
+                ).exclude(daily_order__status='cancelled').values_list('menu_item').annotate(Sum('quantity')).order_by()):
+                    for item_id, quantity in counts:
+                        ordered[item_id] = ordered.get(item_id, 0) + quantity
+            rows.update(capacity=capacity, remaining=max(capacity - ordered.get(menu_item_id, 0), 0))
+        else:
+            rows.update(capacity=capacity, remaining=Greatest(F('remaining') + (capacity - entry.capacity), 0))
+    forget_remaining(daily_menu.menu_date, daily_menu.meal_type_id)
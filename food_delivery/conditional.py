@@ -0,0 +1,91 @@
+# food_delivery/conditional.py
+"""Conditional GET for HTML pages built from ``updated_at``-stamped rows.
+
+A page declares what it shows as a list of ``freshness()`` results - one
+``MAX(updated_at), COUNT(*)`` query per queryset. From those, the user and the
+static asset version, ``conditional_page`` derives an ETag and Last-Modified
+and answers a matching If-None-Match/If-Modified-Since with a 304 before the
+view runs, so neither the page's own queries nor the template rendering happen.
+"""
+import hashlib
+from datetime import date
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.messages import get_messages
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def freshness(queryset, field='updated_at'):
+    """(latest ``field``, row count) of ``queryset`` in one query. The count
+    catches rows leaving the queryset, which a maximum alone would miss."""
+    result = queryset.order_by().aggregate(latest=Max(field), count=Count('pk'))
+    return result['latest'], result['count']
+
+
+def page_validators(request, states):
+    """ETag and Last-Modified (a timestamp) for ``request.path`` given its
+    ``freshness()`` states."""
+    user = request.user
+    # A new login (another user on the same browser, a rotated CSRF token) or a
+    # deploy with new asset names must never be answered from an old copy
+    key = repr((request.path, user.pk, user.last_login, date.today(),
+                getattr(staticfiles_storage, 'manifest_hash', ''), states))
+    etag = '"%s"' % hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+    stamps = [user.last_login] + [latest for latest, _ in states]
+    last_modified = max((stamp for stamp in stamps if stamp), default=None)
+    return etag, last_modified and int(last_modified.timestamp())
+
+
+def conditional_page(state_func):
+    """Let ``state_func(request, *args, **kwargs)`` decide whether the view runs.
+
+    It returns a list of ``freshness()`` results, or None when the page cannot
+    be validated that way (it then renders as usual). Pages carrying flash
+    messages are always rendered and never given validators, since the
+    messages are part of that one response only. Works for sync and async views.
+    """
+    def precheck(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+            return None, None
+        states = state_func(request, *args, **kwargs)
+        if states is None:
+            return None, None
+        etag, last_modified = page_validators(request, states)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            add_validators(response, etag, last_modified)
+        return response, (etag, last_modified)
+
+    def add_validators(response, etag, last_modified):
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+        # Browsers may keep the page but must check back every time
+        patch_cache_control(response, private=True, no_cache=True)
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def wrapper(request, *args, **kwargs):
+                response, validators = await sync_to_async(precheck)(request, *args, **kwargs)
+                if response is not None:
+                    return response
+                response = await view_func(request, *args, **kwargs)
+                if validators and response.status_code == 200:
+                    add_validators(response, *validators)
+                return response
+        else:
+            @wraps(view_func)
+            def wrapper(request, *args, **kwargs):
+                response, validators = precheck(request, *args, **kwargs)
+                if response is not None:
+                    return response
+                response = view_func(request, *args, **kwargs)
+                if validators and response.status_code == 200:
+                    add_validators(response, *validators)
+                return response
+        return wrapper
+    return decorator
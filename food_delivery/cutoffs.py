@@ -0,0 +1,137 @@
+# food_delivery/cutoffs.py
+"""Ordering cutoffs per meal slot and the demand snapshots frozen at them.
+
+A slot is one (delivery date, meal type). It closes at the meal type's
+``order_cutoff`` on the day ``cutoff_days_before`` days ahead of delivery;
+meal types without a cutoff stay open until their day has passed.
+
+Cutoffs are consulted on every order write, so they are read from the meal
+types held by the reference registry (food_delivery/reference.py) and
+``is_slot_open()`` normally answers without a query.
+
+Once a slot has closed, ``freeze_due_slots()`` (run by the freeze_demand
+command) writes a DemandSnapshot with per-vendor, per-item quantities of its
+daily and bulk orders. Snapshots are never updated, so production sheets show
+the numbers that were final at the cutoff. Slots that never close are never
+frozen; ``live_demand()`` gives the same numbers for them from the orders as
+they stand.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from .models import BulkOrder, BulkOrderItem, DailyOrder, DailyOrderItem, DemandSnapshot, DemandSnapshotItem
+from .reference import meal_types
+from .sharding import gather
+
+
+def meal_cutoffs():
+    """{meal_type_id: (cutoff_days_before, order_cutoff)} for meal types that close."""
+    return {
+        meal_type.id: (meal_type.cutoff_days_before, meal_type.order_cutoff)
+        for meal_type in meal_types() if meal_type.order_cutoff is not None
+    }
+
+
+def slot_closes_at(meal_type_id, order_date):
+    """When ordering for the slot closes, or None if the meal type has no cutoff."""
+    entry = meal_cutoffs().get(meal_type_id)
+    if entry is None:
+        return None
+    days_before, cutoff = entry
+    return timezone.make_aware(datetime.combine(order_date - timedelta(days=days_before), cutoff))
+
+
+def is_slot_open(meal_type_id, order_date, now=None):
+    now = now or timezone.now()
+    if order_date < timezone.localdate(now):
+        return False
+    closes_at = slot_closes_at(meal_type_id, order_date)
+    return closes_at is None or now < closes_at
+
+
+# (order model, item model, lookup from the item to its order)
+DEMAND_SOURCES = [
+    (DailyOrder, DailyOrderItem, 'daily_order'),
+    (BulkOrder, BulkOrderItem, 'bulk_order'),
+]
+
+
+def _slot_items(day, meal_type_ids, vendor_id):
+    """[(meal type id, menu item id, vendor id, order count, quantity)] of the
+    slots' daily and bulk orders in the current database."""
+    rows = []
+    for _, model, order in DEMAND_SOURCES:
+        items = model.objects.filter(**{
+            f'{order}__order_date': day, f'{order}__meal_type_id__in': meal_type_ids,
+        }).exclude(**{f'{order}__status': 'cancelled'})
+        if vendor_id is not None:
+            items = items.filter(menu_item__vendor_id=vendor_id)
+        rows.extend(items.values(f'{order}__meal_type_id', 'menu_item_id', 'menu_item__vendor_id').annotate(
+            order_count=Count(order, distinct=True),
+            quantity=Sum('quantity'),
+        ).values_list(
+            f'{order}__meal_type_id', 'menu_item_id', 'menu_item__vendor_id', 'order_count', 'quantity',
+        ).order_by())
+    return rows
+
+
+def live_demand(day, meal_type_ids, vendor_id=None):
+    """{meal_type_id: {menu_item_id: {'vendor_id', 'order_count', 'quantity'}}}
+    of the slots' orders that aren't cancelled, summed over every hostel
+    database. ``vendor_id`` limits it to that vendor's items."""
+    demand = defaultdict(dict)
+    for rows in gather(lambda: _slot_items(day, meal_type_ids, vendor_id)):
+        for meal_type_id, menu_item_id, vendor, order_count, quantity in rows:
+            item = demand[meal_type_id].setdefault(menu_item_id, {'vendor_id': vendor, 'order_count': 0, 'quantity': 0})
+            item['order_count'] += order_count
+            item['quantity'] += quantity
+    return demand
+
+
+def freeze_slot(day, meal_type_id):
+    """Write the demand snapshot for one slot. Returns it, or None if the slot
+    had already been frozen (by this or a concurrent run)."""
+    def slot_orders():
+        return sum(
+            orders.objects.filter(order_date=day, meal_type_id=meal_type_id).exclude(status='cancelled').count()
+            for orders, _, _ in DEMAND_SOURCES
+        )
+
+    order_count = sum(gather(slot_orders))
+    items = live_demand(day, [meal_type_id])[meal_type_id]
+
+    with transaction.atomic():
+        snapshot, created = DemandSnapshot.objects.get_or_create(
+            day=day, meal_type_id=meal_type_id, defaults={'order_count': order_count}
+        )
+        if not created:
+            return None
+        DemandSnapshotItem.objects.bulk_create([
+            DemandSnapshotItem(snapshot=snapshot, menu_item_id=menu_item_id, **item)
+            for menu_item_id, item in items.items()
+        ])
+    return snapshot
+
+
+def freeze_due_slots(now=None, days_back=1):
+    """Freeze every slot that has closed but has no snapshot yet, looking back
+    ``days_back`` days for slots a stopped worker may have missed. Returns the
+    snapshots written."""
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    frozen = []
+    for meal_type_id, (days_before, _) in meal_cutoffs().items():
+        # A slot closes days_before days ahead, so the latest one that can
+        # have closed by now is today + days_before
+        days = [today + timedelta(days=offset) for offset in range(-days_back, days_before + 1)]
+        done = set(DemandSnapshot.objects.filter(
+            meal_type_id=meal_type_id, day__in=days
+        ).values_list('day', flat=True))
+        for day in days:
+            if day not in done and slot_closes_at(meal_type_id, day) <= now:
+                snapshot = freeze_slot(day, meal_type_id)
+                if snapshot:
+                    frozen.append(snapshot)
+    return frozen
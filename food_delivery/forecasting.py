@@ -0,0 +1,144 @@
+# food_delivery/forecasting.py
+"""Demand forecasts for vendor prep quantities, fitted with NumPy.
+
+Every (vendor, menu item, meal type) with order history is one series. Daily
+quantities go into one ``series x day`` matrix and are divided by the number of
+subscribers covering that meal type on that day, so the model works with
+"portions per subscriber" and a growing or shrinking subscriber base scales
+the forecast rather than distorting it.
+
+Per series the rate is split into a weekday profile (mean rate on each weekday
+relative to the overall mean) and a level, the exponentially weighted moving
+average of the deseasonalised rates. A day's forecast is
+``level * weekday factor * subscribers expected that day``. All series are
+fitted together with array operations; there is no per-item Python loop.
+"""
+import math
+from datetime import date, timedelta
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from .models import DailyOrderArchive, DailyOrderItem, DemandForecast, UserSubscription, VendorMenuItem
+from .sharding import gather
+
+HISTORY_DAYS = 365
+HORIZON_DAYS = 7
+ALPHA = 0.3
+
+
+def load_history(since, until):
+    """Quantities ordered per series and day in [since, until) as arrays:
+    ``(keys, day_index, quantity)`` with keys rows of (vendor, menu item, meal type).
+    Archived orders count too, since archiving starts well within HISTORY_DAYS."""
+    history = DailyOrderItem.objects.filter(
+        daily_order__order_date__gte=since, daily_order__order_date__lt=until
+    ).exclude(daily_order__status='cancelled').values_list(
+        'menu_item__vendor', 'menu_item', 'daily_order__meal_type', 'daily_order__order_date'
+    ).annotate(quantity=Sum('quantity')).order_by()
+    archived = DailyOrderArchive.objects.filter(
+        order_date__gte=since, order_date__lt=until
+    ).exclude(status='cancelled').values_list('meal_type', 'order_date', 'items')
+    # Rows from every hostel database; a series found in several is summed by np.add.at later
+    results = gather(lambda: (list(history.all()), list(archived.all())))
+    rows = [row for live, _ in results for row in live]
+    # Archived items only name their menu item; items deleted since have no vendor and are left out
+    archived_rows = [
+        (menu_item_id, meal_type_id, day, quantity)
+        for _, old in results for meal_type_id, day, items in old for menu_item_id, _, quantity, _ in items
+    ]
+    vendors = dict(VendorMenuItem.objects.filter(
+        id__in={row[0] for row in archived_rows}
+    ).values_list('id', 'vendor_id'))
+    rows.extend(
+        (vendors[menu_item_id], menu_item_id, meal_type_id, day, quantity)
+        for menu_item_id, meal_type_id, day, quantity in archived_rows if menu_item_id in vendors
+    )
+    keys = np.array([row[:3] for row in rows], dtype=np.int64).reshape(-1, 3)
+    day_index = np.array([(row[3] - since).days for row in rows], dtype=np.int64)
+    quantity = np.array([row[4] for row in rows], dtype=np.float64)
+    return keys, day_index, quantity
+
+
+def load_subscribers(since, days, meal_type_ids):
+    """Subscribers covering each meal type on each of ``days`` days from
+    ``since``, as a ``len(meal_type_ids) x days`` array."""
+    position = {meal_type_id: i for i, meal_type_id in enumerate(meal_type_ids)}
+    until = since + timedelta(days=days - 1)
+    # +1 on the first covered day and -1 after the last; a cumulative sum gives the counts
+    changes = np.zeros((len(meal_type_ids), days + 1), dtype=np.int64)
+    subscriptions = UserSubscription.objects.exclude(status='cancelled').filter(
+        start_date__lte=until, end_date__gte=since, plan__meal_types_included__in=meal_type_ids
+    ).values_list('start_date', 'end_date', 'plan__meal_types_included')
+    for start, end, meal_type_id in (row for rows in gather(lambda: list(subscriptions.all())) for row in rows):
+        row = position[meal_type_id]
+        changes[row, max((start - since).days, 0)] += 1
+        changes[row, min((end - since).days, days - 1) + 1] -= 1
+    return np.cumsum(changes, axis=1)[:, :days]
+
+
+def fit(quantities, subscribers, first_weekday, horizon, alpha=ALPHA):
+    """Forecast every series at once.
+
+    ``quantities`` is ``series x history days``; ``subscribers`` is
+    ``series x (history + horizon) days`` (each series' meal type counts);
+    ``first_weekday`` is the weekday of history day 0. Returns a
+    ``series x horizon`` array of expected quantities.
+    """
+    series, days = quantities.shape
+    history_subscribers = subscribers[:, :days]
+    rate = np.divide(quantities, history_subscribers, out=np.zeros_like(quantities),
+                     where=history_subscribers > 0)
+
+    # Only days with subscribers, from each series' first order on, carry information
+    started = np.arange(days) >= np.argmax(quantities > 0, axis=1)[:, None]
+    valid = (history_subscribers > 0) & started
+
+    weekdays = (first_weekday + np.arange(days + horizon)) % 7
+    one_hot = np.eye(7)[weekdays[:days]]
+    weekday_sum = (rate * valid) @ one_hot
+    weekday_count = valid @ one_hot
+    weekday_mean = np.divide(weekday_sum, weekday_count, out=np.zeros_like(weekday_sum), where=weekday_count > 0)
+    overall = np.divide(weekday_sum.sum(axis=1), weekday_count.sum(axis=1),
+                        out=np.zeros(series), where=weekday_count.sum(axis=1) > 0)
+    seasonal = np.divide(weekday_mean, overall[:, None], out=np.ones_like(weekday_mean),
+                         where=(weekday_count > 0) & (overall[:, None] > 0))
+
+    daily_seasonal = seasonal[:, weekdays[:days]]
+    deseasonalised = np.divide(rate, daily_seasonal, out=np.zeros_like(rate), where=daily_seasonal > 0)
+    weights = (1 - alpha) ** np.arange(days - 1, -1, -1) * valid
+    weight_total = weights.sum(axis=1)
+    level = np.divide((deseasonalised * weights).sum(axis=1), weight_total,
+                      out=np.zeros(series), where=weight_total > 0)
+
+    return level[:, None] * seasonal[:, weekdays[days:]] * subscribers[:, days:]
+
+
+def refresh_forecasts(start=None, horizon=HORIZON_DAYS, history_days=HISTORY_DAYS, alpha=ALPHA):
+    """Replace the DemandForecast rows for ``horizon`` days from ``start``
+    (default tomorrow) with a fresh fit. Returns the number of rows written."""
+    start = start or date.today() + timedelta(days=1)
+    since = start - timedelta(days=history_days)
+    keys, day_index, quantity = load_history(since, start)
+
+    forecasts = []
+    if len(keys):
+        series_keys, series_index = np.unique(keys, axis=0, return_inverse=True)
+        quantities = np.zeros((len(series_keys), history_days))
+        np.add.at(quantities, (series_index.ravel(), day_index), quantity)
+
+        meal_type_ids, meal_index = np.unique(series_keys[:, 2], return_inverse=True)
+        subscribers = load_subscribers(since, history_days + horizon, meal_type_ids.tolist())[meal_index.ravel()]
+        expected = fit(quantities, subscribers, since.weekday(), horizon, alpha)
+
+        for (vendor_id, menu_item_id, meal_type_id), row in zip(series_keys.tolist(), expected.tolist()):
+            for offset, value in enumerate(row):
+                if value > 0:
+                    forecasts.append(DemandForecast(
+                        day=start + timedelta(days=offset), vendor_id=vendor_id, menu_item_id=menu_item_id,
+                        meal_type_id=meal_type_id, quantity=math.ceil(round(value, 6)),
+                    ))
+
+    with transaction.atomic():
+        DemandForecast.objects.filter(day__gte=start, day__lt=start + timedelta(days=horizon)).delete()
+        DemandForecast.objects.bulk_create(forecasts, batch_size=1000)
+    return len(forecasts)
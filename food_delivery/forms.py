@@ -4,6 +4,8 @@ from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from datetime import date, timedelta
 from .models import (CustomUser, SubscriptionPlan, UserSubscription, 
                      VendorMenuItem, DailyMenu, DailyOrder, DailyOrderItem, MealType, BulkOrder)
+from .cutoffs import is_slot_open
+from .reference import active_plans, cached_choices, meal_types
 
 # --- User Authentication Forms (No Changes) ---
 class CustomUserCreationForm(UserCreationForm):
@@ -53,6 +55,10 @@ class VendorSubscriptionForm(forms.Form):
         label="Select the subscription plans you want to provide meals for"
     )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        cached_choices(self.fields['subscription_plans'], active_plans)
+
 class VendorMenuItemForm(forms.ModelForm):
 
     subscription_plans = forms.ModelMultipleChoiceField(
@@ -109,10 +115,41 @@ class DailyMenuForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         if vendor:
             # Filter available items to only those belonging to this vendor
-            self.fields['available_items'].queryset = VendorMenuItem.objects.filter(vendor=vendor, is_available_globally=True)
+            self.fields['available_items'].queryset = VendorMenuItem.objects.filter(vendor=vendor, is_available_globally=True).select_related('vendor')
             
         # Limit meal_type choices to the ones defined in MealType model
         self.fields['meal_type'].queryset = MealType.objects.all()
+        cached_choices(self.fields['meal_type'], meal_types)
+
+    def stored_capacities(self):
+        """{menu_item_id: capacity} already saved on the menu being edited."""
+        if self.instance.pk is None:
+            return {}
+        return {entry.menu_item_id: entry.capacity for entry in self.instance.entries.all()}
+
+    def capacity_choices(self):
+        # Each item checkbox with the limit to show next to it: what was posted, else what is stored
+        stored = {} if self.is_bound else self.stored_capacities()
+        for checkbox in self['available_items']:
+            item_id = checkbox.data['value'].value
+            yield checkbox, self.data.get(f'capacity_{item_id}', '') if self.is_bound else stored.get(item_id)
+
+    def clean(self):
+        # Optional per-item portion limits come in as capacity_<item id>; blank means unlimited.
+        # An item without the field keeps its stored limit, so it is left out of capacities
+        cleaned_data = super().clean()
+        self.capacities = {}
+        for item in cleaned_data.get('available_items') or []:
+            if f'capacity_{item.id}' not in self.data:
+                continue
+            value = self.data[f'capacity_{item.id}'].strip()
+            if not value:
+                self.capacities[item.id] = None
+            elif value.isdigit():
+                self.capacities[item.id] = int(value)
+            else:
+                self.add_error('available_items', f"Capacity for {item.name} must be a whole number.")
+        return cleaned_data
 
 # --- 3. Resident Daily Order Selection Form ---
 # This form will be dynamically generated in the view based on DailyMenu items
@@ -209,6 +246,7 @@ class SubscriptionPlanForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['meal_types_included'].queryset = MealType.objects.all()
+        cached_choices(self.fields['meal_types_included'], meal_types)
         self.fields['meal_types_included'].help_text = ''
 
 
@@ -227,7 +265,7 @@ class DummyPaymentForm(forms.Form):
 class MealTypeForm(forms.ModelForm):
     class Meta:
         model = MealType
-        fields = ['name', 'description']
+        fields = ['name', 'description', 'order_cutoff', 'cutoff_days_before']
         widgets = {
             'name': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -238,6 +276,8 @@ class MealTypeForm(forms.ModelForm):
                 'rows': 3,
                 'placeholder': 'Optional description'
             }),
+            'order_cutoff': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}),
+            'cutoff_days_before': forms.NumberInput(attrs={'class': 'form-control', 'min': 0}),
         }
 
 class OrderStatusUpdateForm(forms.ModelForm):
@@ -266,6 +306,18 @@ class BulkOrderForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['meal_type'].queryset = MealType.objects.all()
+        cached_choices(self.fields['meal_type'], meal_types)
         # sort items by vendor then name for better UX
         self.fields['items'].queryset = VendorMenuItem.objects.all().order_by('vendor__username', 'name')
 
+    def clean(self):
+        # Same rules as a resident's order: no past dates, nothing after the slot's cutoff
+        cleaned_data = super().clean()
+        meal_type = cleaned_data.get('meal_type')
+        order_date = cleaned_data.get('order_date')
+        if order_date and order_date < date.today():
+            self.add_error('order_date', "Orders can't be placed for past dates.")
+        elif meal_type and order_date and not is_slot_open(meal_type.id, order_date):
+            self.add_error('meal_type', "Ordering for this meal has closed.")
+        return cleaned_data
+
@@ -0,0 +1,94 @@
+# food_delivery/history.py
+"""Keyset-paginated delivery history across DailyOrder and DailyOrderArchive.
+
+Pages are ordered newest first by (delivered_time, id). Both tables share one id
+space (archived rows keep their original id), so the same cursor works on each
+table: fetch a page from each and merge. No OFFSET scans, so page 50 costs the
+same as page 1.
+"""
+from datetime import datetime
+from django.core.cache import cache
+from django.db.models import F, Q
+from .models import DailyOrder, DailyOrderArchive
+
+PAGE_SIZE = 25
+TOTAL_CACHE_SECONDS = 300
+
+ORDERING = (F('delivered_time').desc(nulls_last=True), F('id').desc())
+
+
+def encode_cursor(order):
+    stamp = order.delivered_time.isoformat() if order.delivered_time else 'none'
+    return f'{stamp}_{order.id}'
+
+
+def decode_cursor(value):
+    """Returns (delivered_time, id), or None for a missing or malformed cursor."""
+    if not value:
+        return None
+    stamp, _, pk = value.rpartition('_')
+    try:
+        return (None if stamp == 'none' else datetime.fromisoformat(stamp)), int(pk)
+    except ValueError:
+        return None
+
+
+def _after(queryset, cursor):
+    delivered_time, pk = cursor
+    if delivered_time is None:
+        # Undated rows sort last; page through them by id alone
+        return queryset.filter(delivered_time__isnull=True, id__lt=pk)
+    return queryset.filter(
+        Q(delivered_time__lt=delivered_time)
+        | Q(delivered_time=delivered_time, id__lt=pk)
+        | Q(delivered_time__isnull=True)
+    )
+
+
+def _sort_key(order):
+    # Mirrors ORDERING: dated rows newest first, undated rows after them
+    stamp = order.delivered_time.timestamp() if order.delivered_time else float('-inf')
+    return (stamp, order.id)
+
+
+def _total_cache_key(owner_field, user_id):
+    return f'delivery_history_total:{owner_field}:{user_id}'
+
+
+def history_total(owner_field, user):
+    key = _total_cache_key(owner_field, user.id)
+    total = cache.get(key)
+    if total is None:
+        lookup = {owner_field: user, 'status': 'delivered'}
+        total = DailyOrder.objects.filter(**lookup).count() + DailyOrderArchive.objects.filter(**lookup).count()
+        cache.set(key, total, TOTAL_CACHE_SECONDS)
+    return total
+
+
+def forget_history_total(owner_field, user_id):
+    cache.delete(_total_cache_key(owner_field, user_id))
+
+
+async def aforget_history_total(owner_field, user_id):
+    await cache.adelete(_total_cache_key(owner_field, user_id))
+
+
+def delivery_history_page(owner_field, user, cursor=None, page_size=PAGE_SIZE):
+    """One page of delivered orders for ``user`` (owner_field is 'user' for
+    residents, 'delivery_agent' for agents).
+
+    Returns (orders, next_cursor, total); next_cursor is None on the last page.
+    """
+    position = decode_cursor(cursor)
+    lookup = {owner_field: user, 'status': 'delivered'}
+    rows = []
+    for model in (DailyOrder, DailyOrderArchive):
+        queryset = model.objects.filter(**lookup).select_related('user', 'meal_type', 'delivery_agent')
+        if position:
+            queryset = _after(queryset, position)
+        rows.extend(queryset.order_by(*ORDERING)[:page_size + 1])
+
+    rows.sort(key=_sort_key, reverse=True)
+    page = rows[:page_size]
+    next_cursor = encode_cursor(page[-1]) if len(rows) > page_size else None
+    return page, next_cursor, history_total(owner_field, user)
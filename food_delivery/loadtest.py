@@ -0,0 +1,308 @@
+# food_delivery/loadtest.py
+"""Meal-rush load generator for a running server (see the ``load_test`` command).
+
+Virtual users talk HTTP to ``runserver`` or an ASGI server on localhost over
+plain asyncio streams, so nothing beyond the standard library is needed. Each
+role runs a scripted loop until the deadline:
+
+- residents log in, open today's order page and (re)submit their order;
+- vendors list their orders, mark some prepared and assign an agent to them;
+- agents read their assignments from the JSON API, accept and complete them.
+
+Every request is timed under its method and the name of its URL pattern. Responses of 500
+whose body mentions "database is locked" (the SQLite busy timeout running out;
+only visible with DEBUG on) are counted apart from other errors, and so are
+requests the client gave up on.
+
+The accounts, plan and today's menu the scenarios need are created directly
+through the ORM by ``prepare()``, so the command has to use the same settings
+and database as the server under test.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+from django.contrib.auth.hashers import make_password
+from django.urls import reverse
+from .models import CustomUser, MealType, SubscriptionPlan, UserSubscription, VendorMenuItem, DailyMenu
+from .usage import open_ledger
+
+PREFIX = 'load_'
+LOCKED = b'database is locked'
+
+Cast = namedtuple('Cast', ['residents', 'vendors', 'agents', 'agent_ids', 'password', 'meal_type_id', 'menu_item_ids'])
+Response = namedtuple('Response', ['status', 'headers', 'body'])
+
+
+class RequestFailed(Exception):
+    """A request that could not be completed; already counted in the stats."""
+
+
+def prepare(residents, vendors, agents, password='load-test'):
+    """Create (or reuse) the load-test accounts: residents with a paid plan
+    covering a lunch slot without cutoff, vendors whose items are all on
+    today's menu, and delivery agents. Returns a Cast."""
+    today = date.today()
+    meal_type, _ = MealType.objects.get_or_create(name='Load Test Lunch')
+    plan, _ = SubscriptionPlan.objects.get_or_create(name='Load Test Plan', defaults={'duration_days': 30})
+    plan.meal_types_included.add(meal_type)
+    # One hash for everybody; hashing per account would dominate the set-up
+    hashed = make_password(password)
+
+    def accounts(kind, count, **fields):
+        users = []
+        for n in range(count):
+            user, _ = CustomUser.objects.update_or_create(
+                username=f'{PREFIX}{kind}_{n}',
+                defaults={'user_type': kind, 'password': hashed, 'is_active': True, **fields},
+            )
+            users.append(user)
+        return users
+
+    vendor_users = accounts('vendor', vendors)
+    agent_users = accounts('delivery_agent', agents)
+    resident_users = accounts('resident', residents, is_approved=True)
+
+    items = []
+    for vendor in vendor_users:
+        item, _ = VendorMenuItem.objects.get_or_create(
+            vendor=vendor, name='Load Test Thali', defaults={'price': Decimal('80.00'), 'meal_type': 'lunch'}
+        )
+        item.subscription_plans.add(plan)
+        items.append(item)
+    # Residents see the first menu of the slot, so one menu carries every vendor's item
+    menu, _ = DailyMenu.objects.get_or_create(vendor=vendor_users[0], menu_date=today, meal_type=meal_type)
+    menu.available_items.add(*items)
+
+    for resident in resident_users:
+        if not UserSubscription.objects.live().filter(user=resident, plan=plan, start_date__lte=today).exists():
+            subscription = UserSubscription.objects.create(
+                user=resident, plan=plan, is_paid=True, status='active',
+                start_date=today, end_date=today + timedelta(days=plan.duration_days - 1),
+            )
+            open_ledger(subscription)
+
+    return Cast(
+        residents=[user.username for user in resident_users],
+        vendors=[user.username for user in vendor_users],
+        agents=[user.username for user in agent_users],
+        agent_ids=[user.id for user in agent_users],
+        password=password,
+        meal_type_id=meal_type.id,
+        menu_item_ids=[item.id for item in items],
+    )
+
+
+# --- Measurements ---
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Stats:
+    """Latencies and outcomes per endpoint."""
+
+    def __init__(self):
+        self.endpoints = {}
+
+    def record(self, endpoint, seconds, outcome):
+        entry = self.endpoints.setdefault(endpoint, {'latencies': [], 'ok': 0, 'error': 0, 'locked': 0, 'timeout': 0})
+        entry['latencies'].append(seconds)
+        entry[outcome] += 1
+
+    def summary(self, elapsed):
+        """One row per endpoint (and a total), busiest first."""
+        rows = []
+        everything = []
+        for endpoint, entry in self.endpoints.items():
+            everything.extend(entry['latencies'])
+            rows.append(self._row(endpoint, entry, entry['latencies'], elapsed))
+        rows.sort(key=lambda row: -row['requests'])
+        totals = {key: sum(entry[key] for entry in self.endpoints.values()) for key in ('ok', 'error', 'locked', 'timeout')}
+        rows.append(self._row('TOTAL', totals, everything, elapsed))
+        return rows
+
+    @staticmethod
+    def _row(endpoint, counts, latencies, elapsed):
+        latencies = sorted(latencies)
+        requests = len(latencies)
+        return {
+            'endpoint': endpoint,
+            'requests': requests,
+            'throughput': requests / elapsed if elapsed else 0.0,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'error_rate': counts['error'] / requests if requests else 0.0,
+            'locked_rate': counts['locked'] / requests if requests else 0.0,
+            'timeout_rate': counts['timeout'] / requests if requests else 0.0,
+        }
+
+
+# --- HTTP ---
+
+class Session:
+    """One virtual user's cookie jar and requests. Uses a fresh HTTP/1.0
+    connection per request, so responses are never chunked and end at EOF."""
+
+    def __init__(self, base_url, stats, timeout):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.stats = stats
+        self.timeout = timeout
+        self.cookies = {}
+
+    async def request(self, endpoint, method, path, data=None):
+        endpoint = f'{method} {endpoint}'
+        body = urlencode(data).encode() if data is not None else b''
+        lines = [f'{method} {path} HTTP/1.0', f'Host: {self.host}:{self.port}', 'Connection: close']
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{name}={value}' for name, value in self.cookies.items()))
+        if method == 'POST':
+            lines += ['Content-Type: application/x-www-form-urlencoded', f'Content-Length: {len(body)}',
+                      f'X-CSRFToken: {self.cookies.get("csrftoken", "")}']
+        raw_request = ('\r\n'.join(lines) + '\r\n\r\n').encode() + body
+
+        started = time.perf_counter()
+        try:
+            raw = await asyncio.wait_for(self._exchange(raw_request), self.timeout)
+        except (OSError, asyncio.TimeoutError):
+            self.stats.record(endpoint, time.perf_counter() - started, 'timeout')
+            raise RequestFailed(endpoint)
+        response = self._parse(raw)
+        elapsed = time.perf_counter() - started
+
+        if response.status >= 500 and LOCKED in response.body:
+            outcome = 'locked'
+        elif response.status >= 400:
+            outcome = 'error'
+        else:
+            outcome = 'ok'
+        self.stats.record(endpoint, elapsed, outcome)
+        if outcome != 'ok':
+            raise RequestFailed(endpoint)
+        return response
+
+    async def _exchange(self, raw_request):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(raw_request)
+            await writer.drain()
+            return await reader.read()
+        finally:
+            writer.close()
+
+    def _parse(self, raw):
+        head, _, body = raw.partition(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        headers = []
+        for line in header_lines:
+            name, _, value = line.partition(':')
+            headers.append((name.strip().lower(), value.strip()))
+            if name.strip().lower() == 'set-cookie':
+                for morsel in SimpleCookie(value).values():
+                    if morsel.value:
+                        self.cookies[morsel.key] = morsel.value
+                    else:
+                        self.cookies.pop(morsel.key, None)
+        return Response(int(status_line.split()[1]), headers, body)
+
+    async def login(self, username, password):
+        await self.request('login', 'GET', reverse('login'))
+        response = await self.request('login', 'POST', reverse('login'), {'username': username, 'password': password})
+        if response.status != 302:
+            raise RequestFailed('login')
+
+
+# --- Scenarios ---
+
+ORDER_LINK = re.compile(rb'/vendor/orders/(\d+)/update/')
+
+
+async def resident(session, cast, username, deadline, think):
+    await session.login(username, cast.password)
+    page = reverse('resident_daily_order_select_with_date_meal', args=[cast.meal_type_id, date.today().isoformat()])
+    while time.monotonic() < deadline:
+        try:
+            await session.request('resident_daily_order_select', 'GET', page)
+            quantities = {f'quantity_{item_id}': random.randint(1, 2) for item_id in cast.menu_item_ids}
+            await session.request('resident_daily_order_select', 'POST', page, quantities)
+        except RequestFailed:
+            pass
+        await pause(think)
+
+
+async def vendor(session, cast, username, deadline, think):
+    await session.login(username, cast.password)
+    while time.monotonic() < deadline:
+        try:
+            listing = await session.request('vendor_orders_list', 'GET', reverse('vendor_orders_list'))
+            order_ids = sorted({int(order_id) for order_id in ORDER_LINK.findall(listing.body)})
+            for order_id in random.sample(order_ids, min(3, len(order_ids))):
+                await session.request('vendor_update_order_status', 'POST',
+                                      reverse('vendor_update_order_status', args=[order_id]),
+                                      {'status': 'prepared'})
+                await session.request('vendor_assign_delivery_agent', 'POST',
+                                      reverse('vendor_assign_delivery_agent', args=[order_id]),
+                                      {'delivery_agent': random.choice(cast.agent_ids)})
+        except RequestFailed:
+            pass
+        await pause(think)
+
+
+async def agent(session, cast, username, deadline, think):
+    await session.login(username, cast.password)
+    while time.monotonic() < deadline:
+        try:
+            response = await session.request('api_v1_agent_assignments', 'GET', reverse('api_v1_agent_assignments'))
+            for row in json.loads(response.body)['results'][:3]:
+                await session.request('delivery_accept_order', 'GET', reverse('delivery_accept_order', args=[row['id']]))
+                await session.request('delivery_complete_order', 'GET', reverse('delivery_complete_order', args=[row['id']]))
+        except RequestFailed:
+            pass
+        await pause(think)
+
+
+async def _virtual_user(scenario, start_in, base_url, stats, timeout, *args):
+    await asyncio.sleep(start_in)
+    try:
+        await scenario(Session(base_url, stats, timeout), *args)
+    except RequestFailed:
+        # Could not log in; the failure is in the stats
+        pass
+
+
+async def pause(think):
+    # Jittered, so virtual users don't move in lockstep
+    await asyncio.sleep(random.uniform(0.5, 1.5) * think)
+
+
+async def run(base_url, cast, duration, think=0.5, timeout=10.0, ramp_up=0.0):
+    """Run every account's scenario against ``base_url`` until ``duration``
+    seconds after the last one has started. Starts are spread evenly over
+    ``ramp_up`` seconds, since each login costs a password hash on the server.
+    Returns (Stats, seconds elapsed)."""
+    stats = Stats()
+    deadline = time.monotonic() + ramp_up + duration
+    users = (
+        [(resident, username) for username in cast.residents]
+        + [(vendor, username) for username in cast.vendors]
+        + [(agent, username) for username in cast.agents]
+    )
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _virtual_user(scenario, ramp_up * n / len(users), base_url, stats, timeout, cast, username, deadline, think)
+        for n, (scenario, username) in enumerate(users)
+    ))
+    return stats, time.perf_counter() - started
@@ -0,0 +1,133 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from food_delivery.models import CustomUser, MealType, DailyOrder
+
+class Command(BaseCommand):
+    help = ('Compares concurrent throughput of the delivery agent order list under the ASGI and WSGI handlers. '
+            'Runs in-process against a throwaway test database, so no server or existing data is needed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help='Requests per handler.')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight at once.')
+        parser.add_argument('--agents', type=int, default=20, help='Delivery agents sharing the load.')
+        parser.add_argument('--orders-per-agent', type=int, default=15)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            cookies = self.seed(options['agents'], options['orders_per_agent'])
+            path = reverse('delivery_agent_orders')
+            for name, runner in (('WSGI', self.run_wsgi), ('ASGI', self.run_asgi)):
+                latencies, elapsed, failures = runner(path, cookies, options['requests'], options['concurrency'])
+                self.report(name, latencies, elapsed, failures)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, agent_count, orders_per_agent):
+        meal_type = MealType.objects.create(name='Bench Lunch')
+        cookies = []
+        for a in range(agent_count):
+            agent = CustomUser.objects.create_user(username=f'bench_agent_{a}', password='x', user_type='delivery_agent')
+            residents = CustomUser.objects.bulk_create(
+                CustomUser(username=f'bench_resident_{a}_{r}', user_type='resident') for r in range(orders_per_agent)
+            )
+            DailyOrder.objects.bulk_create(
+                DailyOrder(user=resident, meal_type=meal_type, order_date=date.today(),
+                           status='prepared', delivery_agent=agent)
+                for resident in residents
+            )
+            client = Client()
+            client.force_login(agent)
+            cookies.append('; '.join(f'{k}={v.value}' for k, v in client.cookies.items()))
+        return cookies
+
+    def run_wsgi(self, path, cookies, total, concurrency):
+        app = get_wsgi_application()
+
+        def one(i):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'HTTP_HOST': 'testserver',
+                'HTTP_COOKIE': cookies[i % len(cookies)], 'wsgi.url_scheme': 'http',
+                'wsgi.input': _EmptyInput(), 'wsgi.errors': _EmptyInput(),
+            }
+            status = []
+            started = time.perf_counter()
+            body = b''.join(app(environ, lambda s, h: status.append(s)))
+            return time.perf_counter() - started, status[0].startswith('200') and bool(body)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, range(total)))
+        return [r[0] for r in results], time.perf_counter() - started, sum(1 for r in results if not r[1])
+
+    def run_asgi(self, path, cookies, total, concurrency):
+        app = get_asgi_application()
+
+        async def one(i, gate):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+                'query_string': b'', 'root_path': '', 'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+                'headers': [(b'host', b'testserver'), (b'cookie', cookies[i % len(cookies)].encode())],
+            }
+            messages = []
+            pending = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+            async def receive():
+                if pending:
+                    return pending.pop()
+                # Nothing more to send; Django cancels this wait once the response is done
+                await asyncio.Event().wait()
+
+            async def send(message):
+                messages.append(message)
+
+            async with gate:
+                started = time.perf_counter()
+                await app(scope, receive, send)
+                elapsed = time.perf_counter() - started
+            return elapsed, messages[0].get('status') == 200
+
+        async def run_all():
+            gate = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(one(i, gate) for i in range(total)))
+
+        started = time.perf_counter()
+        results = asyncio.run(run_all())
+        return [r[0] for r in results], time.perf_counter() - started, sum(1 for r in results if not r[1])
+
+    def report(self, name, latencies, elapsed, failures):
+        latencies = sorted(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f'{name}: {len(latencies) / elapsed:8.1f} req/s  '
+            f'p50 {statistics.median(latencies) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms  '
+            f'failures {failures}'
+        )
+
+
+class _EmptyInput:
+    def read(self, *args):
+        return b''
+
+    def readline(self, *args):
+        return b''
+
+    def write(self, *args):
+        pass
+
+    def flush(self):
+        pass
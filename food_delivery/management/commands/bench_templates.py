@@ -0,0 +1,93 @@
+import re
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from food_delivery.models import (
+    CustomUser, MealType, SubscriptionPlan, UserSubscription, VendorMenuItem, DailyOrder, DailyOrderItem
+)
+
+INLINE_CSS = re.compile(rb'style="[^"]*"|<style>.*?</style>', re.S)
+
+LOADERS = {
+    'uncached': ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader'],
+    'cached': [('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader',
+    ])],
+}
+
+class Command(BaseCommand):
+    help = ('Renders the largest pages (role dashboards and live tracking) with and without the cached template '
+            'loader and reports response size, inline CSS bytes and time per response. Runs against a throwaway '
+            'test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Responses timed per page and loader.')
+        parser.add_argument('--orders', type=int, default=10, help='Upcoming orders seeded for the resident.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            pages = self.seed(options['orders'])
+            for loader in ('uncached', 'cached'):
+                self.stdout.write(self.style.MIGRATE_HEADING(f'{loader} loader'))
+                with override_settings(TEMPLATES=self.templates_setting(LOADERS[loader])):
+                    for label, client, path in pages:
+                        self.bench(label, client, path, options['iterations'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def templates_setting(self, loaders):
+        config = dict(settings.TEMPLATES[0])
+        config['APP_DIRS'] = False
+        config['OPTIONS'] = {**config['OPTIONS'], 'loaders': loaders}
+        return [config]
+
+    def seed(self, order_count):
+        vendor = CustomUser.objects.create_user(username='bench_vendor', password='x', user_type='vendor')
+        agent = CustomUser.objects.create_user(username='bench_agent', password='x', user_type='delivery_agent')
+        resident = CustomUser.objects.create_user(username='bench_resident', password='x', user_type='resident')
+        meal_type = MealType.objects.create(name='Bench Lunch')
+        plan = SubscriptionPlan.objects.create(name='Bench Monthly', base_price=Decimal('1500.00'), duration_days=30)
+        UserSubscription.objects.create(user=resident, plan=plan, end_date=date.today() + timedelta(days=30))
+        items = VendorMenuItem.objects.bulk_create(
+            VendorMenuItem(vendor=vendor, name=f'Dish {i}', price=Decimal('40.00'), meal_type='lunch') for i in range(3)
+        )
+        orders = DailyOrder.objects.bulk_create(
+            DailyOrder(user=resident, meal_type=meal_type, order_date=date.today() + timedelta(days=d),
+                       status='submitted', delivery_agent=agent)
+            for d in range(order_count)
+        )
+        DailyOrderItem.objects.bulk_create(
+            DailyOrderItem(daily_order=order, menu_item=item, quantity=2, price_at_order_time=item.price)
+            for order in orders for item in items
+        )
+
+        pages = []
+        for user in (resident, vendor, agent):
+            client = Client()
+            client.force_login(user)
+            pages.append((f'{user.user_type} dashboard', client, reverse('dashboard')))
+        pages.append(('live tracking', pages[0][1], reverse('resident_live_tracking', args=[orders[0].id])))
+        return pages
+
+    def bench(self, label, client, path, iterations):
+        body = client.get(path).content  # warm up
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            client.get(path)
+            timings.append(time.perf_counter() - started)
+        inline = sum(len(m) for m in INLINE_CSS.findall(body))
+        self.stdout.write(
+            f'  {label:<24} {len(body):>7} bytes  inline css {inline:>6} bytes  '
+            f'{statistics.median(timings) * 1000:6.2f} ms/response'
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from food_delivery.models import CustomUser
+from food_delivery.sharding import create_shard, shard_alias
+
+class Command(BaseCommand):
+    help = ("Moves a hostel's subscriptions, orders and payments out of the shared database into its "
+            "own shard file under SHARD_DIR. Stop order writes for the hostel while it runs.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--warden', required=True, help='Username or id of the hostel warden.')
+
+    def handle(self, *args, **options):
+        key = options['warden']
+        wardens = CustomUser.objects.filter(user_type='warden')
+        warden = wardens.filter(id=key).first() if key.isdigit() else wardens.filter(username=key).first()
+        if warden is None:
+            raise CommandError(f'No warden "{key}".')
+        if shard_alias(warden.id):
+            raise CommandError(f'{warden.username} already has a shard.')
+
+        moved = create_shard(warden.id, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {sum(moved.values())} rows of {warden.username}\'s hostel into {shard_alias(warden.id)}.'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from datetime import date
+from food_delivery.models import UserSubscription
+from food_delivery.sharding import fan_out
+
+class Command(BaseCommand):
+    help = 'Marks active subscriptions whose end date has passed as expired. Safe to run repeatedly.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Treat this ISO date (YYYY-MM-DD) as today. Defaults to the current date.'
+        )
+
+    def handle(self, *args, **options):
+        on_date = date.fromisoformat(options['date']) if options['date'] else date.today()
+
+        expired_count = sum(fan_out(lambda alias: UserSubscription.objects.expire_lapsed(on_date)).values())
+
+        self.stdout.write(self.style.SUCCESS(f'Expired {expired_count} subscriptions ending before {on_date}.'))
@@ -0,0 +1,22 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand
+from food_delivery.forecasting import ALPHA, HISTORY_DAYS, HORIZON_DAYS, refresh_forecasts
+
+class Command(BaseCommand):
+    help = 'Refits the demand forecasts shown on vendor dashboards from order history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First ISO date (YYYY-MM-DD) to forecast. Defaults to tomorrow.')
+        parser.add_argument('--days', type=int, default=HORIZON_DAYS, help='Number of days to forecast.')
+        parser.add_argument('--history-days', type=int, default=HISTORY_DAYS, help='Days of order history to fit on.')
+        parser.add_argument('--alpha', type=float, default=ALPHA, help='Smoothing factor; higher reacts faster to recent days.')
+
+    def handle(self, *args, **options):
+        start = date.fromisoformat(options['start']) if options['start'] else None
+        began = time.perf_counter()
+        written = refresh_forecasts(start=start, horizon=options['days'],
+                                    history_days=options['history_days'], alpha=options['alpha'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} forecasts in {time.perf_counter() - began:.2f}s.'
+        ))
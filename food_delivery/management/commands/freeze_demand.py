@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from food_delivery.cutoffs import freeze_due_slots
+
+class Command(BaseCommand):
+    help = 'Freezes a demand snapshot for every meal slot whose ordering cutoff has passed. Safe to run repeatedly.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days-back',
+            type=int,
+            default=1,
+            help='Also freeze slots that closed up to this many days ago and were missed.'
+        )
+
+    def handle(self, *args, **options):
+        frozen = freeze_due_slots(days_back=options['days_back'])
+        for snapshot in frozen:
+            self.stdout.write(f'Froze {snapshot.meal_type} on {snapshot.day}: {snapshot.order_count} orders')
+        self.stdout.write(self.style.SUCCESS(f'Froze {len(frozen)} meal slots.'))
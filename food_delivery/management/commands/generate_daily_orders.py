@@ -1,42 +1,61 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 from datetime import date
-from food_delivery.models import Subscription, Order, CustomUser, MealPlan
+from food_delivery.models import UserSubscription, DailyOrder
+from food_delivery.sharding import fan_out
+from food_delivery.usage import recount
 
 class Command(BaseCommand):
     help = 'Generates daily orders for active and paid subscriptions.'
 
-    def handle(self, *args, **kwargs):
-        today = date.today()
-        self.stdout.write(self.style.SUCCESS(f'Starting daily order generation for {today}...'))
-
-        active_subscriptions = Subscription.objects.filter(
-            status='active',
-            is_paid=True,
-            start_date__lte=today,
-            end_date__gte=today
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Generate orders for this ISO date (YYYY-MM-DD). Defaults to today.'
+        )
+        parser.add_argument(
+            '--parallel',
+            type=int,
+            default=1,
+            help='Generate for this many hostel databases at once. Each shard has its own write lock.'
         )
 
-        generated_count = 0
-        for sub in active_subscriptions:
-            order_exists = Order.objects.filter(
-                user=sub.user,
-                meal_plan=sub.meal_plan,
-                order_date=today
-            ).exists()
-
-            if not order_exists:
-
-                Order.objects.create(
-                    user=sub.user,
-                    meal_plan=sub.meal_plan,
-                    order_date=today,
-                    status='pending',
-                )
-                generated_count += 1
-                self.stdout.write(self.style.SUCCESS(f'Generated order for {sub.user.username} - {sub.meal_plan.name}'))
-            else:
-                self.stdout.write(self.style.WARNING(f'Order already exists for {sub.user.username} - {sub.meal_plan.name} on {today}'))
-
-
-        self.stdout.write(self.style.SUCCESS(f'Finished. Generated {generated_count} new orders.'))
\ No newline at end of file
+    def handle(self, *args, **options):
+        today = date.fromisoformat(options['date']) if options['date'] else date.today()
+        self.stdout.write(self.style.SUCCESS(f'Starting daily order generation for {today}...'))
+
+        # Once per hostel database; the queries below only see that database's subscriptions
+        def generate(alias):
+            active_subscriptions = UserSubscription.objects.live(today).filter(
+                is_paid=True,
+                start_date__lte=today
+            ).select_related('user').prefetch_related('plan__meal_types_included')
+
+            # One query for everything that already exists, instead of one per subscription
+            existing = set(DailyOrder.objects.filter(order_date=today).values_list('user_id', 'meal_type_id'))
+
+            new_orders = []
+            for sub in active_subscriptions:
+                for meal_type in sub.plan.meal_types_included.all():
+                    key = (sub.user_id, meal_type.id)
+                    if key in existing:
+                        continue
+                    existing.add(key)
+                    new_orders.append(DailyOrder(
+                        user=sub.user,
+                        user_subscription=sub,
+                        order_date=today,
+                        meal_type=meal_type,
+                        status='pending',
+                    ))
+                    self.stdout.write(self.style.SUCCESS(f'Generated order for {sub.user.username} - {meal_type.name}'))
+
+            # ignore_conflicts keeps concurrent runs (e.g. two workers) from failing on unique_together
+            DailyOrder.objects.bulk_create(new_orders, batch_size=500, ignore_conflicts=True)
+            # Which rows were actually inserted isn't known, so recount the usage ledger of every
+            # subscription involved rather than adding one per generated order
+            if new_orders:
+                recount({order.user_subscription_id for order in new_orders})
+            return len(new_orders)
+
+        generated = sum(fan_out(generate, parallel=options['parallel']).values())
+        self.stdout.write(self.style.SUCCESS(f'Finished. Generated {generated} new orders.'))
@@ -0,0 +1,35 @@
+import os
+from datetime import date, datetime, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from food_delivery.statements import CHUNK_SIZE, generate
+
+class Command(BaseCommand):
+    help = ('Renders the monthly statement of every resident and a hostel summary for every warden as HTML files in '
+            'STATEMENT_DIR/<YYYY-MM>/, listed in manifest.jsonl there. Statements already in the manifest are '
+            'skipped, so an interrupted run can simply be started again.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Month as YYYY-MM. Defaults to last month.')
+        parser.add_argument('--out', default=settings.STATEMENT_DIR, help='Output directory (default: STATEMENT_DIR).')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Rendering processes; 1 renders in this process.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Residents read per batch of queries.')
+        parser.add_argument('--fresh', action='store_true',
+                            help='Ignore the existing manifest and render every statement again.')
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                month = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError(f'Invalid --month: {options["month"]} (expected YYYY-MM)')
+        else:
+            month = date.today().replace(day=1) - timedelta(days=1)
+
+        written, skipped = generate(month, options['out'], workers=max(options['workers'], 1),
+                                    chunk_size=max(options['chunk_size'], 1), fresh=options['fresh'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} statements for {month:%B %Y} to {os.path.join(options["out"], f"{month:%Y-%m}")}'
+            f'{f" ({skipped} already done)" if skipped else ""}.'
+        ))
@@ -0,0 +1,45 @@
+import asyncio
+from django.core.management.base import BaseCommand
+from food_delivery.loadtest import prepare, run
+
+class Command(BaseCommand):
+    help = ('Simulates a meal rush against a running server (runserver or an ASGI server on localhost): residents '
+            'ordering, vendors preparing and assigning, agents delivering. Reports throughput, latency percentiles and '
+            'error, lock and timeout rates per endpoint. Creates load_* accounts in this project\'s database, which '
+            'must be the one the server uses.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the server under test.')
+        parser.add_argument('--residents', type=int, default=50, help='Concurrent residents ordering.')
+        parser.add_argument('--vendors', type=int, default=2, help='Concurrent vendors (at least 1).')
+        parser.add_argument('--agents', type=int, default=10, help='Concurrent delivery agents.')
+        parser.add_argument('--ramp-up', type=float, default=10,
+                            help='Seconds over which the virtual users start (and log in).')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to keep the full load on.')
+        parser.add_argument('--think', type=float, default=0.5, help='Average pause in seconds between iterations.')
+        parser.add_argument('--timeout', type=float, default=10, help='Seconds before a request counts as timed out.')
+
+    def handle(self, *args, **options):
+        cast = prepare(options['residents'], max(options['vendors'], 1), options['agents'])
+        self.stdout.write(
+            f'{len(cast.residents)} residents, {len(cast.vendors)} vendors and {len(cast.agents)} agents '
+            f'against {options["url"]}, ramping up over {options["ramp_up"]:g}s, then {options["duration"]:g}s at full load...'
+        )
+        stats, elapsed = asyncio.run(run(options['url'], cast, options['duration'],
+                                         think=options['think'], timeout=options['timeout'],
+                                         ramp_up=options['ramp_up']))
+        self.report(stats.summary(elapsed))
+
+    def report(self, rows):
+        self.stdout.write(
+            f'{"endpoint":<40} {"requests":>8} {"req/s":>7} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+            f'{"errors":>7} {"locked":>7} {"timeout":>7}'
+        )
+        for row in rows:
+            line = (
+                f'{row["endpoint"]:<40} {row["requests"]:>8} {row["throughput"]:>7.1f} '
+                f'{row["p50"] * 1000:>8.1f} {row["p95"] * 1000:>8.1f} {row["p99"] * 1000:>8.1f} '
+                f'{row["error_rate"]:>7.1%} {row["locked_rate"]:>7.1%} {row["timeout_rate"]:>7.1%}'
+            )
+            failing = row['error_rate'] or row['locked_rate'] or row['timeout_rate']
+            self.stdout.write(self.style.WARNING(line) if failing else line)
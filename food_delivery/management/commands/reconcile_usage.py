@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from food_delivery.sharding import fan_out
+from food_delivery.usage import recount
+
+class Command(BaseCommand):
+    help = 'Recounts the subscription usage ledger from the live and archived orders and repairs any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--subscription',
+            type=int,
+            action='append',
+            help='Only reconcile this subscription id (repeatable, checked in every hostel database). Defaults to all subscriptions.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without changing the ledger.'
+        )
+
+    def handle(self, *args, **options):
+        results = fan_out(lambda alias: recount(options['subscription'], dry_run=options['dry_run']))
+        drift = [(alias, *row) for alias, rows in results.items() for row in rows]
+        for alias, subscription_id, meal_type_id, stored, counted in drift:
+            self.stdout.write(
+                f'{alias}: subscription {subscription_id}, meal type {meal_type_id}: '
+                f'ledger {stored or "missing"}, orders {counted} (entitled, ordered, delivered)'
+            )
+
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drift)} drifted ledger rows.'))
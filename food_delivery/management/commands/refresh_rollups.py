@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from food_delivery.rollups import refresh_order_rollups, refresh_payment_rollups
+
+class Command(BaseCommand):
+    help = 'Incrementally refreshes the order and payment rollup tables used by the admin analytics page.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Discard the high-water marks and rebuild both rollups from scratch.'
+        )
+
+    def handle(self, *args, **options):
+        order_days = refresh_order_rollups(rebuild=options['rebuild'])
+        payment_days = refresh_payment_rollups(rebuild=options['rebuild'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed order rollups for {order_days} days and payment rollups for {payment_days} days.'
+        ))
@@ -0,0 +1,74 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+# Spawned worker processes re-import this module before Django is set up, so
+# nothing at module level may import models; the task helpers load lazily.
+
+def _init_process():
+    import django
+    django.setup()
+
+def _execute(task_id, claimed_by):
+    from food_delivery.tasks import execute_task
+    return execute_task(task_id, claimed_by)
+
+class Command(BaseCommand):
+    help = 'Runs queued background tasks and the recurring TASK_SCHEDULE.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Tasks run at the same time.')
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread',
+                            help='Use threads (I/O-bound work) or processes (CPU-bound work).')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--no-schedule', action='store_true', help='Do not enqueue TASK_SCHEDULE entries.')
+        parser.add_argument('--once', action='store_true', help='Exit once no due tasks are left.')
+
+    def handle(self, *args, **options):
+        from food_delivery.tasks import HEARTBEAT_SECONDS, claim_tasks, enqueue_scheduled, heartbeat, requeue_stale, \
+            worker_id
+
+        concurrency = options['concurrency']
+        me = worker_id()
+        if options['mode'] == 'process':
+            executor = ProcessPoolExecutor(max_workers=concurrency, mp_context=multiprocessing.get_context('spawn'),
+                                           initializer=_init_process)
+        else:
+            executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='task')
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {me} started ({options["mode"]} x {concurrency}).'))
+        running = {}  # future -> task id
+        done_count = 0
+        last_beat = time.monotonic()
+        try:
+            while True:
+                if not options['no_schedule']:
+                    enqueue_scheduled()
+                requeue_stale()
+                if running and time.monotonic() - last_beat >= HEARTBEAT_SECONDS:
+                    heartbeat(list(running.values()), me)
+                    last_beat = time.monotonic()
+
+                free = concurrency - len(running)
+                claimed = claim_tasks(free, me) if free else []
+                close_old_connections()
+                running.update((executor.submit(_execute, task_id, me), task_id) for task_id in claimed)
+
+                if running:
+                    finished, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    done_count += len(finished)
+                    for future in finished:
+                        del running[future]
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping; waiting for running tasks to finish...')
+        finally:
+            executor.shutdown(wait=True)
+            done_count += len(running)
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {me} ran {done_count} tasks.'))
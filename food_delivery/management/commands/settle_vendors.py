@@ -0,0 +1,35 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from food_delivery.settlements import settle
+
+class Command(BaseCommand):
+    help = ('Settles vendor payouts for the order items delivered since the last settlement batch, daily and bulk, '
+            'and stores them as a new immutable batch.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--until',
+            help='End the batch at this ISO date/time instead of now (never later than now).'
+        )
+
+    def handle(self, *args, **options):
+        until = None
+        if options['until']:
+            try:
+                until = datetime.fromisoformat(options['until'])
+            except ValueError:
+                raise CommandError(f'Invalid --until: {options["until"]}')
+            if timezone.is_naive(until):
+                until = timezone.make_aware(until)
+
+        batch = settle(until)
+        if batch is None:
+            self.stdout.write('Nothing to settle: the last batch already ends there.')
+            return
+        for settlement in batch.settlements.select_related('vendor').order_by('vendor__username'):
+            self.stdout.write(
+                f'{settlement.vendor.username}: {settlement.daily_order_count} daily and {settlement.bulk_order_count} '
+                f'bulk orders, {settlement.item_quantity} items, {settlement.amount}'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Settled up to {batch.period_end:%Y-%m-%d %H:%M}.'))
@@ -0,0 +1,31 @@
+import os
+import sqlite3
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from food_delivery.routers import REPLICA_ALIAS
+
+class Command(BaseCommand):
+    help = 'Copies the default SQLite database to the local read replica file (development stand-in for real replication).'
+
+    def handle(self, *args, **options):
+        source = connections['default']
+        if source.vendor != 'sqlite':
+            raise CommandError('sync_replica only copies SQLite databases; use real replication for other backends.')
+
+        replica = settings.DATABASES.get(REPLICA_ALIAS)
+        target = str(replica['NAME'] if replica else settings.REPLICA_SQLITE_PATH)
+        tmp_target = f'{target}.tmp'
+
+        started = time.monotonic()
+        source.ensure_connection()
+        # The backup API takes a consistent snapshot even while the app keeps writing
+        with sqlite3.connect(tmp_target) as destination:
+            source.connection.backup(destination)
+        destination.close()
+        # Swap the file atomically; open replica connections keep reading the old copy
+        os.replace(tmp_target, target)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'Copied default database to {target} in {elapsed:.2f}s.'))
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0009_alter_dailyorder_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['user', 'end_date'], name='usersub_live_user_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['end_date'], name='usersub_live_end_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:12
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0012_backgroundtask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyOrderArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('order_date', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('submitted', 'Submitted'), ('prepared', 'Prepared'), ('out_for_delivery', 'Out for Delivery'), ('reached_location', 'Reached Location'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('assigned_time', models.DateTimeField(blank=True, null=True)),
+                ('delivered_time', models.DateTimeField(blank=True, null=True)),
+                ('ordered_at', models.DateTimeField()),
+                ('items', models.JSONField(default=list)),
+                ('total_cost', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-order_date', 'meal_type'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='dailyorder',
+            index=models.Index(condition=models.Q(('status', 'delivered')), fields=['user', 'delivered_time', 'id'], name='dailyorder_user_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyorder',
+            index=models.Index(condition=models.Q(('status', 'delivered')), fields=['delivery_agent', 'delivered_time', 'id'], name='dailyorder_agent_history_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyorderarchive',
+            name='delivery_agent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_assigned_daily_orders', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='dailyorderarchive',
+            name='meal_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='food_delivery.mealtype'),
+        ),
+        migrations.AddField(
+            model_name='dailyorderarchive',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_daily_orders', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='dailyorderarchive',
+            name='user_subscription',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='food_delivery.usersubscription'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyorderarchive',
+            index=models.Index(condition=models.Q(('status', 'delivered')), fields=['user', 'delivered_time', 'id'], name='archive_user_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyorderarchive',
+            index=models.Index(condition=models.Q(('status', 'delivered')), fields=['delivery_agent', 'delivered_time', 'id'], name='archive_agent_history_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0014_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mealtype',
+            name='cutoff_days_before',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Days before the delivery day on which the cutoff falls (e.g. 1 for breakfast closing the evening before).'),
+        ),
+        migrations.AddField(
+            model_name='mealtype',
+            name='order_cutoff',
+            field=models.TimeField(blank=True, help_text='Orders for this meal close at this time. Leave empty to keep them open.', null=True),
+        ),
+        migrations.CreateModel(
+            name='DemandSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('frozen_at', models.DateTimeField(auto_now_add=True)),
+                ('meal_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='food_delivery.mealtype')),
+            ],
+            options={
+                'ordering': ['-day', 'meal_type'],
+                'unique_together': {('day', 'meal_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DemandSnapshotItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='food_delivery.vendormenuitem')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='food_delivery.demandsnapshot')),
+                ('vendor', models.ForeignKey(limit_choices_to={'user_type': 'vendor'}, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['vendor', 'snapshot'], name='demanditem_vendor_idx')],
+                'unique_together': {('snapshot', 'menu_item')},
+            },
+        ),
+    ]
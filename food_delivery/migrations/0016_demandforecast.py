@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0015_meal_cutoffs_demand_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0, help_text='Forecast portions, rounded up.')),
+                ('generated_at', models.DateTimeField(auto_now_add=True)),
+                ('meal_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='food_delivery.mealtype')),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='food_delivery.vendormenuitem')),
+                ('vendor', models.ForeignKey(limit_choices_to={'user_type': 'vendor'}, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['vendor', 'day'], name='forecast_vendor_day_idx')],
+                'unique_together': {('day', 'menu_item', 'meal_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0016_demandforecast'),
+    ]
+
+    operations = [
+        # DailyMenuItem takes over the existing automatic through table, so only
+        # the migration state changes here; the table keeps its rows.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='DailyMenuItem',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('daily_menu', models.ForeignKey(db_column='dailymenu_id', on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='food_delivery.dailymenu')),
+                        ('menu_item', models.ForeignKey(db_column='vendormenuitem_id', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='food_delivery.vendormenuitem')),
+                    ],
+                    options={
+                        'db_table': 'food_delivery_dailymenu_available_items',
+                        'unique_together': {('daily_menu', 'menu_item')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='dailymenu',
+                    name='available_items',
+                    field=models.ManyToManyField(help_text='Items available on this menu', through='food_delivery.DailyMenuItem', to='food_delivery.vendormenuitem'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='dailymenuitem',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='Portions the vendor can make. Leave empty for no limit.', null=True),
+        ),
+        migrations.AddField(
+            model_name='dailymenuitem',
+            name='remaining',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0017_dailymenuitem_capacity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubscriptionUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entitled', models.PositiveIntegerField(default=0)),
+                ('ordered', models.PositiveIntegerField(default=0, help_text='Orders that are not cancelled, delivered ones included.')),
+                ('delivered', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('meal_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='food_delivery.mealtype')),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage', to='food_delivery.usersubscription')),
+            ],
+            options={
+                'unique_together': {('subscription', 'meal_type')},
+            },
+        ),
+    ]
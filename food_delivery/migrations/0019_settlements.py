@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:27
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0018_subscriptionusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SettlementBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField(blank=True, help_text='Empty for the first batch, which covers everything before period_end.', null=True)),
+                ('period_end', models.DateTimeField(unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'settlement batches',
+                'ordering': ['-period_end'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SettlementLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('daily', 'Daily order'), ('bulk', 'Bulk order')], max_length=5)),
+                ('database', models.CharField(max_length=50)),
+                ('order_id', models.BigIntegerField()),
+                ('delivered_time', models.DateTimeField()),
+                ('item_name', models.CharField(max_length=150)),
+                ('quantity', models.PositiveIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='lines', to='food_delivery.settlementbatch')),
+                ('menu_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='food_delivery.vendormenuitem')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['batch', 'vendor', 'id'], name='settlementline_export_idx')],
+                'unique_together': {('source', 'database', 'order_id', 'menu_item')},
+            },
+        ),
+        migrations.CreateModel(
+            name='VendorSettlement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('daily_order_count', models.PositiveIntegerField(default=0)),
+                ('bulk_order_count', models.PositiveIntegerField(default=0)),
+                ('item_quantity', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='settlements', to='food_delivery.settlementbatch')),
+                ('vendor', models.ForeignKey(limit_choices_to={'user_type': 'vendor'}, on_delete=django.db.models.deletion.PROTECT, related_name='settlements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-batch', 'vendor'],
+                'unique_together': {('batch', 'vendor')},
+            },
+        ),
+    ]
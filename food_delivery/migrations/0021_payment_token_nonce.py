@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0020_rollup_order_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='token_nonce',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_delivery', '0021_payment_token_nonce'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='settlementline',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='settlementline',
+            name='item_id',
+            field=models.BigIntegerField(blank=True, help_text='The DailyOrderItem or BulkOrderItem paid for. Empty only on lines written before it was recorded.', null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='settlementline',
+            unique_together={('source', 'database', 'item_id')},
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 from datetime import date
 from decimal import Decimal
 
@@ -23,6 +24,8 @@ class CustomUser(AbstractUser):
 class MealType(models.Model):
     name = models.CharField(max_length=50, unique=True)
     description = models.TextField(blank=True)
+    order_cutoff = models.TimeField(null=True, blank=True, help_text="Orders for this meal close at this time. Leave empty to keep them open.")
+    cutoff_days_before = models.PositiveSmallIntegerField(default=0, help_text="Days before the delivery day on which the cutoff falls (e.g. 1 for breakfast closing the evening before).")
 
     def __str__(self):
         return self.name
@@ -80,6 +83,34 @@ class VendorMenuItem(models.Model):
         return f"{self.name} by {self.vendor.username} ({self.meal_type})"
 
 
+class TimestampedQuerySet(models.QuerySet):
+    """Keeps ``updated_at`` current on the write paths that bypass ``save()``.
+
+    ``auto_now`` only runs in ``save()``; ``update()`` (and with it ``aupdate()``
+    and ``bulk_update()``, which are built on it) stamps the rows here instead.
+    """
+
+    def update(self, **kwargs):
+        kwargs.setdefault('updated_at', timezone.now())
+        return super().update(**kwargs)
+
+
+class UserSubscriptionQuerySet(TimestampedQuerySet):
+    def live(self, on_date=None):
+        """Active subscriptions whose end date has not passed yet."""
+        on_date = on_date or date.today()
+        return self.filter(status='active', end_date__gte=on_date)
+
+    def expire_lapsed(self, on_date=None):
+        """Flip every active subscription that ended before ``on_date`` to expired.
+
+        Runs as a single UPDATE, so it is cheap to repeat and a second run is a no-op.
+        Returns the number of rows changed.
+        """
+        on_date = on_date or date.today()
+        return self.filter(status='active', end_date__lt=on_date).update(status='expired')
+
+
 class UserSubscription(models.Model):
     STATUS_CHOICES = (
         ("active", "Active"),
@@ -96,15 +127,62 @@ class UserSubscription(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="active")
     is_paid = models.BooleanField(default=False)
     subscribed_on = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = UserSubscriptionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Only the live rows are indexed; expired/cancelled history stays out of it.
+            models.Index(
+                fields=['user', 'end_date'],
+                condition=models.Q(status='active'),
+                name='usersub_live_user_end_idx',
+            ),
+            models.Index(
+                fields=['end_date'],
+                condition=models.Q(status='active'),
+                name='usersub_live_end_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username}'s {self.plan.name} subscription ({self.status})"
 
+class SubscriptionUsage(models.Model):
+    """Meals of one type ordered and delivered against a subscription.
+
+    Kept in step with DailyOrder by food_delivery/usage.py inside the same
+    transaction as each order write; ``reconcile_usage`` recounts it from the
+    order tables. ``entitled`` is one meal per day of the subscription.
+    """
+    subscription = models.ForeignKey(UserSubscription, on_delete=models.CASCADE, related_name='usage')
+    meal_type = models.ForeignKey(MealType, on_delete=models.CASCADE, related_name='+')
+    entitled = models.PositiveIntegerField(default=0)
+    ordered = models.PositiveIntegerField(default=0, help_text="Orders that are not cancelled, delivered ones included.")
+    delivered = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TimestampedQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('subscription', 'meal_type')
+
+    def __str__(self):
+        return f"{self.ordered}/{self.entitled} {self.meal_type_id} meals on subscription {self.subscription_id}"
+
+    @property
+    def remaining(self):
+        return max(self.entitled - self.ordered, 0)
+
 class DailyMenu(models.Model):
     vendor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, limit_choices_to={'user_type': 'vendor'}, related_name='daily_menus')
     menu_date = models.DateField(default=date.today)
     meal_type = models.ForeignKey(MealType, on_delete=models.CASCADE)
-    available_items = models.ManyToManyField(VendorMenuItem, help_text="Items available on this menu")
+    available_items = models.ManyToManyField(VendorMenuItem, through='DailyMenuItem', help_text="Items available on this menu")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = TimestampedQuerySet.as_manager()
 
     class Meta:
         unique_together = ('vendor', 'menu_date', 'meal_type')
@@ -113,6 +191,26 @@ class DailyMenu(models.Model):
     def __str__(self):
         return f"{self.vendor.username}'s {self.meal_type.name} Menu for {self.menu_date}"
 
+
+class DailyMenuItem(models.Model):
+    """An item on a daily menu, optionally limited to ``capacity`` portions.
+
+    ``remaining`` is only changed through the conditional F() updates in
+    food_delivery/capacity.py. Both fields are null for unlimited items.
+    """
+    # Keeps the table and columns of the automatic through table it replaced
+    daily_menu = models.ForeignKey(DailyMenu, on_delete=models.CASCADE, db_column='dailymenu_id', related_name='entries')
+    menu_item = models.ForeignKey(VendorMenuItem, on_delete=models.CASCADE, db_column='vendormenuitem_id', related_name='+')
+    capacity = models.PositiveIntegerField(null=True, blank=True, help_text="Portions the vendor can make. Leave empty for no limit.")
+    remaining = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'food_delivery_dailymenu_available_items'
+        unique_together = ('daily_menu', 'menu_item')
+
+    def __str__(self):
+        return f"{self.menu_item_id} on menu {self.daily_menu_id} ({self.remaining}/{self.capacity})"
+
 class DailyOrder(models.Model):
     ORDER_STATUS_CHOICES = (
         ("pending", "Pending"),
@@ -135,10 +233,18 @@ class DailyOrder(models.Model):
     assigned_time = models.DateTimeField(null=True, blank=True)
     delivered_time = models.DateTimeField(null=True, blank=True)
     ordered_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = TimestampedQuerySet.as_manager()
 
     class Meta:
         unique_together = ('user', 'order_date', 'meal_type')
         ordering = ['-order_date', 'meal_type']
+        indexes = [
+            # Keyset pagination of delivery history pages, see food_delivery/history.py
+            models.Index(fields=['user', 'delivered_time', 'id'], condition=models.Q(status='delivered'), name='dailyorder_user_history_idx'),
+            models.Index(fields=['delivery_agent', 'delivered_time', 'id'], condition=models.Q(status='delivered'), name='dailyorder_agent_history_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username}'s {self.meal_type.name} Order for {self.order_date}"
@@ -147,6 +253,11 @@ class DailyOrder(models.Model):
     def total_order_cost(self):
         return sum(item.quantity * item.price_at_order_time for item in self.items.all())
 
+    @property
+    def database(self):
+        # The hostel database the order was read from; links to it pass this as ?db=
+        return self._state.db
+
 
 
 class DailyOrderItem(models.Model):
@@ -163,12 +274,46 @@ class DailyOrderItem(models.Model):
         return f"{self.quantity} x {self.menu_item.name} for Order {self.daily_order.id}"
 
 
+class DailyOrderArchive(models.Model):
+    """Compact copy of a finished DailyOrder moved out of the hot tables.
+
+    Keeps the original primary key, so history pages can page across both tables
+    with one (delivered_time, id) cursor. Items are stored inline as JSON rows of
+    [menu_item_id, name, quantity, price_at_order_time].
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='archived_daily_orders')
+    user_subscription = models.ForeignKey(UserSubscription, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    order_date = models.DateField()
+    meal_type = models.ForeignKey(MealType, on_delete=models.CASCADE, related_name='+')
+    status = models.CharField(max_length=20, choices=DailyOrder.ORDER_STATUS_CHOICES)
+    delivery_agent = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_assigned_daily_orders')
+    assigned_time = models.DateTimeField(null=True, blank=True)
+    delivered_time = models.DateTimeField(null=True, blank=True)
+    ordered_at = models.DateTimeField()
+    items = models.JSONField(default=list)
+    total_cost = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-order_date', 'meal_type']
+        indexes = [
+            models.Index(fields=['user', 'delivered_time', 'id'], condition=models.Q(status='delivered'), name='archive_user_history_idx'),
+            models.Index(fields=['delivery_agent', 'delivered_time', 'id'], condition=models.Q(status='delivered'), name='archive_agent_history_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.id} ({self.status}) for {self.order_date}"
+
+
 class Payment(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='payments')
     user_subscription = models.ForeignKey(UserSubscription, on_delete=models.SET_NULL, null=True, blank=True, related_name='payments_for_subscription')
     amount = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal('0.00'))
     payment_date = models.DateTimeField(auto_now_add=True)
     is_successful = models.BooleanField(default=False)
+    # Nonce of the signed payment token this paid for; unique, so a token is redeemed once
+    token_nonce = models.CharField(max_length=32, unique=True, null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"Payment of {self.amount} by {self.user.username}"
@@ -216,3 +361,216 @@ class BulkOrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity} x {self.menu_item.name} for Bulk Order {self.bulk_order.id}"
 
+
+
+# --- Analytics rollups ---
+# Pre-aggregated copies of DailyOrder/Payment data, maintained by the refresh_rollups
+# command so admin charts never have to scan the raw order tables.
+
+class DailyOrderRollup(models.Model):
+    day = models.DateField()
+    # null: every order of the day, counted once whatever vendors its items are from
+    vendor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True, limit_choices_to={'user_type': 'vendor'}, related_name='+')
+    meal_type = models.ForeignKey(MealType, on_delete=models.CASCADE, related_name='+')
+    status = models.CharField(max_length=20, choices=DailyOrder.ORDER_STATUS_CHOICES)
+    order_count = models.PositiveIntegerField(default=0)
+    item_quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        unique_together = ('day', 'vendor', 'meal_type', 'status')
+        ordering = ['-day', 'vendor', 'meal_type']
+
+    def __str__(self):
+        return f"{self.day} {self.vendor_id}/{self.meal_type_id}/{self.status}: {self.order_count} orders"
+
+
+class PaymentRollup(models.Model):
+    day = models.DateField()
+    # null groups payments whose subscription has since been deleted
+    plan = models.ForeignKey(SubscriptionPlan, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    payment_count = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        unique_together = ('day', 'plan')
+        ordering = ['-day', 'plan']
+
+    def __str__(self):
+        return f"{self.day} plan {self.plan_id}: {self.amount}"
+
+
+class RollupCheckpoint(models.Model):
+    """High-water mark for an incremental rollup job: the last processed primary
+    key for append-only rows, the latest ``updated_at`` seen for edited ones."""
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    last_changed = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+
+
+# --- Demand snapshots ---
+# Frozen by the freeze_demand command once a meal slot's cutoff has passed; never
+# updated afterwards, so production sheets always show the number that was cooked for.
+
+class DemandSnapshot(models.Model):
+    day = models.DateField()
+    meal_type = models.ForeignKey(MealType, on_delete=models.CASCADE, related_name='+')
+    order_count = models.PositiveIntegerField(default=0)
+    frozen_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('day', 'meal_type')
+        ordering = ['-day', 'meal_type']
+
+    def __str__(self):
+        return f"{self.meal_type_id} demand for {self.day}: {self.order_count} orders"
+
+
+class DemandSnapshotItem(models.Model):
+    snapshot = models.ForeignKey(DemandSnapshot, on_delete=models.CASCADE, related_name='items')
+    vendor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, limit_choices_to={'user_type': 'vendor'}, related_name='+')
+    menu_item = models.ForeignKey(VendorMenuItem, on_delete=models.CASCADE, related_name='+')
+    order_count = models.PositiveIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('snapshot', 'menu_item')
+        indexes = [models.Index(fields=['vendor', 'snapshot'], name='demanditem_vendor_idx')]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.menu_item_id} for snapshot {self.snapshot_id}"
+
+
+class DemandForecast(models.Model):
+    """Expected orders of one vendor item for a meal on an upcoming day, written
+    by the forecast_demand command (see food_delivery/forecasting.py)."""
+    day = models.DateField()
+    vendor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, limit_choices_to={'user_type': 'vendor'}, related_name='+')
+    menu_item = models.ForeignKey(VendorMenuItem, on_delete=models.CASCADE, related_name='+')
+    meal_type = models.ForeignKey(MealType, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField(default=0, help_text="Forecast portions, rounded up.")
+    generated_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('day', 'menu_item', 'meal_type')
+        indexes = [models.Index(fields=['vendor', 'day'], name='forecast_vendor_day_idx')]
+
+    def __str__(self):
+        return f"{self.day} {self.menu_item_id}/{self.meal_type_id}: {self.quantity}"
+
+
+class BackgroundTask(models.Model):
+    """A unit of work for the run_worker command (see food_delivery/tasks.py)."""
+    STATUS_CHOICES = (
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    )
+    task_name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    unique_key = models.CharField(max_length=200, unique=True, null=True, blank=True, help_text="Optional de-duplication key, e.g. one row per recurring schedule slot.")
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run_at'], condition=models.Q(status='queued'), name='task_queued_run_at_idx'),
+            models.Index(fields=['status', 'locked_at'], name='task_status_locked_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_name} #{self.id} ({self.status})"
+
+
+# --- Vendor settlements ---
+# Written by the settle_vendors command (see food_delivery/settlements.py). They record
+# what was paid, so they are only ever inserted.
+
+class ImmutableModel(models.Model):
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError(f"{self._meta.verbose_name} records can't be changed once written.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError(f"{self._meta.verbose_name} records can't be deleted.")
+
+
+class SettlementBatch(ImmutableModel):
+    """One settlement run, covering orders delivered in (period_start, period_end].
+    Each batch starts where the previous one ended."""
+    period_start = models.DateTimeField(null=True, blank=True, help_text="Empty for the first batch, which covers everything before period_end.")
+    period_end = models.DateTimeField(unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-period_end']
+        verbose_name_plural = 'settlement batches'
+
+    def __str__(self):
+        return f"Settlement up to {self.period_end:%Y-%m-%d %H:%M}"
+
+
+class VendorSettlement(ImmutableModel):
+    """What one vendor is owed for a batch: the sum of its SettlementLines."""
+    batch = models.ForeignKey(SettlementBatch, on_delete=models.PROTECT, related_name='settlements')
+    vendor = models.ForeignKey(CustomUser, on_delete=models.PROTECT, limit_choices_to={'user_type': 'vendor'}, related_name='settlements')
+    daily_order_count = models.PositiveIntegerField(default=0)
+    bulk_order_count = models.PositiveIntegerField(default=0)
+    item_quantity = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        unique_together = ('batch', 'vendor')
+        ordering = ['-batch', 'vendor']
+
+    def __str__(self):
+        return f"{self.vendor_id} owed {self.amount} for batch {self.batch_id}"
+
+
+class SettlementLine(ImmutableModel):
+    """One delivered order item paid for by a batch. Orders live in per-hostel
+    databases whose primary keys overlap, so lines name the database too;
+    ``create_shard`` relabels the lines of the items it moves."""
+    SOURCE_CHOICES = (
+        ("daily", "Daily order"),
+        ("bulk", "Bulk order"),
+    )
+    batch = models.ForeignKey(SettlementBatch, on_delete=models.PROTECT, related_name='lines')
+    vendor = models.ForeignKey(CustomUser, on_delete=models.PROTECT, related_name='+')
+    source = models.CharField(max_length=5, choices=SOURCE_CHOICES)
+    database = models.CharField(max_length=50)
+    order_id = models.BigIntegerField()
+    item_id = models.BigIntegerField(null=True, blank=True, help_text="The DailyOrderItem or BulkOrderItem paid for. Empty only on lines written before it was recorded.")
+    delivered_time = models.DateTimeField()
+    # The name is kept, so lines still read correctly after a menu item is deleted
+    menu_item = models.ForeignKey(VendorMenuItem, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    item_name = models.CharField(max_length=150)
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        # An order item is paid for once, whichever batch picks it up. Item rows keep
+        # their id when a hostel moves to its shard, unlike the menu item, which can be deleted
+        unique_together = ('source', 'database', 'item_id')
+        indexes = [models.Index(fields=['batch', 'vendor', 'id'], name='settlementline_export_idx')]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.item_name} ({self.source} order {self.order_id}) in batch {self.batch_id}"
@@ -0,0 +1,155 @@
+# food_delivery/notifications.py
+"""Resident notifications for DailyOrder status changes.
+
+Views only drop a StatusChange on an in-memory queue, which costs no database
+work, so request latency is unchanged. Each change carries the hostel database
+holding the order, since the worker thread has no tenant of its own. A daemon worker thread collects events
+for NOTIFICATION_BATCH_SECONDS, keeps only the latest status per order, groups
+what is left per resident and hands one notification per resident to every
+backend in NOTIFICATION_BACKENDS.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict, namedtuple
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import DEFAULT_DB_ALIAS, close_old_connections
+from django.utils.module_loading import import_string
+from .models import DailyOrder
+from .sharding import current_shard
+
+logger = logging.getLogger(__name__)
+
+# Only these statuses are worth interrupting a resident for
+NOTIFY_STATUSES = {'out_for_delivery', 'reached_location'}
+STATUS_LABELS = dict(DailyOrder.ORDER_STATUS_CHOICES)
+
+StatusChange = namedtuple('StatusChange', ['order_id', 'status', 'database'])
+Notification = namedtuple('Notification', ['username', 'email', 'phone_number', 'subject', 'body'])
+
+_events = queue.SimpleQueue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def notify_status_change(order_id, status, database=None):
+    """Queue a status change for delivery. ``database`` defaults to the active
+    tenant's. Safe to call from sync or async views."""
+    if not getattr(settings, 'NOTIFICATION_BACKENDS', None):
+        return
+    _events.put(StatusChange(order_id, status, database or current_shard() or DEFAULT_DB_ALIAS))
+    if getattr(settings, 'NOTIFICATION_WORKER', True):
+        _ensure_worker()
+
+
+def process_pending():
+    """Deliver everything queued so far in the calling thread. Returns the number
+    of notifications sent. Used by tests and when the worker is disabled."""
+    batch = []
+    while True:
+        try:
+            batch.append(_events.get_nowait())
+        except queue.Empty:
+            break
+    return deliver(batch) if batch else 0
+
+
+def deliver(batch):
+    # Later events win, so a resident only hears the newest status of each order.
+    # Order ids are only unique within their database
+    latest = {}
+    for event in batch:
+        latest[event.database, event.order_id] = event.status
+    latest = {key: status for key, status in latest.items() if status in NOTIFY_STATUSES}
+    if not latest:
+        return 0
+
+    by_database = defaultdict(list)
+    for database, order_id in latest:
+        by_database[database].append(order_id)
+    per_resident = defaultdict(list)
+    for database, order_ids in by_database.items():
+        for row in DailyOrder.objects.using(database).filter(id__in=order_ids).values(
+            'id', 'order_date', 'meal_type__name',
+            'user_id', 'user__username', 'user__email', 'user__phone_number'
+        ):
+            row['status'] = latest[database, row['id']]
+            per_resident[row['user_id']].append(row)
+
+    notifications = []
+    for rows in per_resident.values():
+        lines = [
+            f"Your {row['meal_type__name']} order for {row['order_date']} is {STATUS_LABELS[row['status']].lower()}."
+            for row in rows
+        ]
+        first = rows[0]
+        notifications.append(Notification(
+            username=first['user__username'],
+            email=first['user__email'],
+            phone_number=first['user__phone_number'],
+            subject=lines[0] if len(lines) == 1 else f"Updates on {len(lines)} of your orders",
+            body='\n'.join(lines),
+        ))
+
+    for backend in get_backends():
+        try:
+            backend.send(notifications)
+        except Exception:
+            logger.exception("Notification backend %s failed", type(backend).__name__)
+    return len(notifications)
+
+
+def get_backends():
+    return [import_string(path)() for path in getattr(settings, 'NOTIFICATION_BACKENDS', [])]
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, name='order-notifications', daemon=True)
+            _worker.start()
+
+
+def _run_worker():
+    while True:
+        batch = [_events.get()]
+        deadline = time.monotonic() + getattr(settings, 'NOTIFICATION_BATCH_SECONDS', 5)
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                batch.append(_events.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            deliver(batch)
+        except Exception:
+            logger.exception("Dropped %d order status notifications", len(batch))
+        finally:
+            close_old_connections()
+
+
+# --- Backends ---
+
+class EmailNotificationBackend:
+    """Sends through Django's EMAIL_BACKEND (console or file backend locally)."""
+
+    def send(self, notifications):
+        messages = [
+            EmailMessage(n.subject, n.body, to=[n.email])
+            for n in notifications if n.email
+        ]
+        if messages:
+            get_connection().send_messages(messages)
+
+
+class SMSNotificationBackend:
+    """Stand-in for an SMS gateway: logs the text that would go to phone_number."""
+
+    def send(self, notifications):
+        for n in notifications:
+            if n.phone_number:
+                logger.info("SMS to %s (%s): %s", n.phone_number, n.username, n.body.replace('\n', ' '))
@@ -0,0 +1,116 @@
+# food_delivery/reference.py
+"""In-process registry of reference data: meal types and active plans.
+
+These tables hold a handful of rows that change a few times a year, yet
+forms list them as choices and pages show meal type names everywhere. The
+registry loads each table once per process and serves it from memory:
+``meal_types()``, ``meal_type(id)``, ``meal_type_name(id)`` and
+``active_plans()`` answer without queries after the first call, and
+``cached_choices()`` makes a form field render its choices from them.
+Submitted values are still validated against the database.
+
+MealType and SubscriptionPlan signals drop the affected entry in this
+process, immediately and again once the transaction commits. Other
+processes reload theirs within REFERENCE_MAX_AGE seconds. ``stats()``
+reports hits and misses per entry.
+"""
+import threading
+import time
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.forms.models import ModelChoiceIterator
+from .models import MealType, SubscriptionPlan
+
+REFERENCE_MAX_AGE = 300
+
+LOADERS = {
+    'meal_types': lambda: tuple(MealType.objects.order_by('pk')),
+    'active_plans': lambda: tuple(SubscriptionPlan.objects.filter(is_active=True).order_by('pk')),
+}
+
+_lock = threading.Lock()
+_entries = {}  # name -> (loaded at, rows)
+_stats = {name: {'hits': 0, 'misses': 0} for name in LOADERS}
+
+
+def _get(name):
+    entry = _entries.get(name)
+    if entry is not None and time.monotonic() - entry[0] < REFERENCE_MAX_AGE:
+        _stats[name]['hits'] += 1
+        return entry[1]
+    with _lock:
+        _stats[name]['misses'] += 1
+        rows = LOADERS[name]()
+        _entries[name] = (time.monotonic(), rows)
+    return rows
+
+
+def meal_types():
+    """Every MealType, in creation order."""
+    return _get('meal_types')
+
+
+def meal_type(meal_type_id):
+    """The MealType with this id, or None."""
+    return next((row for row in meal_types() if row.id == meal_type_id), None)
+
+
+def meal_type_name(meal_type_id):
+    row = meal_type(meal_type_id)
+    return row.name if row else ''
+
+
+def active_plans():
+    """SubscriptionPlans open to subscribers, in creation order."""
+    return _get('active_plans')
+
+
+def stats():
+    """{entry: {'hits': n, 'misses': n}} since the process started."""
+    return {name: dict(counts) for name, counts in _stats.items()}
+
+
+def clear(*names):
+    """Drop the named entries (default: all); the next lookup reloads them."""
+    for name in names or LOADERS:
+        _entries.pop(name, None)
+
+
+class _CachedChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for row in self.field.reference_rows():
+            yield self.choice(row)
+
+    def __len__(self):
+        return len(self.field.reference_rows()) + (self.field.empty_label is not None)
+
+
+def cached_choices(field, rows):
+    """Render a ModelChoiceField's choices from ``rows()`` (e.g. meal_types)
+    instead of querying its queryset."""
+    field.reference_rows = rows
+    field.iterator = _CachedChoiceIterator
+    field.widget.choices = field.choices
+
+
+# --- Invalidation ---
+
+def _forget(*names):
+    clear(*names)
+    # A reload inside the writing transaction could have seen the old rows
+    transaction.on_commit(lambda: clear(*names))
+
+
+@receiver(post_save, sender=MealType)
+@receiver(post_delete, sender=MealType)
+def forget_meal_types(**kwargs):
+    _forget('meal_types')
+
+
+@receiver(post_save, sender=SubscriptionPlan)
+@receiver(post_delete, sender=SubscriptionPlan)
+def forget_plans(**kwargs):
+    _forget('active_plans')
@@ -0,0 +1,197 @@
+# food_delivery/rollups.py
+from datetime import timedelta
+from decimal import Decimal
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from .models import DailyOrder, DailyOrderArchive, DailyOrderItem, Payment, DailyOrderRollup, PaymentRollup, \
+                    RollupCheckpoint, VendorMenuItem
+from .sharding import fan_out, gather
+
+ORDER_CHECKPOINT = 'daily_order_rollup'
+PAYMENT_CHECKPOINT = 'payment_rollup'
+
+# How far before the last seen updated_at the next run looks again, for orders
+# stamped earlier but committed after that run read them
+ROLLUP_OVERLAP = timedelta(minutes=5)
+
+LINE_TOTAL = ExpressionWrapper(
+    F('quantity') * F('price_at_order_time'),
+    output_field=DecimalField(max_digits=12, decimal_places=2)
+)
+
+
+def _checkpoint(name):
+    checkpoint, _ = RollupCheckpoint.objects.get_or_create(name=name)
+    return checkpoint
+
+
+def _checkpoint_name(name, alias):
+    # Primary keys are per database, so each shard keeps its own high-water mark
+    return name if alias == DEFAULT_DB_ALIAS else f'{name}:{alias}'
+
+
+def refresh_order_rollups(rebuild=False):
+    """Re-aggregate DailyOrderRollup for every day that may have changed.
+
+    A day is dirty when one of its orders was created or changed since the last
+    run, going by the orders' ``updated_at`` (kept current by save() and by
+    TimestampedQuerySet.update()). The mark is read back ROLLUP_OVERLAP early,
+    since ``updated_at`` is stamped before the writing transaction commits. Every
+    hostel database is scanned and the rows for a day are summed across them.
+
+    Each day gets one row per vendor, counting the orders that contain that
+    vendor's items, and one row with no vendor whose order count comes from
+    DailyOrder itself. Totals across vendors must use the latter: an order with
+    items from two vendors is in both vendor rows, and one without items in
+    neither.
+
+    Orders moved to DailyOrderArchive still count: a day's totals are summed
+    over both tables, and a rebuild covers the archived days too. Archived items
+    whose menu item has since been deleted only count in the no-vendor row.
+    Returns the number of days refreshed.
+    """
+    def dirty_days(alias):
+        checkpoint = _checkpoint(_checkpoint_name(ORDER_CHECKPOINT, alias))
+        changed = DailyOrder.objects.all()
+        if not rebuild and checkpoint.last_changed is not None:
+            changed = changed.filter(updated_at__gt=checkpoint.last_changed - ROLLUP_OVERLAP)
+        high_water = changed.aggregate(Max('updated_at'))['updated_at__max'] or checkpoint.last_changed
+        days = set(changed.values_list('order_date', flat=True).distinct())
+        if rebuild:
+            days.update(DailyOrderArchive.objects.values_list('order_date', flat=True).distinct())
+        return checkpoint, high_water, days
+
+    marks = fan_out(dirty_days)
+    days = set().union(*(days for _, _, days in marks.values()))
+
+    def day_totals():
+        per_vendor = DailyOrderItem.objects.filter(daily_order__order_date__in=days).values(
+            'daily_order__order_date', 'menu_item__vendor', 'daily_order__meal_type', 'daily_order__status'
+        ).annotate(
+            order_count=Count('daily_order', distinct=True),
+            item_quantity=Sum('quantity'),
+            revenue=Sum(LINE_TOTAL),
+        ).values_list(
+            'daily_order__order_date', 'menu_item__vendor', 'daily_order__meal_type', 'daily_order__status',
+            'order_count', 'item_quantity', 'revenue',
+        ).order_by()
+        orders = DailyOrder.objects.filter(order_date__in=days).values(
+            'order_date', 'meal_type', 'status'
+        ).annotate(order_count=Count('id')).values_list(
+            'order_date', 'meal_type', 'status', 'order_count'
+        ).order_by()
+        archived = DailyOrderArchive.objects.filter(order_date__in=days).values_list(
+            'order_date', 'meal_type', 'status', 'items'
+        )
+        return list(per_vendor), list(orders), list(archived)
+
+    results = gather(day_totals)
+    # Archived items only name their menu item; the vendor comes from the catalog
+    vendors = dict(VendorMenuItem.objects.filter(id__in={
+        item[0] for _, _, archived in results for *_, items in archived for item in items
+    }).values_list('id', 'vendor_id'))
+
+    totals = {}
+    for per_vendor, orders, archived in results:
+        for day, vendor_id, meal_type_id, status, order_count, item_quantity, revenue in per_vendor:
+            for key, count in (((day, vendor_id, meal_type_id, status), order_count),
+                               ((day, None, meal_type_id, status), 0)):
+                total = totals.setdefault(key, [0, 0, 0])
+                total[0] += count
+                total[1] += item_quantity
+                total[2] += revenue
+        for day, meal_type_id, status, order_count in orders:
+            totals.setdefault((day, None, meal_type_id, status), [0, 0, 0])[0] += order_count
+        for day, meal_type_id, status, items in archived:
+            day_key = (day, None, meal_type_id, status)
+            totals.setdefault(day_key, [0, 0, 0])[0] += 1
+            order_vendors = set()
+            for menu_item_id, _, quantity, price in items:
+                keys = [day_key]
+                vendor_id = vendors.get(menu_item_id)
+                if vendor_id is not None:
+                    keys.append((day, vendor_id, meal_type_id, status))
+                    if vendor_id not in order_vendors:
+                        order_vendors.add(vendor_id)
+                        totals.setdefault(keys[1], [0, 0, 0])[0] += 1
+                for key in keys:
+                    total = totals.setdefault(key, [0, 0, 0])
+                    total[1] += quantity
+                    total[2] += quantity * Decimal(price)
+
+    with transaction.atomic():
+        stale = DailyOrderRollup.objects.all()
+        if not rebuild:
+            stale = stale.filter(day__in=days)
+        stale.delete()
+        DailyOrderRollup.objects.bulk_create([
+            DailyOrderRollup(
+                day=day,
+                vendor_id=vendor_id,
+                meal_type_id=meal_type_id,
+                status=status,
+                order_count=order_count,
+                item_quantity=item_quantity,
+                revenue=revenue,
+            )
+            for (day, vendor_id, meal_type_id, status), (order_count, item_quantity, revenue) in totals.items()
+        ], batch_size=500)
+        for checkpoint, high_water, _ in marks.values():
+            checkpoint.last_changed = high_water
+            checkpoint.save()
+
+    return len(days)
+
+
+def refresh_payment_rollups(rebuild=False):
+    """Re-aggregate PaymentRollup for the days that received new payments.
+
+    Payments are never edited after creation, so the primary key high-water mark
+    of each hostel database alone tells us which days are dirty. Returns the
+    number of days refreshed.
+    """
+    def dirty_days(alias):
+        checkpoint = _checkpoint(_checkpoint_name(PAYMENT_CHECKPOINT, alias))
+        if rebuild:
+            checkpoint.last_id = 0
+        new_payments = Payment.objects.filter(id__gt=checkpoint.last_id)
+        high_water = new_payments.aggregate(Max('id'))['id__max'] or checkpoint.last_id
+        days = set(new_payments.annotate(day=TruncDate('payment_date')).values_list('day', flat=True).distinct())
+        return checkpoint, high_water, days
+
+    marks = fan_out(dirty_days)
+    days = set().union(*(days for _, _, days in marks.values()))
+
+    totals = {}
+    for rows in gather(lambda: list(Payment.objects.annotate(day=TruncDate('payment_date')).filter(
+        is_successful=True,
+        day__in=days
+    ).values(
+        'day', 'user_subscription__plan'
+    ).annotate(
+        payment_count=Count('id'),
+        amount=Sum('amount'),
+    ).order_by())):
+        for row in rows:
+            total = totals.setdefault((row['day'], row['user_subscription__plan']), [0, 0])
+            total[0] += row['payment_count']
+            total[1] += row['amount']
+
+    with transaction.atomic():
+        stale = PaymentRollup.objects.all() if rebuild else PaymentRollup.objects.filter(day__in=days)
+        stale.delete()
+        PaymentRollup.objects.bulk_create([
+            PaymentRollup(
+                day=day,
+                plan_id=plan_id,
+                payment_count=payment_count,
+                amount=amount,
+            )
+            for (day, plan_id), (payment_count, amount) in totals.items()
+        ], batch_size=500)
+        for checkpoint, high_water, _ in marks.values():
+            checkpoint.last_id = high_water
+            checkpoint.save()
+
+    return len(days)
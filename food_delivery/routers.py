@@ -0,0 +1,148 @@
+# food_delivery/routers.py
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+REPLICA_ALIAS = 'replica'
+PIN_COOKIE = 'db_pin'
+
+# Apps that must always be read from the primary: a session written a moment ago
+# would otherwise look missing on a lagging replica and log the user out.
+PRIMARY_ONLY_APPS = {'sessions'}
+
+
+class _RequestState:
+    """Per-request routing flags. Mutated in place so the values survive the
+    sync/async thread hops asgiref makes while serving a request."""
+    __slots__ = ('use_replica', 'pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        self.use_replica = False
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = ContextVar('food_delivery_db_state', default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def note_write():
+    """Record that the current request wrote, pinning its reads to the primary.
+    Routers placed before ReplicaRouter that answer db_for_write call this."""
+    state = _state.get()
+    if state is not None:
+        state.wrote = True
+
+
+class ReplicaRouter:
+    """Send reads to the ``replica`` alias, but only inside ``replica_reads()``.
+
+    Everything else - writes, migrations, and reads from views that never opted in -
+    is left to the next router (ultimately ``default``). Once a request writes, its
+    remaining reads and those of the following REPLICA_PIN_SECONDS (via the pin
+    cookie) stay off the replica too, so users always see their own changes.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (state is None or not state.use_replica or state.pinned or state.wrote
+                or model._meta.app_label in PRIMARY_ONLY_APPS or not replica_configured()):
+            return None
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        note_write()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data, so relations across them are fine
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica's schema arrives with the data (sync_replica or real replication)
+        if db == REPLICA_ALIAS:
+            return False
+        return None
+
+
+@contextmanager
+def replica_reads():
+    """Route reads in this block to the replica (subject to write pinning)."""
+    state = _state.get()
+    token = None
+    if state is None:
+        state = _RequestState()
+        token = _state.set(state)
+    previous = state.use_replica
+    state.use_replica = True
+    try:
+        yield
+    finally:
+        state.use_replica = previous
+        if token is not None:
+            _state.reset(token)
+
+
+def read_from_replica(view_func):
+    """View decorator for read-only pages that can tolerate a few seconds of lag.
+    Apply it below login_required so authentication still reads from default."""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_async_view(request, *args, **kwargs):
+            with replica_reads():
+                return await view_func(request, *args, **kwargs)
+        return _wrapped_async_view
+
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        with replica_reads():
+            return view_func(request, *args, **kwargs)
+    return _wrapped_view
+
+
+class ReplicaPinMiddleware:
+    """Tracks writes per request and pins the browser to ``default`` for a short
+    window afterwards, so read-after-write flows never hit a stale replica.
+    Works in both sync and async stacks so async views stay fully async."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = _RequestState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin_if_written(state, response)
+
+    async def __acall__(self, request):
+        state = _RequestState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin_if_written(state, response)
+
+    def pin_if_written(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,126 @@
+# food_delivery/settlements.py
+"""Vendor payouts: what each vendor is owed for delivered order items.
+
+``settle()`` writes the next SettlementBatch. A batch covers items whose order
+was delivered after the previous batch's ``period_end`` (the checkpoint) and
+up to its own, so every run reads only deliveries it hasn't seen. The end is
+held SETTLEMENT_LAG behind the clock: ``delivered_time`` is stamped before the
+delivering transaction commits, and a delivery must not appear after the
+window that should have contained it was already settled.
+
+Delivered daily and bulk order items of the window are read from every hostel
+database and copied into SettlementLines at ``price_at_order_time ×
+quantity``. The per-vendor VendorSettlement totals are then one aggregate
+over those lines, so they always equal what the lines add up to. Lines are
+unique per order item row (source, database, item id), so nothing can be paid
+twice: an order delivered again (which stamps a new ``delivered_time``) is
+skipped if it was already settled. Item rows keep their ids when
+``create_shard`` moves a hostel, and it relabels their lines' database.
+
+Batches, settlements and lines are never changed afterwards, apart from that
+relabelling; an order that is cancelled after its batch was written stays
+paid for. Every change into delivered made by the app stamps
+``delivered_time``: ``usage.set_status`` and ``usage.stamp_delivery`` for
+daily orders (the admin included), and the warden's delivery confirmation for
+bulk orders, so no delivery is missed by the window.
+"""
+import csv
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from .models import BulkOrderItem, DailyOrderItem, SettlementBatch, SettlementLine, VendorSettlement
+from .sharding import fan_out
+
+SETTLEMENT_LAG = timedelta(minutes=5)
+LINE_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_HEADER = ['batch', 'vendor', 'source', 'database', 'order_id', 'item_id', 'delivered_time', 'menu_item_id',
+                 'item_name', 'quantity', 'unit_price', 'amount']
+
+# (line source, item model, lookup from the item to its order)
+SOURCES = [
+    ('daily', DailyOrderItem, 'daily_order'),
+    ('bulk', BulkOrderItem, 'bulk_order'),
+]
+
+
+def checkpoint():
+    """End of the last batch, or None before the first one."""
+    return SettlementBatch.objects.order_by('-period_end').values_list('period_end', flat=True).first()
+
+
+def _delivered_items(start, end):
+    """[(source, order id, item id, delivered_time, menu item id, vendor id, name,
+    quantity, price)] for the current database."""
+    rows = []
+    for source, model, order in SOURCES:
+        window = Q(**{f'{order}__status': 'delivered', f'{order}__delivered_time__lte': end})
+        if start is not None:
+            window &= Q(**{f'{order}__delivered_time__gt': start})
+        rows.extend(
+            (source, *row) for row in model.objects.filter(window).values_list(
+                f'{order}_id', 'id', f'{order}__delivered_time', 'menu_item_id', 'menu_item__vendor_id',
+                'menu_item__name', 'quantity', 'price_at_order_time',
+            ).order_by(f'{order}_id', 'id')
+        )
+    return rows
+
+
+def settle(until=None):
+    """Write the batch for deliveries since the checkpoint up to ``until``
+    (default: now), held back by SETTLEMENT_LAG. Returns the batch, or None if
+    the checkpoint is already there."""
+    end = timezone.now() - SETTLEMENT_LAG
+    if until is not None:
+        end = min(end, until)
+    start = checkpoint()
+    if start is not None and end <= start:
+        return None
+
+    # Read every hostel database before writing, so no shard read (which goes
+    # through the attached default database) waits on the write below
+    items = fan_out(lambda alias: _delivered_items(start, end))
+
+    with transaction.atomic():
+        batch = SettlementBatch.objects.create(period_start=start, period_end=end)
+        SettlementLine.objects.bulk_create((
+            SettlementLine(
+                batch=batch, vendor_id=vendor_id, source=source, database=alias, order_id=order_id,
+                item_id=item_id, delivered_time=delivered_time, menu_item_id=menu_item_id, item_name=name,
+                quantity=quantity, unit_price=price, amount=quantity * price,
+            )
+            for alias, rows in items.items()
+            for source, order_id, item_id, delivered_time, menu_item_id, vendor_id, name, quantity, price in rows
+        ), batch_size=LINE_BATCH_SIZE, ignore_conflicts=True)
+
+        VendorSettlement.objects.bulk_create([
+            VendorSettlement(batch=batch, **totals)
+            for totals in SettlementLine.objects.filter(batch=batch).values('vendor_id').annotate(
+                daily_order_count=Count('order_id', filter=Q(source='daily'), distinct=True),
+                bulk_order_count=Count('order_id', filter=Q(source='bulk'), distinct=True),
+                item_quantity=Sum('quantity'),
+                amount=Sum('amount'),
+            ).order_by('vendor_id')
+        ])
+    return batch
+
+
+class _Echo:
+    # csv.writer only needs write(); hand each row straight back
+    def write(self, value):
+        return value
+
+
+def export_lines(settlement):
+    """CSV rows (header first) of a VendorSettlement's lines, read in chunks so
+    a large settlement is never held in memory."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    lines = SettlementLine.objects.filter(batch=settlement.batch_id, vendor=settlement.vendor_id).order_by('id')
+    for line in lines.values_list(
+        'batch_id', 'vendor_id', 'source', 'database', 'order_id', 'item_id', 'delivered_time', 'menu_item_id',
+        'item_name', 'quantity', 'unit_price', 'amount',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield writer.writerow(line)
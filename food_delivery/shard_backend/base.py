@@ -0,0 +1,42 @@
+# food_delivery/shard_backend/base.py
+"""SQLite backend for tenant shard files (see food_delivery/sharding.py).
+
+A shard file only holds a hostel's tenant tables. Each connection attaches the
+catalog database (``default`` unless the alias sets ``CATALOG``) as
+``catalog``; SQLite resolves unqualified table names in ``main`` first and the
+attached file second, so queries joining orders to users, meal types or menu
+items still run as one statement.
+
+SQLite can't enforce a foreign key whose parent table lives in another file,
+so shard tables are created without FK constraints and constraint checking
+stays off on these connections.
+"""
+from django.db import connections
+from django.db.backends.sqlite3 import base, features, schema
+
+
+class DatabaseFeatures(features.DatabaseFeatures):
+    supports_foreign_keys = False
+
+
+class DatabaseSchemaEditor(schema.DatabaseSchemaEditor):
+    sql_create_inline_fk = None
+    sql_create_column_inline_fk = None
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    features_class = DatabaseFeatures
+    SchemaEditorClass = DatabaseSchemaEditor
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        conn.execute('PRAGMA foreign_keys = OFF')
+        catalog = connections[self.settings_dict.get('CATALOG', 'default')].settings_dict['NAME']
+        conn.execute('ATTACH DATABASE ? AS catalog', [str(catalog)])
+        return conn
+
+    def enable_constraint_checking(self):
+        pass
+
+    def check_constraints(self, table_names=None):
+        pass
@@ -0,0 +1,339 @@
+# food_delivery/sharding.py
+"""Per-hostel database files ("shards"), keyed by warden.
+
+A hostel with a shard keeps its residents' subscriptions, usage ledger,
+orders, payments and bulk orders in ``SHARD_DIR/tenant_<warden id>.sqlite3``,
+so its writes take that file's lock instead of the one shared by everybody.
+Users, meal types, plans, vendors, menus and the reporting tables stay in
+``default``; shard connections attach it (see shard_backend), so tenant rows
+still join to them in one query. Hostels without a shard file keep using
+``default``, and ``create_shard`` moves a hostel over.
+
+Which shard a query uses comes from the active tenant: TenantMiddleware sets
+it per request from the resident's warden (or the warden themselves), and
+``use_shard()`` sets it explicitly. Rows already loaded from a shard keep
+routing there through the ``instance`` hint. Vendors, agents and admins have
+no tenant: their pages and the commands that work across hostels run once per
+database through ``fan_out()`` or ``gather()``, and a page acting on one order
+by id is told its database with ``?db=`` (see ``shard_from_query``).
+
+Primary keys are only unique within a database file.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import Http404
+from .routers import note_write
+
+SHARD_PREFIX = 'tenant_'
+SHARD_ENGINE = 'food_delivery.shard_backend'
+
+# Everything a hostel writes per resident and order; all other models are global
+TENANT_MODELS = {
+    'food_delivery.usersubscription',
+    'food_delivery.subscriptionusage',
+    'food_delivery.dailyorder',
+    'food_delivery.dailyorderitem',
+    'food_delivery.dailyorderarchive',
+    'food_delivery.payment',
+    'food_delivery.bulkorder',
+    'food_delivery.bulkorderitem',
+}
+
+
+def is_shard(alias):
+    return alias is not None and alias.startswith(SHARD_PREFIX)
+
+
+def _shard_path(warden_id):
+    return settings.SHARD_DIR / f'{SHARD_PREFIX}{warden_id}.sqlite3'
+
+
+def _register(alias, path):
+    config = {'ENGINE': SHARD_ENGINE, 'NAME': path}
+    connections.configure_settings({DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS], alias: config})
+    connections.settings[alias] = config
+
+
+def shard_alias(warden_id):
+    """The database alias holding ``warden_id``'s hostel, or None while it has
+    no shard file. Shards created after startup are registered on first use."""
+    if warden_id is None:
+        return None
+    alias = f'{SHARD_PREFIX}{warden_id}'
+    if alias in connections.settings:
+        return alias
+    path = _shard_path(warden_id)
+    if not path.exists():
+        return None
+    _register(alias, path)
+    return alias
+
+
+def shard_aliases():
+    """Every shard in SHARD_DIR, registered."""
+    aliases = []
+    for path in sorted(settings.SHARD_DIR.glob(f'{SHARD_PREFIX}*.sqlite3')):
+        alias = path.stem
+        if alias not in connections.settings:
+            _register(alias, path)
+        aliases.append(alias)
+    return aliases
+
+
+def tenant_databases():
+    """``default`` (hostels without a shard) followed by every shard."""
+    return [DEFAULT_DB_ALIAS, *shard_aliases()]
+
+
+def tenant_database(alias):
+    """``alias`` if it names a tenant database (``default`` or an existing
+    shard), else None."""
+    if alias == DEFAULT_DB_ALIAS:
+        return alias
+    if is_shard(alias) and alias[len(SHARD_PREFIX):].isdigit():
+        return shard_alias(int(alias[len(SHARD_PREFIX):]))
+    return None
+
+
+def forget_shard(alias):
+    """Close and unregister a shard connection in this process (this thread's
+    connection; others close at the end of their request)."""
+    if hasattr(connections._connections, alias):
+        connections[alias].close()
+        delattr(connections._connections, alias)
+    connections.settings.pop(alias, None)
+
+
+def forget_shards():
+    for alias in [alias for alias in connections.settings if is_shard(alias)]:
+        forget_shard(alias)
+
+
+# --- Routing ---
+
+class _RequestTenant:
+    """Resolves the request's shard on the first tenant query, so requests
+    that never touch tenant tables don't load the user for it."""
+    __slots__ = ('request', 'resolved', 'alias')
+
+    def __init__(self, request):
+        self.request = request
+        self.resolved = False
+        self.alias = None
+
+    def get(self):
+        if not self.resolved:
+            user = self.request.user
+            if user.is_authenticated and user.user_type == 'warden':
+                self.alias = shard_alias(user.id)
+            elif user.is_authenticated and user.user_type == 'resident':
+                self.alias = shard_alias(user.warden_id)
+            self.resolved = True
+        return self.alias
+
+
+_tenant = ContextVar('food_delivery_tenant', default=None)
+
+
+def current_shard():
+    tenant = _tenant.get()
+    return tenant.get() if isinstance(tenant, _RequestTenant) else tenant
+
+
+@contextmanager
+def use_shard(alias):
+    """Route tenant models to ``alias`` in this block; None or ``default``
+    means the shared database."""
+    token = _tenant.set(alias if is_shard(alias) else None)
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+
+def tenant_atomic():
+    """transaction.atomic() on the database the tenant models currently use."""
+    return transaction.atomic(using=current_shard() or DEFAULT_DB_ALIAS)
+
+
+class TenantRouter:
+    """Send tenant models to the active shard. Global models, and tenant models
+    while no shard is active, are left to the next router."""
+
+    def _db(self, model, hints):
+        if model._meta.label_lower not in TENANT_MODELS:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._meta.label_lower in TENANT_MODELS and instance._state.db:
+            return instance._state.db
+        return current_shard()
+
+    def db_for_read(self, model, **hints):
+        return self._db(model, hints)
+
+    def db_for_write(self, model, **hints):
+        alias = self._db(model, hints)
+        if alias is not None:
+            # ReplicaRouter isn't asked once a database is chosen here
+            note_write()
+        return alias
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if obj1._meta.label_lower in TENANT_MODELS and obj2._meta.label_lower in TENANT_MODELS:
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if is_shard(db):
+            return f'{app_label}.{model_name}' in TENANT_MODELS
+        return None
+
+
+class TenantMiddleware:
+    """Makes the user's hostel the active tenant for the request. Goes after
+    AuthenticationMiddleware; the user is only loaded when a tenant query runs."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _tenant.set(_RequestTenant(request))
+        try:
+            return self.get_response(request)
+        finally:
+            _tenant.reset(token)
+
+    async def __acall__(self, request):
+        token = _tenant.set(_RequestTenant(request))
+        try:
+            return await self.get_response(request)
+        finally:
+            _tenant.reset(token)
+
+
+DATABASE_PARAM = 'db'
+
+
+def shard_from_query(view):
+    """Run ``view`` with the tenant database named by ``?db=`` active
+    (``default`` when absent), for pages that act on an order by id without a
+    tenant of their own. An unknown name is a 404. Works for sync and async views."""
+    def database(request):
+        alias = tenant_database(request.GET.get(DATABASE_PARAM) or DEFAULT_DB_ALIAS)
+        if alias is None:
+            raise Http404("Unknown database.")
+        return alias
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            with use_shard(database(request)):
+                return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with use_shard(database(request)):
+                return view(request, *args, **kwargs)
+    return wrapper
+
+
+# --- Working across hostels ---
+
+def _run_on(alias, func, close):
+    try:
+        with use_shard(alias):
+            return func(alias)
+    finally:
+        # Worker threads open their own connections; don't leave them behind
+        if close:
+            connections.close_all()
+
+
+def fan_out(func, parallel=1):
+    """Call ``func(alias)`` once per tenant database with that database
+    active. Shards are separate files with separate write locks, so with
+    ``parallel`` > 1 they are processed concurrently. Returns {alias: result}."""
+    aliases = tenant_databases()
+    if parallel <= 1 or len(aliases) == 1:
+        return {alias: _run_on(alias, func, close=False) for alias in aliases}
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        results = pool.map(lambda alias: _run_on(alias, func, close=True), aliases)
+        return dict(zip(aliases, results))
+
+
+def gather(func):
+    """[func() for every tenant database], for reports that merge what each
+    hostel's rows add up to."""
+    return list(fan_out(lambda alias: func()).values())
+
+
+def create_shard(warden_id, stdout=None):
+    """Create and migrate the warden's shard file, then move the hostel's
+    tenant rows out of ``default`` into it. Returns {model label: rows moved}.
+
+    The file is built under a temporary name, so the hostel keeps using
+    ``default`` until everything has been copied; only then are the rows
+    deleted there and the file renamed into place.
+    """
+    from .models import BulkOrder, BulkOrderItem, DailyOrder, DailyOrderArchive, DailyOrderItem, Payment, \
+                        SettlementLine, SubscriptionUsage, UserSubscription
+
+    path = _shard_path(warden_id)
+    building = path.with_name(path.name + '.building')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    building.unlink(missing_ok=True)
+    alias = f'{SHARD_PREFIX}{warden_id}'
+    _register(alias, building)
+    call_command('migrate', 'food_delivery', database=alias, verbosity=0)
+
+    # Parents before children, so a partial copy never has orphans
+    hostel = [
+        (UserSubscription, 'user__warden'),
+        (SubscriptionUsage, 'subscription__user__warden'),
+        (Payment, 'user__warden'),
+        (DailyOrder, 'user__warden'),
+        (DailyOrderItem, 'daily_order__user__warden'),
+        (DailyOrderArchive, 'user__warden'),
+        (BulkOrder, 'warden'),
+        (BulkOrderItem, 'bulk_order__warden'),
+    ]
+    moved = {}
+    try:
+        with use_shard(None), transaction.atomic(using=alias):
+            for model, lookup in hostel:
+                count = 0
+                for row in model.objects.using(DEFAULT_DB_ALIAS).filter(**{lookup: warden_id}).order_by('pk').iterator():
+                    # raw keeps auto_now/auto_now_add timestamps as they were
+                    row.save_base(using=alias, raw=True, force_insert=True)
+                    count += 1
+                moved[model._meta.label] = count
+                if stdout:
+                    stdout.write(f'Copied {count} {model._meta.verbose_name_plural}')
+        with use_shard(None), transaction.atomic(using=DEFAULT_DB_ALIAS):
+            # Settled items keep their ids in the shard; pointing their lines at it keeps
+            # them from being paid again there
+            for source, model, lookup in [('daily', DailyOrderItem, 'daily_order__user__warden'),
+                                          ('bulk', BulkOrderItem, 'bulk_order__warden')]:
+                SettlementLine.objects.filter(
+                    source=source, database=DEFAULT_DB_ALIAS,
+                    item_id__in=model.objects.using(DEFAULT_DB_ALIAS).filter(**{lookup: warden_id}).values('id'),
+                ).update(database=alias)
+            # Children first, so deleting a parent finds nothing left to cascade to
+            for model, lookup in reversed(hostel):
+                model.objects.using(DEFAULT_DB_ALIAS).filter(**{lookup: warden_id}).delete()
+    finally:
+        forget_shard(alias)
+    building.replace(path)
+    return moved
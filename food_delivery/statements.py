@@ -0,0 +1,310 @@
+# food_delivery/statements.py
+"""Monthly statements: one per resident, and a hostel summary per warden.
+
+``generate()`` reads residents in keyset chunks of ``chunk_size``. Each
+chunk costs a handful of queries per hostel database (subscriptions,
+payments, live and archived orders and their items for every resident in
+it), folded into plain dicts. Those are rendered to standalone printable
+HTML in a process pool while the next chunk is read, so at most two chunks
+are held in memory. Warden summaries come from aggregate queries per hostel.
+
+Each statement is stored as ``<month>/<sha256[:2]>/<sha256>.html`` under the
+output directory and recorded as one line of ``<month>/manifest.jsonl``.
+Files are written to a temporary name and renamed, and a manifest line is
+only appended once its file is in place. A rerun skips every statement
+already in the manifest, so an interrupted run resumes where it stopped.
+Statements carry no generation time, so rebuilding unchanged data
+reproduces the same files.
+"""
+import hashlib
+import json
+import os
+import django
+from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db.models import Count, Q, Sum
+from django.template.loader import render_to_string
+from django.utils import timezone
+from .models import CustomUser, UserSubscription, Payment, DailyOrder, DailyOrderItem, DailyOrderArchive, BulkOrder
+from .rollups import LINE_TOTAL
+from .sharding import shard_alias, use_shard
+
+CHUNK_SIZE = 200
+MANIFEST = 'manifest.jsonl'
+
+CANCELLED = Q(status='cancelled')
+DELIVERED = Q(status='delivered')
+
+
+def month_bounds(month):
+    """(first day, first day of the next month) for the month containing ``month``."""
+    first = month.replace(day=1)
+    return first, (first + timedelta(days=32)).replace(day=1)
+
+
+def _aware(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _database(warden_id):
+    return shard_alias(warden_id) or 'default'
+
+
+def _empty_totals():
+    return {'meals_ordered': 0, 'meals_delivered': 0, 'meals_cancelled': 0,
+            'order_value': Decimal('0.00'), 'paid': Decimal('0.00')}
+
+
+# --- Residents ---
+
+def _resident_statements(residents, first, end):
+    """Statement data for ``residents`` (dicts from CustomUser.values()), all
+    living in the active database."""
+    statements = {
+        resident['id']: {
+            'resident': resident, 'month': first, 'subscriptions': [], 'payments': [], 'orders': [],
+            'totals': _empty_totals(),
+        }
+        for resident in residents
+    }
+    ids = list(statements)
+
+    for row in UserSubscription.objects.filter(
+        user_id__in=ids, start_date__lt=end, end_date__gte=first
+    ).values('user_id', 'plan__name', 'start_date', 'end_date', 'status', 'is_paid').order_by('start_date', 'id'):
+        statements[row.pop('user_id')]['subscriptions'].append(row)
+
+    for row in Payment.objects.filter(
+        user_id__in=ids, payment_date__gte=_aware(first), payment_date__lt=_aware(end)
+    ).values('user_id', 'payment_date', 'amount', 'is_successful').order_by('payment_date', 'id'):
+        statement = statements[row.pop('user_id')]
+        statement['payments'].append(row)
+        if row['is_successful']:
+            statement['totals']['paid'] += row['amount']
+
+    orders = {}
+    items = defaultdict(list)
+    month = Q(order_date__gte=first, order_date__lt=end)
+    for row in DailyOrderItem.objects.filter(
+        daily_order__user_id__in=ids, daily_order__order_date__gte=first, daily_order__order_date__lt=end
+    ).values_list('daily_order_id', 'menu_item__name', 'quantity', 'price_at_order_time').order_by('id'):
+        items[row[0]].append(row[1:])
+    for row in DailyOrder.objects.filter(month, user_id__in=ids).values(
+        'id', 'user_id', 'order_date', 'meal_type__name', 'status'
+    ):
+        orders[row['id']] = (row, items[row['id']])
+    for row in DailyOrderArchive.objects.filter(month, user_id__in=ids).values(
+        'id', 'user_id', 'order_date', 'meal_type__name', 'status', 'items'
+    ):
+        orders[row['id']] = (row, [tuple(item[1:]) for item in row.pop('items')])
+
+    for row, lines in sorted(orders.values(), key=lambda order: (order[0]['order_date'], order[0]['meal_type__name'] or '')):
+        statement = statements[row.pop('user_id')]
+        row['items'] = [
+            {'name': name, 'quantity': quantity, 'price': Decimal(price), 'amount': quantity * Decimal(price)}
+            for name, quantity, price in lines
+        ]
+        row['total'] = sum((item['amount'] for item in row['items']), Decimal('0.00'))
+        statement['orders'].append(row)
+
+        totals = statement['totals']
+        if row['status'] == 'cancelled':
+            totals['meals_cancelled'] += 1
+            continue
+        totals['meals_ordered'] += 1
+        totals['meals_delivered'] += row['status'] == 'delivered'
+        totals['order_value'] += row['total']
+
+    return list(statements.values())
+
+
+def _chunks(first, end, done, chunk_size):
+    """Lists of (key, statement data) for statements not in ``done``: a chunk
+    of residents at a time, then every warden's summary."""
+    last_id = 0
+    while True:
+        residents = list(CustomUser.objects.filter(user_type='resident', id__gt=last_id).values(
+            'id', 'username', 'first_name', 'last_name', 'warden_id', 'warden__username',
+        ).order_by('id')[:chunk_size])
+        if not residents:
+            break
+        last_id = residents[-1]['id']
+
+        by_database = defaultdict(list)
+        for resident in residents:
+            if f'resident:{resident["id"]}' not in done:
+                by_database[_database(resident['warden_id'])].append(resident)
+        chunk = []
+        for alias, group in by_database.items():
+            with use_shard(alias):
+                chunk.extend((f'resident:{data["resident"]["id"]}', data)
+                             for data in _resident_statements(group, first, end))
+        yield chunk
+    yield list(_warden_summaries(first, end, done))
+
+
+# --- Wardens ---
+
+def _hostel_summary(warden, first, end):
+    residents = {
+        resident_id: {'username': username, **_empty_totals()}
+        for resident_id, username in CustomUser.objects.filter(
+            warden_id=warden['id'], user_type='resident'
+        ).values_list('id', 'username').order_by('username')
+    }
+    meals = defaultdict(lambda: {'ordered': 0, 'delivered': 0})
+    counts = {'meals_ordered': Count('id', filter=~CANCELLED), 'meals_delivered': Count('id', filter=DELIVERED),
+              'meals_cancelled': Count('id', filter=CANCELLED)}
+    month = Q(user__warden_id=warden['id'], order_date__gte=first, order_date__lt=end)
+
+    live = DailyOrder.objects.filter(month).values('user_id', 'meal_type__name').annotate(**counts).order_by()
+    archived = DailyOrderArchive.objects.filter(month).values('user_id', 'meal_type__name').annotate(
+        **counts, order_value=Sum('total_cost', filter=~CANCELLED)
+    ).order_by()
+    live_values = DailyOrderItem.objects.filter(
+        daily_order__user__warden_id=warden['id'], daily_order__order_date__gte=first,
+        daily_order__order_date__lt=end,
+    ).exclude(daily_order__status='cancelled').values('daily_order__user_id').annotate(
+        order_value=Sum(LINE_TOTAL)
+    ).values_list('daily_order__user_id', 'order_value').order_by()
+    payments = Payment.objects.filter(
+        user__warden_id=warden['id'], is_successful=True,
+        payment_date__gte=_aware(first), payment_date__lt=_aware(end),
+    ).values('user_id').annotate(paid=Sum('amount')).values_list('user_id', 'paid').order_by()
+
+    for row in [*live, *archived]:
+        resident = residents.get(row['user_id'])
+        if resident is None:
+            continue
+        for field in counts:
+            resident[field] += row[field]
+        resident['order_value'] += row.get('order_value') or 0
+        meals[row['meal_type__name']]['ordered'] += row['meals_ordered']
+        meals[row['meal_type__name']]['delivered'] += row['meals_delivered']
+    for field, rows in (('order_value', live_values), ('paid', payments)):
+        for user_id, amount in rows:
+            if user_id in residents:
+                residents[user_id][field] += amount
+
+    totals = _empty_totals()
+    for resident in residents.values():
+        for field in totals:
+            totals[field] += resident[field]
+    bulk = BulkOrder.objects.filter(
+        warden_id=warden['id'], order_date__gte=first, order_date__lt=end
+    ).exclude(status='cancelled').aggregate(count=Count('id'), cost=Sum('total_cost'))
+
+    return {
+        'warden': warden, 'month': first, 'residents': list(residents.values()), 'totals': totals,
+        'meals': sorted(meals.items()), 'bulk_orders': bulk['count'],
+        'bulk_cost': Decimal(bulk['cost'] or 0).quantize(Decimal('0.01')),
+    }
+
+
+def _warden_summaries(first, end, done):
+    for warden in CustomUser.objects.filter(user_type='warden').values('id', 'username').order_by('id'):
+        key = f'warden:{warden["id"]}'
+        if key not in done:
+            with use_shard(_database(warden['id'])):
+                yield key, _hostel_summary(warden, first, end)
+
+
+# --- Rendering and storage ---
+
+TEMPLATES = {'resident': 'food_delivery/statements/resident.html', 'warden': 'food_delivery/statements/warden.html'}
+
+
+def render_statement(key, data, directory):
+    """Render one statement into its content-addressed file under
+    ``directory``. Returns its manifest entry. Runs in the worker processes."""
+    content = render_to_string(TEMPLATES[key.partition(':')[0]], data).encode()
+    digest = hashlib.sha256(content).hexdigest()
+    path = os.path.join(directory, digest[:2], f'{digest}.html')
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f'{path}.{os.getpid()}.tmp'
+        with open(partial, 'wb') as f:
+            f.write(content)
+        os.replace(partial, path)
+    return {'statement': key, 'sha256': digest, 'file': os.path.relpath(path, directory), 'bytes': len(content)}
+
+
+def _init_worker():
+    # Forked workers inherit the configured project; spawned ones set it up
+    django.setup()
+
+
+def read_manifest(directory):
+    """{statement key: manifest entry} for statements whose file exists. A
+    line cut short by an interruption is ignored."""
+    entries = {}
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return entries
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if os.path.exists(os.path.join(directory, entry['file'])):
+            entries[entry['statement']] = entry
+    return entries
+
+
+def _end_last_line(path):
+    # A line cut short by an interruption must not swallow the next entry
+    with open(path, 'ab+') as f:
+        if f.seek(0, os.SEEK_END):
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+
+
+def _submit(pool, *args):
+    if pool is not None:
+        return pool.submit(render_statement, *args)
+    future = Future()
+    future.set_result(render_statement(*args))
+    return future
+
+
+def generate(month, out_dir, workers=1, chunk_size=CHUNK_SIZE, fresh=False):
+    """Write the statements for the month containing ``month`` into
+    ``out_dir/<YYYY-MM>/``. Returns (statements written, statements already
+    there)."""
+    first, end = month_bounds(month)
+    directory = os.path.join(out_dir, f'{first:%Y-%m}')
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST)
+    if fresh and os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    done = read_manifest(directory)
+
+    written = 0
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 1 else None
+    try:
+        _end_last_line(manifest_path)
+        with open(manifest_path, 'a') as manifest:
+            def drain(futures):
+                nonlocal written
+                for future in futures:
+                    manifest.write(json.dumps(future.result()) + '\n')
+                    written += 1
+                manifest.flush()
+                os.fsync(manifest.fileno())
+
+            pending = []
+            for chunk in _chunks(first, end, done, chunk_size):
+                # Render this chunk while the previous one is recorded and the next one read
+                submitted = [_submit(pool, key, data, directory) for key, data in chunk]
+                drain(pending)
+                pending = submitted
+            drain(pending)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return written, len(done)
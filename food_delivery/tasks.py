@@ -0,0 +1,186 @@
+# food_delivery/tasks.py
+"""A small durable task queue stored in the BackgroundTask table.
+
+Register a function with ``@task`` and queue it with ``enqueue(func, *args)``
+(or ``func.enqueue(*args)``); the ``run_worker`` management command executes
+queued rows. Arguments must be JSON-serialisable.
+
+Workers claim a row with a conditional UPDATE (``status='queued'`` -> ``'running'``),
+so only one worker holds it at a time, even on SQLite. The claim is a lease: the
+worker renews ``locked_at`` with ``heartbeat()`` while the task runs, and a row
+whose lease has not been renewed for LEASE_TIMEOUT is taken to belong to a dead
+worker and goes back on the queue. Every claim counts as an attempt, so a task
+that keeps killing its worker fails for good after max_attempts. The outcome is
+only recorded by the claim that still holds the row, so a worker that lost its
+lease cannot finish a task someone else has picked up again. Tasks still run
+at least once rather than exactly once (a worker can die after the work but
+before recording it), so they should be safe to repeat.
+
+Failures are retried with exponential backoff until max_attempts is reached.
+Recurring jobs come from settings.TASK_SCHEDULE and are de-duplicated per time
+slot through unique_key.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_SECONDS = 30
+# Running workers renew their claims this often...
+HEARTBEAT_SECONDS = 60
+# ...and a claim not renewed for this long belongs to a dead worker
+LEASE_TIMEOUT = timedelta(minutes=5)
+
+_registry = {}
+
+
+def task(func):
+    """Register ``func`` so it can be enqueued and run by a worker."""
+    name = f'{func.__module__}.{func.__name__}'
+    _registry[name] = func
+    func.task_name = name
+    func.enqueue = lambda *args, **kwargs: enqueue(name, *args, **kwargs)
+    return func
+
+
+def enqueue(func, *args, run_at=None, max_attempts=3, unique_key=None, **kwargs):
+    """Queue ``func`` (a registered function or its dotted name). Returns the
+    BackgroundTask, or None if ``unique_key`` was already queued."""
+    name = func if isinstance(func, str) else func.task_name
+    try:
+        # Savepoint, so a duplicate unique_key doesn't break the caller's transaction
+        with transaction.atomic():
+            return BackgroundTask.objects.create(
+                task_name=name,
+                args=list(args),
+                kwargs=kwargs,
+                run_at=run_at or timezone.now(),
+                max_attempts=max_attempts,
+                unique_key=unique_key,
+            )
+    except IntegrityError:
+        if unique_key is None:
+            raise
+        return None
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim_tasks(limit, claimed_by):
+    """Claim up to ``limit`` due tasks for this worker and return their ids."""
+    now = timezone.now()
+    candidates = BackgroundTask.objects.filter(
+        status='queued', run_at__lte=now
+    ).order_by('run_at', 'id').values_list('id', flat=True)[:limit * 2]
+
+    claimed = []
+    for task_id in candidates:
+        # Only one worker's UPDATE can still see status='queued'
+        won = BackgroundTask.objects.filter(id=task_id, status='queued').update(
+            status='running', locked_by=claimed_by, locked_at=now, attempts=F('attempts') + 1
+        )
+        if won:
+            claimed.append(task_id)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def heartbeat(task_ids, claimed_by):
+    """Renew this worker's claims on ``task_ids``. Returns how many it still holds."""
+    return BackgroundTask.objects.filter(
+        id__in=task_ids, status='running', locked_by=claimed_by
+    ).update(locked_at=timezone.now())
+
+
+def execute_task(task_id, claimed_by):
+    """Run one task claimed by ``claimed_by`` and record the outcome. Safe to
+    call from threads or worker processes; each call cleans up its own database
+    connection. Returns True on success."""
+    try:
+        row = BackgroundTask.objects.get(id=task_id)
+        # This claim, and no later one: the row as it was when we got it
+        ours = BackgroundTask.objects.filter(id=task_id, status='running', locked_by=claimed_by, attempts=row.attempts)
+        try:
+            func = _resolve(row.task_name)
+            func(*row.args, **row.kwargs)
+        except Exception:
+            error = traceback.format_exc()
+            if row.attempts < row.max_attempts:
+                delay = RETRY_BASE_SECONDS * 2 ** (row.attempts - 1)
+                recorded = ours.update(
+                    status='queued', run_at=timezone.now() + timedelta(seconds=delay),
+                    locked_by='', locked_at=None, last_error=error
+                )
+                logger.warning("Task %s #%s failed (attempt %s), retrying in %ss", row.task_name, task_id, row.attempts, delay)
+            else:
+                recorded = ours.update(status='failed', finished_at=timezone.now(), last_error=error)
+                logger.error("Task %s #%s failed permanently", row.task_name, task_id)
+            if not recorded:
+                logger.warning("Task %s #%s lost its lease; outcome not recorded", row.task_name, task_id)
+            return False
+        if not ours.update(status='done', finished_at=timezone.now()):
+            logger.warning("Task %s #%s finished after losing its lease; outcome not recorded", row.task_name, task_id)
+        return True
+    finally:
+        close_old_connections()
+
+
+def requeue_stale(now=None):
+    """Release running rows whose lease has expired: back on the queue, or
+    failed if the dead claim was their last attempt. Returns the rows released."""
+    now = now or timezone.now()
+    stale = BackgroundTask.objects.filter(status='running', locked_at__lt=now - LEASE_TIMEOUT)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=now, locked_by='', locked_at=None,
+        last_error='Worker stopped renewing its lease (crashed or killed) on the last attempt.'
+    )
+    return failed + stale.update(status='queued', locked_by='', locked_at=None)
+
+
+def enqueue_scheduled(now=None):
+    """Queue every TASK_SCHEDULE entry whose current slot has no row yet.
+    Any number of workers may call this; unique_key lets only one insert win."""
+    now = now or timezone.now()
+    queued = 0
+    for key, entry in getattr(settings, 'TASK_SCHEDULE', {}).items():
+        every = int(entry['every'])
+        slot = int(now.timestamp()) // every
+        if enqueue(entry['task'], *entry.get('args', []), unique_key=f'schedule:{key}:{slot}', **entry.get('kwargs', {})):
+            queued += 1
+    return queued
+
+
+def _resolve(name):
+    if name not in _registry:
+        # Importing the module runs its @task decorators
+        import_string(name)
+    if name not in _registry:
+        raise LookupError(f'{name} is not a registered task')
+    return _registry[name]
+
+
+# --- Built-in tasks ---
+
+@task
+def run_command(command_name, *args, **options):
+    """Run a management command, e.g. from TASK_SCHEDULE."""
+    call_command(command_name, *args, **options)
+
+
+@task
+def purge_finished_tasks(days=7):
+    cutoff = timezone.now() - timedelta(days=days)
+    BackgroundTask.objects.filter(status__in=['done', 'failed'], finished_at__lt=cutoff).delete()
@@ -0,0 +1,11 @@
+from django import template
+from food_delivery.reference import meal_type_name as _meal_type_name
+
+register = template.Library()
+
+
+@register.filter
+def meal_type_name(meal_type_id):
+    """{{ order.meal_type_id|meal_type_name }}: the name from the reference
+    registry, so the page doesn't need the meal type joined in."""
+    return _meal_type_name(meal_type_id)
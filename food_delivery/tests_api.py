@@ -0,0 +1,187 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from . import usage
+from .models import (
+    CustomUser, MealType, SubscriptionPlan, UserSubscription, VendorMenuItem, DailyMenu, DailyOrder, DailyOrderItem
+)
+
+class ApiTest(TestCase):
+    def setUp(self):
+        self.resident = CustomUser.objects.create_user(username='resident1', password='x', user_type='resident')
+        self.vendor = CustomUser.objects.create_user(username='vendor1', password='x', user_type='vendor')
+        self.agent = CustomUser.objects.create_user(username='agent1', password='x', user_type='delivery_agent')
+        self.lunch = MealType.objects.create(name='Lunch')
+        self.dinner = MealType.objects.create(name='Dinner')
+        self.dosa = VendorMenuItem.objects.create(vendor=self.vendor, name='Dosa', price=Decimal('40.00'), meal_type='lunch')
+        self.rice = VendorMenuItem.objects.create(vendor=self.vendor, name='Rice', price=Decimal('30.00'), meal_type='dinner')
+        DailyMenu.objects.create(vendor=self.vendor, meal_type=self.lunch).available_items.add(self.dosa)
+        DailyMenu.objects.create(vendor=self.vendor, meal_type=self.dinner).available_items.add(self.rice)
+
+        self.orders = []
+        for day in range(5):
+            order = DailyOrder.objects.create(user=self.resident, meal_type=self.lunch, delivery_agent=self.agent,
+                                              order_date=date.today() + timedelta(days=day))
+            DailyOrderItem.objects.create(daily_order=order, menu_item=self.dosa, quantity=2, price_at_order_time=Decimal('40.00'))
+            self.orders.append(order)
+
+    def test_menu_today_grouped_by_meal_type(self):
+        self.client.force_login(self.resident)
+        data = self.client.get(reverse('api_v1_menu_today'), {'fields': 'name,price'}).json()
+        self.assertEqual(data['meal_types'], {
+            'Dinner': [{'name': 'Rice', 'price': '30.00'}],
+            'Lunch': [{'name': 'Dosa', 'price': '40.00'}],
+        })
+
+    def test_upcoming_orders_paginate_with_cursor(self):
+        self.client.force_login(self.resident)
+        url = reverse('api_v1_upcoming_orders')
+        first = self.client.get(url, {'limit': 3}).json()
+        second = self.client.get(url, {'limit': 3, 'cursor': first['next']}).json()
+
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(ids, [order.id for order in self.orders])
+        self.assertIsNone(second['next'])
+        self.assertEqual(first['results'][0]['items'], [{'id': self.dosa.id, 'name': 'Dosa', 'quantity': 2, 'price': '40.00'}])
+
+    def test_field_selection(self):
+        self.client.force_login(self.resident)
+        url = reverse('api_v1_upcoming_orders')
+        data = self.client.get(url, {'fields': 'status', 'limit': 1}).json()
+        self.assertEqual(data['results'], [{'status': 'submitted'}])
+
+        response = self.client.get(url, {'fields': 'status,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_etag_allows_304(self):
+        self.client.force_login(self.resident)
+        url = reverse('api_v1_upcoming_orders')
+        response = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        DailyOrder.objects.filter(id=self.orders[0].id).update(status='prepared')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_subscription_status(self):
+        plan = SubscriptionPlan.objects.create(name='Monthly', base_price=Decimal('1500.00'), duration_days=30)
+        plan.meal_types_included.add(self.lunch)
+        UserSubscription.objects.create(user=self.resident, plan=plan, end_date=date.today() + timedelta(days=3))
+        UserSubscription.objects.create(user=self.resident, plan=plan, end_date=date.today() - timedelta(days=3))
+        self.client.force_login(self.resident)
+
+        data = self.client.get(reverse('api_v1_subscriptions'), {'fields': 'plan,live,meal_types'}).json()
+        self.assertEqual(data['results'], [
+            {'plan': 'Monthly', 'live': True, 'meal_types': ['Lunch']},
+            {'plan': 'Monthly', 'live': False, 'meal_types': ['Lunch']},
+        ])
+
+    def test_agent_assignments_and_permissions(self):
+        url = reverse('api_v1_agent_assignments')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(self.resident)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(self.agent)
+        data = self.client.get(url, {'fields': 'id,resident'}).json()
+        self.assertEqual(data['results'][0], {'id': self.orders[0].id, 'resident': 'resident1'})
+        self.assertEqual(len(data['results']), 5)
+
+
+@override_settings(NOTIFICATION_WORKER=False)
+class AgentManifestTest(TestCase):
+    def setUp(self):
+        self.agent = CustomUser.objects.create_user(username='agent1', password='x', user_type='delivery_agent')
+        vendor = CustomUser.objects.create_user(username='vendor1', password='x', user_type='vendor')
+        lunch = MealType.objects.create(name='Lunch')
+        dosa = VendorMenuItem.objects.create(vendor=vendor, name='Dosa', price=Decimal('40.00'), meal_type='lunch')
+        idli = VendorMenuItem.objects.create(vendor=vendor, name='Idli', price=Decimal('20.00'), meal_type='lunch')
+        self.orders = []
+        for room in range(3):
+            resident = CustomUser.objects.create_user(
+                username=f'resident{room}', password='x', user_type='resident',
+                address=f'Block A, Room {room}', phone_number=f'98000000{room}'
+            )
+            order = DailyOrder.objects.create(user=resident, meal_type=lunch, order_date=date.today(),
+                                              delivery_agent=self.agent, status='prepared')
+            DailyOrderItem.objects.create(daily_order=order, menu_item=dosa, quantity=1)
+            DailyOrderItem.objects.create(daily_order=order, menu_item=idli, quantity=2)
+            self.orders.append(order)
+        self.client.force_login(self.agent)
+
+    def test_manifest_in_one_query_plus_prefetch(self):
+        url = reverse('api_v1_agent_manifest')
+        self.client.get(url)  # session and user lookups are cached after this
+        with self.assertNumQueries(3):  # user, orders, items
+            response = self.client.get(url, {'meal_type': 'lunch'})
+
+        data = response.json()
+        self.assertIn('max-age=60', response['Cache-Control'])
+        self.assertEqual(data['counts'], {'prepared': 3})
+        stop = data['orders'][0]
+        self.assertEqual(stop['database'], 'default')
+        self.assertEqual(stop['resident']['address'], 'Block A, Room 0')
+        self.assertEqual(stop['resident']['phone_number'], '980000000')
+        self.assertEqual(stop['items'], [{'name': 'Dosa', 'quantity': 1}, {'name': 'Idli', 'quantity': 2}])
+
+    def test_bulk_status_applies_in_route_order(self):
+        first, second, third = self.orders
+        DailyOrder.objects.filter(id=third.id).update(status='delivered')
+        body = {'updates': [
+            {'id': first.id, 'status': 'delivered'},
+            {'id': first.id, 'status': 'out_for_delivery'},
+            {'id': second.id, 'status': 'out_for_delivery'},
+            {'id': third.id, 'status': 'reached_location'},
+        ]}
+        data = self.client.post(reverse('api_v1_agent_bulk_status'), body, content_type='application/json').json()
+
+        self.assertEqual(data['applied'], [
+            {'id': first.id, 'database': 'default', 'status': 'out_for_delivery'},
+            {'id': second.id, 'database': 'default', 'status': 'out_for_delivery'},
+            {'id': first.id, 'database': 'default', 'status': 'delivered'},
+        ])
+        self.assertEqual(data['skipped'], [{'id': third.id, 'database': 'default', 'status': 'reached_location',
+                                            'current_status': 'delivered'}])
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'delivered')
+        self.assertIsNotNone(first.delivered_time)
+
+    def test_bulk_status_ignores_other_agents_orders(self):
+        other = CustomUser.objects.create_user(username='agent2', password='x', user_type='delivery_agent')
+        self.client.force_login(other)
+        body = {'updates': [{'id': self.orders[0].id, 'status': 'out_for_delivery'}]}
+        data = self.client.post(reverse('api_v1_agent_bulk_status'), body, content_type='application/json').json()
+        self.assertEqual(data['applied'], [])
+        self.assertEqual(DailyOrder.objects.get(id=self.orders[0].id).status, 'prepared')
+
+    def test_bulk_status_does_not_overwrite_a_concurrent_cancellation(self):
+        order = self.orders[0]
+        read_rows = usage._locked_rows
+
+        def cancel():
+            DailyOrder.objects.filter(id=order.id).update(status='cancelled')
+
+        # Another writer cancels the order between the read and the UPDATE. It is the
+        # same connection here, so the retry after the rollback has to see it again
+        reads = iter([
+            lambda orders: (read_rows(orders), cancel())[0],
+            lambda orders: (cancel(), read_rows(orders))[1],
+        ])
+        body = {'updates': [{'id': order.id, 'status': 'out_for_delivery'}]}
+        with mock.patch.object(usage, '_locked_rows', side_effect=lambda orders: next(reads)(orders)):
+            data = self.client.post(reverse('api_v1_agent_bulk_status'), body, content_type='application/json').json()
+
+        self.assertEqual(data['applied'], [])
+        self.assertEqual(data['skipped'], [{'id': order.id, 'database': 'default', 'status': 'out_for_delivery',
+                                            'current_status': 'cancelled'}])
+
+    def test_bulk_status_rejects_bad_payload(self):
+        response = self.client.post(reverse('api_v1_agent_bulk_status'), {'updates': [{'id': 1, 'status': 'eaten'}]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('api_v1_agent_bulk_status'),
+                                    {'updates': [{'id': 1, 'database': 'tenant_999', 'status': 'delivered'}]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,73 @@
+import gzip
+import os
+import shutil
+import tempfile
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.utils.http import http_date
+
+class StaticAssetTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(STATIC_ROOT=cls.static_root))
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.static_root)
+
+    def hashed_path(self):
+        url = staticfiles_storage.url('food_delivery/css/dashboard.css')
+        self.assertRegex(url, r'^/static/food_delivery/css/dashboard\.[0-9a-f]{12}\.css$')
+        return url
+
+    def test_hashed_file_is_served_compressed_and_immutable(self):
+        url = self.hashed_path()
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        with open(os.path.join(self.static_root, url[len('/static/'):]), 'rb') as f:
+            self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), f.read())
+
+    def test_identity_when_client_does_not_accept_gzip(self):
+        response = self.client.get(self.hashed_path(), HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn(b'.dash-card', b''.join(response.streaming_content))
+
+    def test_unhashed_name_is_only_cached_briefly(self):
+        response = self.client.get('/static/food_delivery/css/dashboard.css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+
+
+class MediaAssetTest(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        os.makedirs(os.path.join(self.media_root, 'menu_items'))
+        self.image = os.path.join(self.media_root, 'menu_items', 'dosa.png')
+        with open(self.image, 'wb') as f:
+            f.write(b'\x89PNG fake image')
+        override = override_settings(MEDIA_ROOT=self.media_root, SERVE_MEDIA=True)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_media_is_served_with_conditional_get(self):
+        response = self.client.get('/media/menu_items/dosa.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=86400')
+
+        response = self.client.get('/media/menu_items/dosa.png',
+                                   HTTP_IF_MODIFIED_SINCE=http_date(os.path.getmtime(self.image)))
+        self.assertEqual(response.status_code, 304)
+
+    def test_path_traversal_is_not_served(self):
+        response = self.client.get('/media/../manage.py')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,149 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from .capacity import SoldOut, release_order, remaining_counts, reserve, set_capacities
+from .models import CustomUser, MealType, SubscriptionPlan, UserSubscription, VendorMenuItem, DailyMenu, \
+                    DailyMenuItem, DailyOrder, DailyOrderItem
+
+class CapacityFixture:
+    def setUp(self):
+        cache.clear()
+        self.today = date.today()
+        self.vendor = CustomUser.objects.create_user(username='vendor1', password='x', user_type='vendor')
+        self.lunch = MealType.objects.create(name='Lunch')
+        self.biryani = VendorMenuItem.objects.create(vendor=self.vendor, name='Biryani', price=Decimal('90.00'), meal_type='lunch')
+        self.raita = VendorMenuItem.objects.create(vendor=self.vendor, name='Raita', price=Decimal('10.00'), meal_type='lunch')
+        self.menu = DailyMenu.objects.create(vendor=self.vendor, meal_type=self.lunch, menu_date=self.today)
+        self.menu.available_items.add(self.biryani, self.raita)
+        set_capacities(self.menu, {self.biryani.id: 5, self.raita.id: None})
+
+    def remaining(self, item):
+        return DailyMenuItem.objects.get(daily_menu=self.menu, menu_item=item).remaining
+
+
+class CapacityTest(CapacityFixture, TestCase):
+    def test_reserve_takes_only_the_difference(self):
+        reserve(self.today, self.lunch.id, {self.biryani.id: 2, self.raita.id: 9})
+        self.assertEqual(self.remaining(self.biryani), 3)
+        self.assertIsNone(self.remaining(self.raita))
+
+        reserve(self.today, self.lunch.id, {self.biryani.id: 3}, previous={self.biryani.id: 2})
+        self.assertEqual(self.remaining(self.biryani), 2)
+        reserve(self.today, self.lunch.id, {}, previous={self.biryani.id: 3})
+        self.assertEqual(self.remaining(self.biryani), 5)
+
+    def test_sold_out_changes_nothing(self):
+        with self.assertRaises(SoldOut) as raised:
+            reserve(self.today, self.lunch.id, {self.biryani.id: 6})
+        self.assertEqual(raised.exception.menu_item_id, self.biryani.id)
+        self.assertEqual(self.remaining(self.biryani), 5)
+
+    def test_capacity_changes_keep_portions_already_taken(self):
+        reserve(self.today, self.lunch.id, {self.biryani.id: 2})
+        set_capacities(self.menu, {self.biryani.id: 8})
+        self.assertEqual(self.remaining(self.biryani), 6)
+
+        # Limiting an item that already has orders starts from what is left
+        resident = CustomUser.objects.create_user(username='resident1', password='x', user_type='resident')
+        order = DailyOrder.objects.create(user=resident, meal_type=self.lunch, order_date=self.today)
+        DailyOrderItem.objects.create(daily_order=order, menu_item=self.raita, quantity=4)
+        set_capacities(self.menu, {self.raita.id: 10})
+        self.assertEqual(self.remaining(self.raita), 6)
+
+    def test_remaining_counts_are_cached(self):
+        self.assertEqual(remaining_counts(self.today, self.lunch.id), {self.biryani.id: 5})
+        with self.assertNumQueries(0):
+            remaining_counts(self.today, self.lunch.id)
+
+
+@override_settings(NOTIFICATION_WORKER=False)
+class OrderCapacityViewTest(CapacityFixture, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.resident = CustomUser.objects.create_user(username='resident1', password='x', user_type='resident')
+        plan = SubscriptionPlan.objects.create(name='Monthly', duration_days=30)
+        plan.meal_types_included.add(self.lunch)
+        UserSubscription.objects.create(user=self.resident, plan=plan, is_paid=True,
+                                        start_date=self.today, end_date=self.today + timedelta(days=30))
+        self.url = reverse('resident_daily_order_select_with_date_meal', args=[self.lunch.id, self.today.isoformat()])
+        self.client.force_login(self.resident)
+
+    def test_over_ordering_is_refused(self):
+        self.assertContains(self.client.get(self.url), '5 left')
+        response = self.client.post(self.url, {f'quantity_{self.biryani.id}': 6})
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.assertFalse(DailyOrder.objects.exists())
+
+    def test_edit_and_cancellation_return_portions(self):
+        self.client.post(self.url, {f'quantity_{self.biryani.id}': 4})
+        self.assertEqual(self.remaining(self.biryani), 1)
+        self.client.post(self.url, {f'quantity_{self.biryani.id}': 2})
+        self.assertEqual(self.remaining(self.biryani), 3)
+
+        order = DailyOrder.objects.get()
+        self.client.force_login(self.vendor)
+        self.client.post(reverse('vendor_update_order_status', args=[order.id]), {'status': 'cancelled'})
+        self.assertEqual(self.remaining(self.biryani), 5)
+
+    def test_reopening_a_cancelled_order_takes_its_portions_again(self):
+        self.client.post(self.url, {f'quantity_{self.biryani.id}': 4})
+        order = DailyOrder.objects.get()
+        self.client.force_login(self.vendor)
+        status_url = reverse('vendor_update_order_status', args=[order.id])
+        self.client.post(status_url, {'status': 'cancelled'})
+        self.assertEqual(self.remaining(self.biryani), 5)
+
+        self.client.post(status_url, {'status': 'submitted'})
+        self.assertEqual(self.remaining(self.biryani), 1)
+
+        # Refused once someone else has taken the portions
+        self.client.post(status_url, {'status': 'cancelled'})
+        reserve(self.today, self.lunch.id, {self.biryani.id: 2})
+        response = self.client.post(status_url, {'status': 'submitted'})
+        self.assertContains(response, "there aren&#x27;t enough portions of Biryani left")
+        self.assertEqual(DailyOrder.objects.get().status, 'cancelled')
+        self.assertEqual(self.remaining(self.biryani), 3)
+
+    def test_ordering_again_reopens_a_cancelled_order(self):
+        self.client.post(self.url, {f'quantity_{self.biryani.id}': 4})
+        order = DailyOrder.objects.get()
+        DailyOrder.objects.filter(id=order.id).update(status='cancelled')
+        release_order(order)
+
+        response = self.client.post(self.url, {f'quantity_{self.biryani.id}': 1}, follow=True)
+        self.assertContains(response, 'Your cancelled order has been placed again.')
+        reopened = DailyOrder.objects.get()
+        self.assertEqual((reopened.id, reopened.status), (order.id, 'submitted'))
+        self.assertEqual(list(reopened.items.values_list('quantity', flat=True)), [1])
+        self.assertEqual(self.remaining(self.biryani), 4)
+
+
+class DailyMenuFormTest(CapacityFixture, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.vendor)
+        self.url = reverse('vendor_daily_menu_create_update')
+
+    def test_saved_limits_are_filled_in(self):
+        response = self.client.get(self.url, {'menu_date': self.today.isoformat(), 'meal_type': self.lunch.id})
+        self.assertContains(response, f'name="capacity_{self.biryani.id}" value="5"')
+        self.assertContains(response, f'name="capacity_{self.raita.id}" value=""')
+
+    def test_limits_not_submitted_are_kept(self):
+        reserve(self.today, self.lunch.id, {self.biryani.id: 2})
+        self.client.post(self.url, {
+            'menu_date': self.today.isoformat(), 'meal_type': self.lunch.id,
+            'available_items': [self.biryani.id, self.raita.id], f'capacity_{self.raita.id}': '7',
+        })
+        self.assertEqual(self.remaining(self.biryani), 3)
+        self.assertEqual(self.remaining(self.raita), 7)
+
+        # A blank field is what lifts a limit
+        self.client.post(self.url, {
+            'menu_date': self.today.isoformat(), 'meal_type': self.lunch.id,
+            'available_items': [self.biryani.id, self.raita.id], f'capacity_{self.biryani.id}': '',
+        })
+        self.assertIsNone(self.remaining(self.biryani))
+        self.assertEqual(self.remaining(self.raita), 7)
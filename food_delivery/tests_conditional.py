@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .models import CustomUser, MealType, SubscriptionPlan, UserSubscription, DailyOrder
+
+class UpdatedAtTest(TestCase):
+    def setUp(self):
+        self.resident = CustomUser.objects.create_user(username='resident1', password='x', user_type='resident')
+        self.order = DailyOrder.objects.create(user=self.resident, meal_type=MealType.objects.create(name='Lunch'))
+        self.stale = timezone.now() - timedelta(days=1)
+        DailyOrder.objects.filter(id=self.order.id).update(updated_at=self.stale)
+
+    def test_queryset_update_stamps_rows(self):
+        DailyOrder.objects.filter(id=self.order.id).update(status='prepared')
+        self.order.refresh_from_db()
+        self.assertGreater(self.order.updated_at, self.stale)
+
+    def test_bulk_update_stamps_rows(self):
+        self.order.status = 'prepared'
+        DailyOrder.objects.bulk_update([self.order], ['status'])
+        self.order.refresh_from_db()
+        self.assertGreater(self.order.updated_at, self.stale)
+
+    def test_expire_lapsed_stamps_subscriptions(self):
+        plan = SubscriptionPlan.objects.create(name='Monthly', duration_days=30)
+        sub = UserSubscription.objects.create(user=self.resident, plan=plan, end_date=date.today() - timedelta(days=1))
+        UserSubscription.objects.filter(id=sub.id).update(updated_at=self.stale)
+        UserSubscription.objects.expire_lapsed()
+        sub.refresh_from_db()
+        self.assertEqual(sub.status, 'expired')
+        self.assertGreater(sub.updated_at, self.stale)
+
+
+@override_settings(NOTIFICATION_WORKER=False)
+class ConditionalPageTest(TestCase):
+    def setUp(self):
+        self.resident = CustomUser.objects.create_user(username='resident1', password='x', user_type='resident')
+        self.agent = CustomUser.objects.create_user(username='agent1', password='x', user_type='delivery_agent')
+        self.order = DailyOrder.objects.create(user=self.resident, meal_type=MealType.objects.create(name='Lunch'),
+                                               delivery_agent=self.agent, status='prepared')
+
+    def test_live_tracking_answers_304_until_the_order_changes(self):
+        self.client.force_login(self.resident)
+        url = reverse('resident_live_tracking', args=[self.order.id])
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.templates)
+
+        DailyOrder.objects.filter(id=self.order.id).update(status='out_for_delivery')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_other_users_order_is_still_404(self):
+        other = CustomUser.objects.create_user(username='resident2', password='x', user_type='resident')
+        self.client.force_login(other)
+        response = self.client.get(reverse('resident_live_tracking', args=[self.order.id]), HTTP_IF_NONE_MATCH='"x"')
+        self.assertEqual(response.status_code, 404)
+
+    def test_dashboard_etag_differs_per_login(self):
+        self.client.force_login(self.resident)
+        etag = self.client.get(reverse('dashboard'))['ETag']
+        self.assertEqual(self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.force_login(self.resident)  # a new login rotates the CSRF token
+        self.assertEqual(self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    async def test_agent_orders_304_and_flash_messages(self):
+        await self.async_client.aforce_login(self.agent)
+        url = reverse('delivery_agent_orders')
+        etag = (await self.async_client.get(url))['ETag']
+        self.assertEqual((await self.async_client.get(url, headers={'If-None-Match': etag})).status_code, 304)
+
+        # Accepting changes the order and leaves a message: the page is rendered, without validators
+        await self.async_client.get(reverse('delivery_accept_order', args=[self.order.id]))
+        response = await self.async_client.get(url, headers={'If-None-Match': etag})
+        self.assertContains(response, 'Order accepted')
+        self.assertFalse(response.has_header('ETag'))
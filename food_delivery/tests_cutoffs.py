@@ -0,0 +1,142 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from .cutoffs import freeze_due_slots, is_slot_open, slot_closes_at
+from .models import CustomUser, MealType, VendorMenuItem, DailyOrder, DailyOrderItem, DemandSnapshot, BulkOrder, \
+                    BulkOrderItem
+
+def at(day, hour, minute=0):
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+
+class SlotCutoffTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = date(2026, 3, 10)
+        self.lunch = MealType.objects.create(name='Lunch', order_cutoff=time(10, 30))
+        self.breakfast = MealType.objects.create(name='Breakfast', order_cutoff=time(21, 0), cutoff_days_before=1)
+        self.snacks = MealType.objects.create(name='Snacks')
+
+    def test_slots_close_at_their_cutoff(self):
+        self.assertTrue(is_slot_open(self.lunch.id, self.today, now=at(self.today, 10, 29)))
+        self.assertFalse(is_slot_open(self.lunch.id, self.today, now=at(self.today, 10, 30)))
+        # Breakfast closes the evening before
+        tomorrow = self.today + timedelta(days=1)
+        self.assertEqual(slot_closes_at(self.breakfast.id, tomorrow), at(self.today, 21))
+        self.assertFalse(is_slot_open(self.breakfast.id, tomorrow, now=at(self.today, 22)))
+        # No cutoff: open all day, but never for past dates
+        self.assertTrue(is_slot_open(self.snacks.id, self.today, now=at(self.today, 23)))
+        self.assertFalse(is_slot_open(self.snacks.id, self.today - timedelta(days=1), now=at(self.today, 8)))
+
+    def test_cutoffs_are_cached_until_a_meal_type_changes(self):
+        is_slot_open(self.lunch.id, self.today)
+        with self.assertNumQueries(0):
+            is_slot_open(self.lunch.id, self.today)
+
+        self.lunch.order_cutoff = time(11, 0)
+        self.lunch.save()
+        self.assertTrue(is_slot_open(self.lunch.id, self.today, now=at(self.today, 10, 45)))
+
+
+class LateOrderTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.resident = CustomUser.objects.create_user(username='resident1', password='x', user_type='resident')
+        # Closes at midnight on the day itself, so today's slot is always closed
+        self.lunch = MealType.objects.create(name='Lunch', order_cutoff=time(0, 0))
+        self.client.force_login(self.resident)
+
+    def test_post_after_cutoff_is_rejected_without_order_queries(self):
+        url = reverse('resident_daily_order_select_with_date_meal', args=[self.lunch.id, date.today().isoformat()])
+        self.client.get(reverse('home'))
+        is_slot_open(self.lunch.id, date.today())  # warm the cutoff cache
+        with self.assertNumQueries(1):  # the session's user
+            response = self.client.post(url, {'quantity_1': 2})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertFalse(DailyOrder.objects.exists())
+
+    def test_past_dates_are_rejected(self):
+        yesterday = (date.today() - timedelta(days=1)).isoformat()
+        url = reverse('resident_daily_order_select_with_date_meal', args=[self.lunch.id, yesterday])
+        response = self.client.get(url)
+        self.assertRedirects(response, reverse('resident_daily_order_select'), fetch_redirect_response=False)
+
+    def test_bulk_orders_for_closed_or_past_slots_are_rejected(self):
+        warden = CustomUser.objects.create_user(username='warden1', password='x', user_type='warden')
+        vendor = CustomUser.objects.create_user(username='vendor1', password='x', user_type='vendor')
+        thali = VendorMenuItem.objects.create(vendor=vendor, name='Thali', price=Decimal('80.00'), meal_type='lunch')
+        snacks = MealType.objects.create(name='Snacks')
+        self.client.force_login(warden)
+        url = reverse('warden_bulk_order')
+        for meal_type, day in [(self.lunch, date.today()), (snacks, date.today() - timedelta(days=1))]:
+            response = self.client.post(url, {'meal_type': meal_type.id, 'order_date': day.isoformat(), 'items': [thali.id]})
+            self.assertEqual(response.status_code, 200)
+        self.assertFalse(BulkOrder.objects.exists())
+
+        response = self.client.post(url, {'meal_type': snacks.id, 'order_date': date.today().isoformat(), 'items': [thali.id]})
+        self.assertRedirects(response, reverse('warden_dashboard'), fetch_redirect_response=False)
+        self.assertEqual(BulkOrder.objects.get().meal_type, snacks)
+
+
+class DemandSnapshotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.day = date(2026, 3, 10)
+        self.vendor = CustomUser.objects.create_user(username='vendor1', password='x', user_type='vendor')
+        self.lunch = MealType.objects.create(name='Lunch', order_cutoff=time(10, 30))
+        self.thali = VendorMenuItem.objects.create(vendor=self.vendor, name='Thali', price=Decimal('80.00'), meal_type='lunch')
+        self.curd = VendorMenuItem.objects.create(vendor=self.vendor, name='Curd', price=Decimal('15.00'), meal_type='lunch')
+        for number, status in enumerate(['submitted', 'prepared', 'cancelled']):
+            resident = CustomUser.objects.create_user(username=f'resident{number}', password='x', user_type='resident')
+            order = DailyOrder.objects.create(user=resident, meal_type=self.lunch, order_date=self.day, status=status)
+            DailyOrderItem.objects.create(daily_order=order, menu_item=self.thali, quantity=2)
+            if number == 0:
+                DailyOrderItem.objects.create(daily_order=order, menu_item=self.curd, quantity=1)
+
+    def test_slot_is_frozen_once_after_its_cutoff(self):
+        self.assertEqual(freeze_due_slots(now=at(self.day, 10, 0), days_back=0), [])
+
+        [snapshot] = freeze_due_slots(now=at(self.day, 10, 31), days_back=0)
+        self.assertEqual(snapshot.order_count, 2)
+        self.assertEqual(
+            sorted(snapshot.items.values_list('menu_item__name', 'order_count', 'quantity')),
+            [('Curd', 1, 1), ('Thali', 2, 4)]
+        )
+
+        # Later changes don't touch the frozen numbers
+        DailyOrder.objects.filter(order_date=self.day).update(status='cancelled')
+        self.assertEqual(freeze_due_slots(now=at(self.day, 12, 0), days_back=0), [])
+        self.assertEqual(DemandSnapshot.objects.get().items.get(menu_item=self.thali).quantity, 4)
+
+    def test_production_sheet_reads_the_snapshot(self):
+        freeze_due_slots(now=at(self.day, 11, 0), days_back=0)
+        self.client.force_login(self.vendor)
+        response = self.client.get(reverse('vendor_production_sheet'), {'date': self.day.isoformat()})
+        self.assertContains(response, 'Thali')
+        self.assertContains(response, '<strong>4</strong>', html=True)
+
+    def test_bulk_orders_are_frozen_with_the_slot(self):
+        warden = CustomUser.objects.create_user(username='warden1', password='x', user_type='warden')
+        bulk = BulkOrder.objects.create(warden=warden, meal_type=self.lunch, order_date=self.day)
+        BulkOrderItem.objects.create(bulk_order=bulk, menu_item=self.thali, quantity=30)
+
+        [snapshot] = freeze_due_slots(now=at(self.day, 11, 0), days_back=0)
+        self.assertEqual(snapshot.order_count, 3)
+        self.assertEqual(snapshot.items.get(menu_item=self.thali).quantity, 34)
+
+    def test_production_sheet_shows_live_demand_for_meals_without_a_cutoff(self):
+        snacks = MealType.objects.create(name='Snacks')
+        samosa = VendorMenuItem.objects.create(vendor=self.vendor, name='Samosa', price=Decimal('20.00'), meal_type='snacks')
+        resident = CustomUser.objects.get(username='resident0')
+        order = DailyOrder.objects.create(user=resident, meal_type=snacks, order_date=self.day)
+        DailyOrderItem.objects.create(daily_order=order, menu_item=samosa, quantity=3)
+
+        self.assertEqual(freeze_due_slots(now=at(self.day, 9, 0), days_back=0), [])
+        self.client.force_login(self.vendor)
+        response = self.client.get(reverse('vendor_production_sheet'), {'date': self.day.isoformat()})
+        self.assertContains(response, 'Samosa')
+        self.assertContains(response, '<strong>3</strong>', html=True)
+        self.assertNotContains(response, 'Thali')
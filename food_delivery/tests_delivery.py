@@ -0,0 +1,53 @@
+from datetime import date
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from .models import CustomUser, MealType, DailyOrder
+
+@override_settings(NOTIFICATION_WORKER=False)
+class AsyncDeliveryAgentViewsTest(TestCase):
+    def setUp(self):
+        self.agent = CustomUser.objects.create_user(username='agent1', password='password123', user_type='delivery_agent')
+        self.other_agent = CustomUser.objects.create_user(username='agent2', password='password123', user_type='delivery_agent')
+        self.resident = CustomUser.objects.create_user(username='resident1', password='password123', user_type='resident')
+        self.order = DailyOrder.objects.create(
+            user=self.resident,
+            meal_type=MealType.objects.create(name='Lunch'),
+            order_date=date.today(),
+            status='prepared',
+            delivery_agent=self.agent
+        )
+
+    async def test_agent_sees_assigned_orders(self):
+        await self.async_client.aforce_login(self.agent)
+        response = await self.async_client.get(reverse('delivery_agent_orders'))
+        self.assertContains(response, 'resident1')
+        self.assertContains(response, '1 Assigned')
+
+    async def test_accept_and_complete_order(self):
+        await self.async_client.aforce_login(self.agent)
+        response = await self.async_client.get(reverse('delivery_accept_order', args=[self.order.id]))
+        self.assertRedirects(response, reverse('delivery_agent_orders'), fetch_redirect_response=False)
+        await self.order.arefresh_from_db()
+        self.assertEqual(self.order.status, 'out_for_delivery')
+        self.assertIsNotNone(self.order.assigned_time)
+
+        await self.async_client.get(reverse('delivery_complete_order', args=[self.order.id]))
+        await self.order.arefresh_from_db()
+        self.assertEqual(self.order.status, 'delivered')
+        self.assertIsNotNone(self.order.delivered_time)
+
+    async def test_agent_cannot_touch_other_agents_order(self):
+        await self.async_client.aforce_login(self.other_agent)
+        response = await self.async_client.get(reverse('delivery_reached_location', args=[self.order.id]))
+        self.assertEqual(response.status_code, 404)
+        await self.order.arefresh_from_db()
+        self.assertEqual(self.order.status, 'prepared')
+
+    async def test_finished_orders_are_left_alone(self):
+        await DailyOrder.objects.filter(id=self.order.id).aupdate(status='cancelled')
+        await self.async_client.aforce_login(self.agent)
+        for name in ('delivery_accept_order', 'delivery_complete_order'):
+            response = await self.async_client.get(reverse(name, args=[self.order.id]))
+            self.assertEqual(response.status_code, 404)
+        await self.order.arefresh_from_db()
+        self.assertEqual(self.order.status, 'cancelled')
@@ -0,0 +1,62 @@
+from datetime import date, timedelta
+from decimal import Decimal
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from .archive import archive_orders
+from .forecasting import fit, load_history, refresh_forecasts
+from .models import CustomUser, MealType, SubscriptionPlan, UserSubscription, VendorMenuItem, \
+                    DailyOrder, DailyOrderItem, DemandForecast
+
+class FitTest(SimpleTestCase):
+    def test_weekday_pattern_and_subscriber_scaling(self):
+        # Four weeks starting on a Monday: 10 portions on Mondays, 2 otherwise, 10 subscribers throughout
+        quantities = np.array([[10.0 if day % 7 == 0 else 2.0 for day in range(28)]])
+        subscribers = np.full((1, 28 + 2), 10.0)
+        subscribers[0, 29] = 20  # the following Tuesday has twice the subscribers
+
+        monday, tuesday = fit(quantities, subscribers, first_weekday=0, horizon=2)[0]
+        self.assertAlmostEqual(monday, 10.0)
+        self.assertAlmostEqual(tuesday, 4.0)
+
+    def test_days_before_an_item_appeared_are_ignored(self):
+        quantities = np.zeros((2, 14))
+        quantities[0, :] = 3
+        quantities[1, 10:] = 3  # new item, ordered every day since it appeared
+        expected = fit(quantities, np.ones((2, 15)), first_weekday=0, horizon=1)
+        np.testing.assert_allclose(expected[:, 0], [3.0, 3.0])
+
+
+class RefreshForecastsTest(TestCase):
+    def test_forecasts_are_stored_and_shown_to_the_vendor(self):
+        vendor = CustomUser.objects.create_user(username='vendor1', password='x', user_type='vendor')
+        lunch = MealType.objects.create(name='Lunch')
+        plan = SubscriptionPlan.objects.create(name='Monthly', duration_days=30)
+        plan.meal_types_included.add(lunch)
+        thali = VendorMenuItem.objects.create(vendor=vendor, name='Thali', price=Decimal('80.00'), meal_type='lunch')
+        start = date.today() + timedelta(days=1)
+
+        for number in range(3):
+            resident = CustomUser.objects.create_user(username=f'resident{number}', password='x', user_type='resident')
+            UserSubscription.objects.create(user=resident, plan=plan, start_date=start - timedelta(days=30),
+                                            end_date=start + timedelta(days=30))
+            for days_ago in range(1, 15):
+                order = DailyOrder.objects.create(user=resident, meal_type=lunch, status='delivered',
+                                                  order_date=start - timedelta(days=days_ago))
+                DailyOrderItem.objects.create(daily_order=order, menu_item=thali, quantity=1)
+
+        # Archived orders are still history
+        self.assertEqual(archive_orders(start - timedelta(days=7)), 21)
+        keys, day_index, quantity = load_history(start - timedelta(days=14), start)
+        self.assertEqual((quantity.sum(), len(set(day_index))), (42, 14))
+
+        self.assertEqual(refresh_forecasts(start=start, horizon=2), 2)
+        self.assertEqual(list(DemandForecast.objects.order_by('day').values_list('quantity', flat=True)), [3, 3])
+        # A refit replaces the rows instead of adding to them
+        refresh_forecasts(start=start, horizon=2)
+        self.assertEqual(DemandForecast.objects.count(), 2)
+
+        self.client.force_login(vendor)
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'Expected Demand')
+        self.assertContains(response, '~3')
@@ -0,0 +1,88 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from .archive import MIN_CHUNK, archive_orders, restore_orders
+from .models import CustomUser, MealType, VendorMenuItem, DailyOrder, DailyOrderItem, DailyOrderArchive
+from .history import delivery_history_page
+
+class DeliveryHistoryPaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.resident = CustomUser.objects.create_user(username='resident1', password='password123', user_type='resident')
+        self.agent = CustomUser.objects.create_user(username='agent1', password='password123', user_type='delivery_agent')
+        vendor = CustomUser.objects.create_user(username='vendor1', password='password123', user_type='vendor')
+        item = VendorMenuItem.objects.create(vendor=vendor, name='Thali', price=Decimal('80.00'), meal_type='lunch')
+        lunch = MealType.objects.create(name='Lunch')
+        now = timezone.now()
+        for days_ago in range(60):
+            order = DailyOrder.objects.create(
+                user=self.resident, meal_type=lunch, delivery_agent=self.agent, status='delivered',
+                order_date=date.today() - timedelta(days=days_ago),
+                # every third order shares a timestamp to exercise the id tie-break
+                delivered_time=now - timedelta(days=days_ago - days_ago % 3),
+            )
+            DailyOrderItem.objects.create(daily_order=order, menu_item=item, quantity=1, price_at_order_time=item.price)
+        self.expected = list(
+            DailyOrder.objects.filter(user=self.resident).order_by('-delivered_time', '-id').values_list('id', flat=True)
+        )
+
+    def collect_pages(self, owner_field, user):
+        seen, cursor = [], None
+        while True:
+            page, cursor, total = delivery_history_page(owner_field, user, cursor, page_size=7)
+            seen.extend(order.id for order in page)
+            if cursor is None:
+                return seen, total
+
+    def test_pages_cover_live_and_archived_orders_in_order(self):
+        self.assertEqual(archive_orders(date.today() - timedelta(days=29)), 30)
+        self.assertEqual(DailyOrderArchive.objects.count(), 30)
+        self.assertEqual(self.collect_pages('user', self.resident), (self.expected, 60))
+        self.assertEqual(self.collect_pages('delivery_agent', self.agent), (self.expected, 60))
+
+    def test_archived_items_are_kept_inline(self):
+        archive_orders(date.today() - timedelta(days=58))
+        archived = DailyOrderArchive.objects.order_by('id').first()
+        self.assertEqual(archived.items[0][1:], ['Thali', 1, '80.00'])
+        self.assertEqual(archived.total_cost, Decimal('80.00'))
+
+    def test_history_page_links_to_older_orders(self):
+        self.client.force_login(self.resident)
+        response = self.client.get(reverse('resident_delivery_history'))
+        self.assertEqual(len(response.context['orders']), 25)
+        self.assertContains(response, '60 Orders')
+        older = self.client.get(reverse('resident_delivery_history'), {'before': response.context['next_cursor']})
+        self.assertEqual(older.context['orders'][0].id, self.expected[25])
+
+
+class ArchiveRoundTripTest(TestCase):
+    def setUp(self):
+        resident = CustomUser.objects.create_user(username='resident1', password='password123', user_type='resident')
+        vendor = CustomUser.objects.create_user(username='vendor1', password='password123', user_type='vendor')
+        item = VendorMenuItem.objects.create(vendor=vendor, name='Thali', price=Decimal('80.00'), meal_type='lunch')
+        lunch = MealType.objects.create(name='Lunch')
+        old = date.today() - timedelta(days=200)
+        for offset, status in enumerate(['delivered', 'cancelled', 'submitted'] * 10):
+            order = DailyOrder.objects.create(user=resident, meal_type=lunch, status=status, order_date=old - timedelta(days=offset))
+            DailyOrderItem.objects.create(daily_order=order, menu_item=item, quantity=2, price_at_order_time=item.price)
+        self.snapshot = self.orders_snapshot()
+
+    def orders_snapshot(self):
+        return sorted(
+            DailyOrder.objects.values_list('id', 'status', 'order_date', 'ordered_at', 'items__quantity', 'items__price_at_order_time')
+        )
+
+    def test_archive_in_chunks_then_restore(self):
+        chunks = []
+        moved = archive_orders(date.today() - timedelta(days=90), chunk_size=MIN_CHUNK, progress=lambda rows, s: chunks.append(rows))
+        self.assertEqual(moved, 20)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(set(DailyOrder.objects.values_list('status', flat=True)), {'submitted'})
+        self.assertFalse(DailyOrderItem.objects.filter(daily_order__status='delivered').exists())
+
+        self.assertEqual(restore_orders(DailyOrderArchive.objects.all()), 20)
+        self.assertFalse(DailyOrderArchive.objects.exists())
+        self.assertEqual(self.orders_snapshot(), self.snapshot)
@@ -0,0 +1,50 @@
+import asyncio
+from django.core.servers.basehttp import WSGIServer
+from django.test import LiveServerTestCase, SimpleTestCase, override_settings
+from django.test.testcases import LiveServerThread, QuietWSGIRequestHandler
+from .loadtest import Stats, percentile, prepare, run
+from .models import DailyOrder
+
+class LoadStatsTest(SimpleTestCase):
+    def test_percentiles_use_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual([percentile(values, p) for p in (50, 95, 99)], [50, 95, 99])
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_summary_rates_per_endpoint(self):
+        stats = Stats()
+        for seconds in (0.1, 0.2, 0.3):
+            stats.record('POST order', seconds, 'ok')
+        stats.record('POST order', 5.0, 'locked')
+        stats.record('GET menu', 0.05, 'error')
+        order, menu, total = stats.summary(elapsed=2)
+        self.assertEqual((order['endpoint'], order['requests'], order['throughput']), ('POST order', 4, 2.0))
+        self.assertEqual((order['locked_rate'], order['error_rate'], order['p99']), (0.25, 0.0, 5.0))
+        self.assertEqual((menu['error_rate'], total['requests'], total['locked_rate']), (1.0, 5, 0.2))
+
+
+class _SerialLiveServerThread(LiveServerThread):
+    # One request at a time: every request shares the test database's single connection
+    def _create_server(self, connections_override=None):
+        return WSGIServer((self.host, self.port), QuietWSGIRequestHandler, allow_reuse_address=False)
+
+
+@override_settings(NOTIFICATION_WORKER=False, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoadRunTest(LiveServerTestCase):
+    server_thread_class = _SerialLiveServerThread
+
+    def test_meal_rush_runs_every_scenario(self):
+        cast = prepare(residents=3, vendors=1, agents=1)
+        stats, elapsed = asyncio.run(run(self.live_server_url, cast, duration=3, think=0.1))
+
+        endpoints = stats.summary(elapsed)
+        total = endpoints[-1]
+        self.assertGreater(total['requests'], 0)
+        self.assertEqual((total['error_rate'], total['locked_rate'], total['timeout_rate']), (0, 0, 0))
+        seen = {row['endpoint'] for row in endpoints}
+        self.assertLessEqual({'POST login', 'POST resident_daily_order_select', 'GET vendor_orders_list',
+                              'GET api_v1_agent_assignments'}, seen)
+        self.assertEqual(DailyOrder.objects.filter(user__username__in=cast.residents).count(), 3)
+        # Running it again reuses the accounts
+        self.assertEqual(prepare(residents=3, vendors=1, agents=1), cast)
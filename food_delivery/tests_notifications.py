@@ -0,0 +1,55 @@
+from datetime import date
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from .models import CustomUser, MealType, DailyOrder
+from .notifications import notify_status_change, process_pending
+
+@override_settings(
+    NOTIFICATION_WORKER=False,
+    NOTIFICATION_BACKENDS=['food_delivery.notifications.EmailNotificationBackend'],
+)
+class StatusNotificationTest(TestCase):
+    def setUp(self):
+        process_pending()  # drop anything queued by other tests
+        mail.outbox = []
+        self.agent = CustomUser.objects.create_user(username='agent1', password='password123', user_type='delivery_agent')
+        self.resident = CustomUser.objects.create_user(
+            username='resident1', password='password123', user_type='resident', email='resident1@example.com'
+        )
+        self.lunch = MealType.objects.create(name='Lunch')
+        self.dinner = MealType.objects.create(name='Dinner')
+        self.order = DailyOrder.objects.create(
+            user=self.resident, meal_type=self.lunch, order_date=date.today(),
+            status='prepared', delivery_agent=self.agent
+        )
+
+    def test_agent_actions_queue_without_sending(self):
+        self.client.force_login(self.agent)
+        self.client.get(reverse('delivery_accept_order', args=[self.order.id]))
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(process_pending(), 1)
+        self.assertEqual(mail.outbox[0].to, ['resident1@example.com'])
+        self.assertIn('out for delivery', mail.outbox[0].body)
+
+    def test_only_latest_status_is_sent(self):
+        notify_status_change(self.order.id, 'out_for_delivery')
+        notify_status_change(self.order.id, 'reached_location')
+        process_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('reached location', mail.outbox[0].body)
+        self.assertNotIn('out for delivery', mail.outbox[0].body)
+
+    def test_orders_are_coalesced_per_resident(self):
+        dinner_order = DailyOrder.objects.create(user=self.resident, meal_type=self.dinner, order_date=date.today())
+        notify_status_change(self.order.id, 'out_for_delivery')
+        notify_status_change(dinner_order.id, 'out_for_delivery')
+        self.assertEqual(process_pending(), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Updates on 2 of your orders')
+
+    def test_superseded_by_unnotified_status(self):
+        notify_status_change(self.order.id, 'reached_location')
+        notify_status_change(self.order.id, 'delivered')
+        self.assertEqual(process_pending(), 0)
+        self.assertEqual(mail.outbox, [])
@@ -0,0 +1,49 @@
+from decimal import Decimal
+from django.contrib.sessions.models import Session
+from django.test import TestCase
+from django.urls import reverse
+from .models import CustomUser, SubscriptionPlan, UserSubscription, Payment
+
+class SignedPaymentFlowTest(TestCase):
+    def setUp(self):
+        self.resident = CustomUser.objects.create_user(
+            username='resident1', password='password123', user_type='resident', is_approved=True
+        )
+        self.plan = SubscriptionPlan.objects.create(name='Monthly', base_price=Decimal('1500.00'), duration_days=30)
+        self.client.login(username='resident1', password='password123')
+
+    def start_payment(self):
+        response = self.client.get(reverse('subscribe_to_plan', args=[self.plan.id]))
+        self.assertEqual(response.status_code, 302)
+        payment_page = self.client.get(response['Location'])
+        self.assertContains(payment_page, '1500.00')
+        return payment_page.context['payment_token']
+
+    def test_payment_flow_does_not_write_session(self):
+        session_data = Session.objects.get().session_data
+        token = self.start_payment()
+        response = self.client.post(reverse('process_payment'), {'payment_token': token, 'payment_method': 'card'})
+
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        subscription = UserSubscription.objects.get(user=self.resident)
+        self.assertEqual(subscription.total_amount_paid, Decimal('1500.00'))
+        self.assertEqual(Payment.objects.get().user_subscription, subscription)
+        self.assertEqual(Session.objects.get().session_data, session_data)
+
+    def test_resubmitted_token_does_not_charge_twice(self):
+        token = self.start_payment()
+        self.client.post(reverse('process_payment'), {'payment_token': token})
+        response = self.client.post(reverse('process_payment'), {'payment_token': token})
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(UserSubscription.objects.count(), 1)
+
+        # A second token for the same plan is a separate payment
+        self.client.post(reverse('process_payment'), {'payment_token': self.start_payment()})
+        self.assertEqual(Payment.objects.count(), 2)
+
+    def test_tampered_token_is_rejected(self):
+        token = self.start_payment()
+        response = self.client.post(reverse('process_payment'), {'payment_token': token[:-2] + 'xx'})
+        self.assertRedirects(response, reverse('subscription_plans'))
+        self.assertFalse(UserSubscription.objects.exists())
@@ -0,0 +1,264 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from . import reference, urls
+from .models import CustomUser, MealType, SubscriptionPlan, VendorSubscription, UserSubscription, VendorMenuItem, \
+                    DailyMenu, DailyOrder, DailyOrderItem, DailyOrderArchive, Payment, BulkOrder, BulkOrderItem, \
+                    SettlementBatch, SettlementLine, VendorSettlement
+from .usage import open_ledger
+from .views import _make_payment_token
+
+SMALL, LARGE = 2, 20
+
+# Most queries a GET of each page may run, whatever the amount of data behind it.
+# Raising a number needs a reason; a page whose count grows with the data fails
+# test_query_counts_do_not_grow_with_data regardless.
+BUDGETS = {
+    'home': 0,
+    'register': 1,
+    'login': 0,
+    'dashboard': 13,
+    'subscription_plans': 3,
+    'subscribe_to_plan': 2,
+    'payment_page': 1,
+    'resident_daily_order_select': 18,
+    'resident_daily_order_select_with_date_meal': 17,
+    'resident_live_tracking': 5,
+    'resident_delivery_history': 5,
+    'warden_dashboard': 4,
+    'warden_stats': 4,
+    'warden_manage_users': 2,
+    'warden_bulk_order': 1,
+    'vendor_menu_item_list': 2,
+    'vendor_menu_item_create': 3,
+    'vendor_menu_item_update': 5,
+    'vendor_daily_menu_create_update': 2,
+    'vendor_update_order_status': 3,
+    'vendor_orders_list': 2,
+    'vendor_production_sheet': 5,  # live daily and bulk demand for meals without a cutoff
+    'vendor_settlements': 2,
+    'vendor_manage_subscriptions': 2,
+    'vendor_assign_delivery_agent': 6,
+    'delivery_agent_orders': 4,
+    'delivery_agent_update_daily_order_status': 4,
+    'delivery_agent_history': 5,
+    'admin_pending_daily_orders': 3,
+    'custom_admin_dashboard': 11,
+    'custom_admin_analytics': 6,
+    'custom_admin_settlements': 3,
+    'settlement_export': 3,
+    'custom_admin_manage_users': 2,
+    'custom_admin_manage_wardens': 2,
+    'custom_admin_manage_plans': 3,
+    'custom_admin_plan_create': 1,
+    'custom_admin_plan_update': 3,
+    'admin_meal_type': 2,
+    'api_v1_menu_today': 2,
+    'api_v1_upcoming_orders': 3,
+    'api_v1_subscriptions': 5,
+    'api_v1_agent_assignments': 2,
+    'api_v1_agent_manifest': 3,
+}
+
+# Pages that answer a GET with a redirect
+REDIRECTS = {'subscribe_to_plan'}
+
+# Views that only accept POST (or only act and redirect); their writes are covered elsewhere
+NOT_PAGES = {
+    'logout', 'process_payment', 'delivery_accept_order', 'delivery_reject_order',
+    'delivery_reached_location', 'delivery_complete_order', 'api_v1_agent_bulk_status', 'warden_confirm_bulk_delivery',
+}
+
+
+@override_settings(NOTIFICATION_WORKER=False)
+class QueryCountTest(TestCase):
+    """Every page, for the role that uses it, seeded at two sizes."""
+
+    def setUp(self):
+        self.today = date.today()
+        self.now = timezone.now()
+        self.lunch = MealType.objects.create(name='Lunch')
+        self.dinner = MealType.objects.create(name='Dinner')
+        self.plan = SubscriptionPlan.objects.create(name='Monthly', duration_days=30, base_price=Decimal('3000.00'))
+        self.plan.meal_types_included.add(self.lunch, self.dinner)
+
+        self.admin = CustomUser.objects.create_user(username='admin1', password='x', user_type='admin')
+        self.warden = CustomUser.objects.create_user(username='warden1', password='x', user_type='warden')
+        self.vendor = CustomUser.objects.create_user(username='vendor1', password='x', user_type='vendor')
+        self.agent = CustomUser.objects.create_user(username='agent1', password='x', user_type='delivery_agent')
+        VendorSubscription.objects.create(vendor=self.vendor, subscription_plan=self.plan)
+        self.menus = {
+            meal_type: DailyMenu.objects.create(vendor=self.vendor, meal_type=meal_type, menu_date=self.today)
+            for meal_type in (self.lunch, self.dinner)
+        }
+        self.resident, self.subscription = self.add_resident('resident0')
+        self.size = 0
+        self.grow(SMALL)
+
+        self.order = self.resident.daily_orders.get(order_date=self.today, meal_type=self.lunch)
+        self.menu_item = self.vendor.menu_items.earliest('id')
+
+    def add_resident(self, username):
+        resident = CustomUser.objects.create_user(username=username, password='x', user_type='resident',
+                                                  warden=self.warden, is_approved=True)
+        subscription = UserSubscription.objects.create(user=resident, plan=self.plan, is_paid=True,
+                                                       start_date=self.today - timedelta(days=LARGE + 1),
+                                                       end_date=self.today + timedelta(days=29))
+        open_ledger(subscription)
+        Payment.objects.create(user=resident, user_subscription=subscription, amount=self.plan.base_price,
+                               is_successful=True)
+        return resident, subscription
+
+    def add_order(self, resident, subscription, meal_type, order_date, status, items, **fields):
+        order = DailyOrder.objects.create(user=resident, user_subscription=subscription, meal_type=meal_type,
+                                          order_date=order_date, status=status, **fields)
+        DailyOrderItem.objects.bulk_create(
+            DailyOrderItem(daily_order=order, menu_item=item, quantity=1, price_at_order_time=item.price)
+            for item in items
+        )
+        return order
+
+    def grow(self, size):
+        """Add rows until every repeated thing on the pages comes ``size`` times."""
+        for n in range(self.size, size):
+            plan = SubscriptionPlan.objects.create(name=f'Plan {n}', duration_days=7)
+            plan.meal_types_included.add(self.lunch)
+            items = []
+            for meal_type in (self.lunch, self.dinner):
+                item = VendorMenuItem.objects.create(vendor=self.vendor, name=f'{meal_type.name} {n}',
+                                                     price=Decimal('50.00'), meal_type=meal_type.name.lower())
+                item.subscription_plans.add(self.plan, plan)
+                self.menus[meal_type].available_items.add(item)
+                items.append(item)
+
+            # Another resident in the hostel, ordering today and served yesterday
+            resident, subscription = self.add_resident(f'resident{n + 1}')
+            self.add_order(resident, subscription, self.lunch, self.today, 'out_for_delivery', items,
+                           delivery_agent=self.agent, assigned_time=self.now)
+            self.add_order(resident, subscription, self.lunch, self.today - timedelta(days=1), 'delivered', items,
+                           delivery_agent=self.agent, assigned_time=self.now, delivered_time=self.now)
+
+            # The logged-in resident's own history, live and archived
+            past = self.today - timedelta(days=n + 1)
+            self.add_order(self.resident, self.subscription, self.lunch, past, 'delivered', items,
+                           delivery_agent=self.agent, delivered_time=self.now - timedelta(days=n + 1))
+            DailyOrderArchive.objects.create(
+                id=10_000 + n, user=self.resident, user_subscription=self.subscription, meal_type=self.dinner,
+                order_date=past, status='delivered', delivery_agent=self.agent, ordered_at=self.now,
+                delivered_time=self.now - timedelta(days=n + 1), items=[[items[1].id, items[1].name, 1, '50.00']],
+                total_cost=Decimal('50.00'),
+            )
+
+            bulk = BulkOrder.objects.create(warden=self.warden, meal_type=self.lunch, order_date=self.today,
+                                            total_cost=Decimal('50.00'))
+            BulkOrderItem.objects.create(bulk_order=bulk, menu_item=items[0], quantity=n + 1,
+                                         price_at_order_time=items[0].price)
+            # A settled day with one line per item
+            batch = SettlementBatch.objects.create(period_end=self.now - timedelta(days=n + 1))
+            self.settlement = VendorSettlement.objects.create(batch=batch, vendor=self.vendor, daily_order_count=1,
+                                                              item_quantity=len(items), amount=Decimal('100.00'))
+            SettlementLine.objects.bulk_create(
+                SettlementLine(batch=batch, vendor=self.vendor, source='daily', database='default', order_id=n,
+                               delivered_time=batch.period_end, menu_item=item, item_name=item.name, quantity=1,
+                               unit_price=item.price, amount=item.price)
+                for item in items
+            )
+            CustomUser.objects.create_user(username=f'warden_{n}', password='x', user_type='warden')
+            CustomUser.objects.create_user(username=f'agent_{n}', password='x', user_type='delivery_agent')
+
+        if self.size == 0:
+            self.add_order(self.resident, self.subscription, self.lunch, self.today, 'out_for_delivery',
+                           self.vendor.menu_items.all(), delivery_agent=self.agent, assigned_time=self.now)
+        self.size = size
+
+    def pages(self):
+        """(url name, user, url) for every page."""
+        return [
+            ('home', None, reverse('home')),
+            ('register', None, reverse('register')),
+            ('login', None, reverse('login')),
+            ('dashboard', self.resident, reverse('dashboard')),
+            ('subscription_plans', self.resident, reverse('subscription_plans')),
+            ('subscribe_to_plan', self.resident, reverse('subscribe_to_plan', args=[self.plan.id])),
+            ('payment_page', self.resident,
+             f"{reverse('payment_page')}?token={_make_payment_token(self.resident, self.plan)}"),
+            ('resident_daily_order_select', self.resident, reverse('resident_daily_order_select')),
+            ('resident_daily_order_select_with_date_meal', self.resident,
+             reverse('resident_daily_order_select_with_date_meal', args=[self.dinner.id, self.today.isoformat()])),
+            ('resident_live_tracking', self.resident, reverse('resident_live_tracking', args=[self.order.id])),
+            ('resident_delivery_history', self.resident, reverse('resident_delivery_history')),
+            ('api_v1_menu_today', self.resident, reverse('api_v1_menu_today')),
+            ('api_v1_upcoming_orders', self.resident, reverse('api_v1_upcoming_orders')),
+            ('api_v1_subscriptions', self.resident, reverse('api_v1_subscriptions')),
+            ('warden_dashboard', self.warden, reverse('warden_dashboard')),
+            ('warden_stats', self.warden, reverse('warden_stats')),
+            ('warden_manage_users', self.warden, reverse('warden_manage_users')),
+            ('warden_bulk_order', self.warden, reverse('warden_bulk_order')),
+            ('vendor_menu_item_list', self.vendor, reverse('vendor_menu_item_list')),
+            ('vendor_menu_item_create', self.vendor, reverse('vendor_menu_item_create')),
+            ('vendor_menu_item_update', self.vendor, reverse('vendor_menu_item_update', args=[self.menu_item.id])),
+            ('vendor_daily_menu_create_update', self.vendor, reverse('vendor_daily_menu_create_update')),
+            ('vendor_update_order_status', self.vendor, reverse('vendor_update_order_status', args=[self.order.id])),
+            ('vendor_orders_list', self.vendor, reverse('vendor_orders_list')),
+            ('vendor_production_sheet', self.vendor, reverse('vendor_production_sheet')),
+            ('vendor_settlements', self.vendor, reverse('vendor_settlements')),
+            ('settlement_export', self.vendor, reverse('settlement_export', args=[self.settlement.id])),
+            ('vendor_manage_subscriptions', self.vendor, reverse('vendor_manage_subscriptions')),
+            ('vendor_assign_delivery_agent', self.vendor,
+             reverse('vendor_assign_delivery_agent', args=[self.order.id])),
+            ('delivery_agent_orders', self.agent, reverse('delivery_agent_orders')),
+            ('delivery_agent_update_daily_order_status', self.agent,
+             reverse('delivery_agent_update_daily_order_status', args=[self.order.id])),
+            ('delivery_agent_history', self.agent, reverse('delivery_agent_history')),
+            ('api_v1_agent_assignments', self.agent, reverse('api_v1_agent_assignments')),
+            ('api_v1_agent_manifest', self.agent, reverse('api_v1_agent_manifest')),
+            ('admin_pending_daily_orders', self.admin, reverse('admin_pending_daily_orders')),
+            ('custom_admin_dashboard', self.admin, reverse('custom_admin_dashboard')),
+            ('custom_admin_analytics', self.admin, reverse('custom_admin_analytics')),
+            ('custom_admin_settlements', self.admin, reverse('custom_admin_settlements')),
+            ('custom_admin_manage_users', self.admin, reverse('custom_admin_manage_users')),
+            ('custom_admin_manage_wardens', self.admin, reverse('custom_admin_manage_wardens')),
+            ('custom_admin_manage_plans', self.admin, reverse('custom_admin_manage_plans')),
+            ('custom_admin_plan_create', self.admin, reverse('custom_admin_plan_create')),
+            ('custom_admin_plan_update', self.admin, reverse('custom_admin_plan_update', args=[self.plan.id])),
+            ('admin_meal_type', self.admin, reverse('admin_meal_type')),
+        ]
+
+    def count_queries(self):
+        """{url name: (status code, queries)} for a cold GET of every page."""
+        counts = {}
+        for name, user, url in self.pages():
+            if user is None:
+                self.client.logout()
+            else:
+                self.client.force_login(user)
+            # Cold caches, so cached pages are measured at their worst; the reference
+            # registry is loaded once per process, so it is measured warm
+            cache.clear()
+            reference.meal_types(), reference.active_plans()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            counts[name] = (response.status_code, len(queries))
+        return counts
+
+    def test_query_counts_do_not_grow_with_data(self):
+        small = self.count_queries()
+        self.grow(LARGE)
+        large = self.count_queries()
+        for name, (status, queries) in large.items():
+            with self.subTest(page=name):
+                self.assertEqual(status, 302 if name in REDIRECTS else 200)
+                self.assertEqual(queries, small[name][1], f'{name} runs more queries with {LARGE}x the data')
+                self.assertLessEqual(queries, BUDGETS[name])
+
+    def test_every_page_has_a_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns if isinstance(pattern, URLPattern)}
+        self.assertEqual(names - NOT_PAGES, set(BUDGETS))
+        self.assertEqual({name for name, _, _ in self.pages()}, set(BUDGETS))
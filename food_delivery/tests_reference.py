@@ -0,0 +1,50 @@
+from django.template import Context, Template
+from django.test import TestCase
+from . import reference
+from .forms import BulkOrderForm, VendorSubscriptionForm
+from .models import MealType, SubscriptionPlan
+
+class ReferenceRegistryTest(TestCase):
+    def setUp(self):
+        reference.clear()
+        self.lunch = MealType.objects.create(name='Lunch')
+        self.dinner = MealType.objects.create(name='Dinner')
+        self.monthly = SubscriptionPlan.objects.create(name='Monthly', duration_days=30)
+        SubscriptionPlan.objects.create(name='Retired', duration_days=30, is_active=False)
+
+    def test_lookups_are_served_from_memory(self):
+        before = reference.stats()['meal_types']
+        self.assertEqual(reference.meal_type_name(self.dinner.id), 'Dinner')
+        with self.assertNumQueries(0):
+            self.assertEqual(reference.meal_type(self.lunch.id), self.lunch)
+            self.assertEqual(reference.meal_type_name(0), '')
+            rendered = Template('{% load reference_data %}{{ id|meal_type_name }}').render(Context({'id': self.lunch.id}))
+        self.assertEqual(rendered, 'Lunch')
+        after = reference.stats()['meal_types']
+        self.assertEqual((after['misses'] - before['misses'], after['hits'] - before['hits']), (1, 3))
+
+    def test_form_choices_render_without_queries(self):
+        reference.meal_types(), reference.active_plans()
+        with self.assertNumQueries(0):
+            meal_type_html = str(BulkOrderForm()['meal_type'])
+            plans_html = str(VendorSubscriptionForm()['subscription_plans'])
+        self.assertIn('Dinner', meal_type_html)
+        self.assertIn('Monthly', plans_html)
+        self.assertNotIn('Retired', plans_html)
+
+        # Submitted choices are still checked against the table
+        form = VendorSubscriptionForm({'subscription_plans': [self.monthly.id]})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(list(form.cleaned_data['subscription_plans']), [self.monthly])
+
+    def test_writes_drop_the_entry(self):
+        self.assertEqual(len(reference.meal_types()), 2)
+        MealType.objects.create(name='Snacks')
+        self.assertEqual([m.name for m in reference.meal_types()], ['Lunch', 'Dinner', 'Snacks'])
+        self.dinner.delete()
+        self.assertEqual(len(reference.meal_types()), 2)
+
+        self.assertEqual(reference.active_plans(), (self.monthly,))
+        self.monthly.is_active = False
+        self.monthly.save()
+        self.assertEqual(reference.active_plans(), ())
@@ -0,0 +1,82 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.urls import reverse
+from .models import CustomUser, MealType, SubscriptionPlan, UserSubscription, VendorMenuItem, \
+                    DailyOrder, DailyOrderItem, Payment, DailyOrderRollup, PaymentRollup
+from .archive import archive_orders
+from .rollups import refresh_order_rollups, refresh_payment_rollups
+
+class RollupRefreshTest(TestCase):
+    def setUp(self):
+        self.vendor = CustomUser.objects.create_user(username='vendor1', password='password123', user_type='vendor')
+        self.resident = CustomUser.objects.create_user(username='resident1', password='password123', user_type='resident')
+        self.lunch = MealType.objects.create(name='Lunch')
+        self.plan = SubscriptionPlan.objects.create(name='Monthly', duration_days=30)
+        self.item = VendorMenuItem.objects.create(vendor=self.vendor, name='Thali', price=Decimal('80.00'), meal_type='lunch')
+        self.order = DailyOrder.objects.create(user=self.resident, meal_type=self.lunch, order_date=date.today())
+        DailyOrderItem.objects.create(daily_order=self.order, menu_item=self.item, quantity=2, price_at_order_time=Decimal('80.00'))
+
+    def test_order_rollup_tracks_status_changes(self):
+        refresh_order_rollups()
+        rollup = DailyOrderRollup.objects.get(vendor=self.vendor)
+        self.assertEqual((rollup.status, rollup.order_count, rollup.item_quantity), ('submitted', 1, 2))
+        self.assertEqual(rollup.revenue, Decimal('160.00'))
+
+        self.order.status = 'delivered'
+        self.order.save()
+        refresh_order_rollups()
+        self.assertEqual(set(DailyOrderRollup.objects.values_list('status', flat=True)), {'delivered'})
+
+    def test_orders_are_counted_once(self):
+        other_vendor = CustomUser.objects.create_user(username='vendor2', password='password123', user_type='vendor')
+        curd = VendorMenuItem.objects.create(vendor=other_vendor, name='Curd', price=Decimal('15.00'), meal_type='lunch')
+        DailyOrderItem.objects.create(daily_order=self.order, menu_item=curd, quantity=1, price_at_order_time=Decimal('15.00'))
+        neighbour = CustomUser.objects.create_user(username='resident2', password='password123', user_type='resident')
+        DailyOrder.objects.create(user=neighbour, meal_type=self.lunch, order_date=date.today())
+        refresh_order_rollups()
+
+        self.assertEqual(DailyOrderRollup.objects.get(vendor=other_vendor).order_count, 1)
+        day = DailyOrderRollup.objects.get(vendor=None)
+        self.assertEqual((day.order_count, day.item_quantity, day.revenue), (2, 3, Decimal('175.00')))
+
+    def test_old_orders_are_rerolled_when_they_change(self):
+        self.order.order_date = date.today() - timedelta(days=30)
+        self.order.save()
+        refresh_order_rollups()
+
+        DailyOrder.objects.filter(id=self.order.id).update(status='cancelled')
+        self.assertEqual(refresh_order_rollups(), 1)
+        self.assertEqual(set(DailyOrderRollup.objects.values_list('status', flat=True)), {'cancelled'})
+
+    def test_archived_orders_survive_a_rebuild(self):
+        curd = VendorMenuItem.objects.create(vendor=self.vendor, name='Curd', price=Decimal('15.00'), meal_type='lunch')
+        DailyOrderItem.objects.create(daily_order=self.order, menu_item=curd, quantity=1, price_at_order_time=Decimal('15.00'))
+        DailyOrder.objects.filter(id=self.order.id).update(order_date=date.today() - timedelta(days=120), status='delivered')
+        refresh_order_rollups()
+        rows = lambda: sorted(DailyOrderRollup.objects.values_list(
+            'day', 'vendor', 'status', 'order_count', 'item_quantity', 'revenue'), key=str)
+        before = rows()
+        self.assertEqual(len(before), 2)
+
+        self.assertEqual(archive_orders(date.today() - timedelta(days=90)), 1)
+        refresh_order_rollups(rebuild=True)
+        self.assertEqual(rows(), before)
+
+    def test_payment_rollup_is_incremental(self):
+        subscription = UserSubscription.objects.create(user=self.resident, plan=self.plan)
+        Payment.objects.create(user=self.resident, user_subscription=subscription, amount=Decimal('500.00'), is_successful=True)
+        self.assertEqual(refresh_payment_rollups(), 1)
+        self.assertEqual(refresh_payment_rollups(), 0)
+
+        Payment.objects.create(user=self.resident, user_subscription=subscription, amount=Decimal('250.00'), is_successful=True)
+        refresh_payment_rollups()
+        rollup = PaymentRollup.objects.get()
+        self.assertEqual((rollup.plan, rollup.payment_count, rollup.amount), (self.plan, 2, Decimal('750.00')))
+
+    def test_analytics_page_reads_rollups(self):
+        admin = CustomUser.objects.create_user(username='admin1', password='password123', user_type='admin')
+        refresh_order_rollups()
+        self.client.force_login(admin)
+        response = self.client.get(reverse('custom_admin_analytics'))
+        self.assertContains(response, 'vendor1')
@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from .models import CustomUser, DailyOrder
+from .routers import PIN_COOKIE, REPLICA_ALIAS, ReplicaRouter, replica_reads, _RequestState, _state
+from .sharding import TenantRouter
+
+@mock.patch('food_delivery.routers.replica_configured', return_value=True)
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_use_replica_only_inside_replica_block(self, _configured):
+        self.assertIsNone(self.router.db_for_read(DailyOrder))
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(DailyOrder), REPLICA_ALIAS)
+
+    def test_write_pins_remaining_reads_to_primary(self, _configured):
+        token = _state.set(_RequestState())
+        try:
+            with replica_reads():
+                self.router.db_for_write(DailyOrder)
+                self.assertIsNone(self.router.db_for_read(DailyOrder))
+        finally:
+            _state.reset(token)
+
+    def test_shard_writes_pin_reads_too(self, _configured):
+        # The tenant router answers shard writes before this router is asked
+        order = DailyOrder()
+        order._state.db = 'tenant_1'
+        state = _RequestState()
+        token = _state.set(state)
+        try:
+            self.assertEqual(TenantRouter().db_for_write(DailyOrder, instance=order), 'tenant_1')
+            self.assertTrue(state.wrote)
+            with replica_reads():
+                self.assertIsNone(self.router.db_for_read(CustomUser))
+        finally:
+            _state.reset(token)
+
+    def test_pinned_request_never_uses_replica(self, _configured):
+        token = _state.set(_RequestState(pinned=True))
+        try:
+            with replica_reads():
+                self.assertIsNone(self.router.db_for_read(DailyOrder))
+        finally:
+            _state.reset(token)
+
+
+class ReplicaPinCookieTest(TestCase):
+    def setUp(self):
+        self.warden = CustomUser.objects.create_user(
+            username='warden1', password='password123', user_type='warden', is_approved=True
+        )
+        self.resident = CustomUser.objects.create_user(
+            username='resident1', password='password123', user_type='resident', warden=self.warden
+        )
+        self.client.force_login(self.warden)
+
+    def test_write_sets_pin_cookie(self):
+        response = self.client.post(reverse('warden_manage_users'), {'user_id': self.resident.id, 'action': 'approve'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_read_does_not_set_pin_cookie(self):
+        response = self.client.get(reverse('warden_dashboard'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+# TransactionTestCase: SQLite cannot back up a database that the test holds a transaction on
+class SyncReplicaCommandTest(TransactionTestCase):
+    def test_copies_default_database(self):
+        CustomUser.objects.create_user(username='resident1', password='password123')
+        with tempfile.TemporaryDirectory() as tmp:
+            target = os.path.join(tmp, 'replica.sqlite3')
+            with override_settings(REPLICA_SQLITE_PATH=target):
+                call_command('sync_replica', stdout=StringIO())
+            with sqlite3.connect(target) as copy:
+                rows = copy.execute("SELECT username FROM food_delivery_customuser").fetchall()
+            copy.close()
+        self.assertEqual(rows, [('resident1',)])
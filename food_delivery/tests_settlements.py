@@ -0,0 +1,157 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .models import CustomUser, MealType, SubscriptionPlan, UserSubscription, VendorMenuItem, DailyOrder, \
+                    DailyOrderItem, BulkOrder, BulkOrderItem, SettlementBatch, SettlementLine, VendorSettlement
+from .settlements import SETTLEMENT_LAG, settle
+
+class SettlementTest(TestCase):
+    def setUp(self):
+        self.today = date.today()
+        self.lunch = MealType.objects.create(name='Lunch')
+        plan = SubscriptionPlan.objects.create(name='Monthly', duration_days=30)
+        self.resident = CustomUser.objects.create_user(username='resident1', password='x', user_type='resident')
+        self.subscription = UserSubscription.objects.create(user=self.resident, plan=plan, is_paid=True,
+                                                            start_date=self.today, end_date=self.today + timedelta(days=29))
+        self.warden = CustomUser.objects.create_user(username='warden1', password='x', user_type='warden')
+        self.vendor = CustomUser.objects.create_user(username='vendor1', password='x', user_type='vendor')
+        self.other_vendor = CustomUser.objects.create_user(username='vendor2', password='x', user_type='vendor')
+        self.thali = VendorMenuItem.objects.create(vendor=self.vendor, name='Thali', price=Decimal('80.00'), meal_type='lunch')
+        self.curd = VendorMenuItem.objects.create(vendor=self.vendor, name='Curd', price=Decimal('15.00'), meal_type='lunch')
+        self.biryani = VendorMenuItem.objects.create(vendor=self.other_vendor, name='Biryani', price=Decimal('120.00'),
+                                                     meal_type='lunch')
+        self.start = timezone.now() - timedelta(days=2)
+
+    def deliver(self, hours, *items, status='delivered'):
+        order = DailyOrder.objects.create(user=self.resident, user_subscription=self.subscription, meal_type=self.lunch,
+                                          order_date=self.today - timedelta(days=hours), status=status,
+                                          delivered_time=self.start + timedelta(hours=hours))
+        for item, quantity, price in items:
+            DailyOrderItem.objects.create(daily_order=order, menu_item=item, quantity=quantity, price_at_order_time=price)
+        return order
+
+    def deliver_bulk(self, hours, item, quantity):
+        order = BulkOrder.objects.create(warden=self.warden, meal_type=self.lunch, order_date=self.today,
+                                         status='delivered', delivered_time=self.start + timedelta(hours=hours))
+        BulkOrderItem.objects.create(bulk_order=order, menu_item=item, quantity=quantity, price_at_order_time=item.price)
+        return order
+
+    def totals(self, batch):
+        return {
+            s.vendor_id: (s.daily_order_count, s.bulk_order_count, s.item_quantity, s.amount)
+            for s in batch.settlements.all()
+        }
+
+    def test_each_delivery_is_settled_once(self):
+        # Paid at the price ordered, not today's price
+        self.deliver(1, (self.thali, 2, Decimal('75.00')), (self.curd, 1, Decimal('15.00')))
+        self.deliver(2, (self.biryani, 1, Decimal('120.00')))
+        self.deliver(3, (self.thali, 1, Decimal('80.00')), status='cancelled')
+        self.deliver_bulk(4, self.thali, 10)
+
+        first = settle(self.start + timedelta(hours=5))
+        self.assertEqual((first.period_start, first.period_end), (None, self.start + timedelta(hours=5)))
+        self.assertEqual(self.totals(first), {
+            self.vendor.id: (1, 1, 13, Decimal('965.00')),
+            self.other_vendor.id: (1, 0, 1, Decimal('120.00')),
+        })
+
+        # The next run only picks up what was delivered after the checkpoint
+        self.deliver(6, (self.curd, 3, Decimal('15.00')))
+        second = settle(self.start + timedelta(hours=7))
+        self.assertEqual(second.period_start, first.period_end)
+        self.assertEqual(self.totals(second), {self.vendor.id: (1, 0, 3, Decimal('45.00'))})
+        self.assertIsNone(settle(self.start + timedelta(hours=7)))
+        self.assertEqual(SettlementLine.objects.count(), 5)
+
+    @override_settings(NOTIFICATION_WORKER=False)
+    def test_vendor_status_form_stamps_each_delivery(self):
+        order = self.deliver(1, (self.thali, 1, Decimal('80.00')), status='prepared')
+        DailyOrder.objects.filter(id=order.id).update(delivered_time=None)
+        self.client.force_login(self.vendor)
+        url = reverse('vendor_update_order_status', args=[order.id])
+
+        def deliver_and_settle():
+            self.client.post(url, {'status': 'delivered'})
+            stamped = DailyOrder.objects.get().delivered_time
+            self.assertIsNotNone(stamped)
+            # Settle as soon as the lag has passed, so the batch ends right after the stamp
+            with mock.patch('food_delivery.settlements.timezone') as clock:
+                clock.now.return_value = stamped + SETTLEMENT_LAG + timedelta(microseconds=1)
+                return stamped, settle()
+
+        first, batch = deliver_and_settle()
+        self.assertEqual(self.totals(batch), {self.vendor.id: (1, 0, 1, Decimal('80.00'))})
+
+        # Delivered again after a mistaken cancellation: a new stamp, but not paid twice
+        self.client.post(url, {'status': 'cancelled'})
+        second, batch = deliver_and_settle()
+        self.assertGreater(second, batch.period_start)
+        self.assertFalse(batch.settlements.exists())
+        self.assertEqual(SettlementLine.objects.count(), 1)
+
+    def test_warden_confirms_bulk_delivery(self):
+        order = BulkOrder.objects.create(warden=self.warden, meal_type=self.lunch, order_date=self.today, status='submitted')
+        BulkOrderItem.objects.create(bulk_order=order, menu_item=self.thali, quantity=10, price_at_order_time=self.thali.price)
+        self.client.force_login(self.warden)
+        url = reverse('warden_confirm_bulk_delivery', args=[order.id])
+        self.client.post(url)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'delivered')
+        stamped = order.delivered_time
+        self.assertIsNotNone(stamped)
+
+        # Confirming twice keeps the first stamp
+        self.client.post(url)
+        order.refresh_from_db()
+        self.assertEqual(order.delivered_time, stamped)
+
+        with mock.patch('food_delivery.settlements.timezone') as clock:
+            clock.now.return_value = stamped + SETTLEMENT_LAG + timedelta(microseconds=1)
+            batch = settle()
+        self.assertEqual(self.totals(batch), {self.vendor.id: (0, 1, 10, Decimal('800.00'))})
+
+    def test_recent_deliveries_wait_for_the_lag(self):
+        order = DailyOrder.objects.create(user=self.resident, user_subscription=self.subscription, meal_type=self.lunch,
+                                          order_date=self.today, status='delivered', delivered_time=timezone.now())
+        DailyOrderItem.objects.create(daily_order=order, menu_item=self.thali, quantity=1, price_at_order_time=Decimal('80.00'))
+        batch = settle()
+        self.assertLessEqual(batch.period_end, timezone.now() - SETTLEMENT_LAG)
+        self.assertFalse(batch.settlements.exists())
+
+    def test_settlements_are_immutable(self):
+        self.deliver(1, (self.thali, 1, Decimal('80.00')))
+        batch = settle(self.start + timedelta(hours=2))
+        settlement = VendorSettlement.objects.get()
+        settlement.amount = Decimal('1.00')
+        with self.assertRaises(ValueError):
+            settlement.save()
+        with self.assertRaises(ValueError):
+            SettlementLine.objects.get().delete()
+        with self.assertRaises(ValueError):
+            batch.delete()
+        self.assertEqual(VendorSettlement.objects.get().amount, Decimal('80.00'))
+
+    def test_export_streams_the_vendors_lines(self):
+        self.deliver(1, (self.thali, 2, Decimal('80.00')), (self.biryani, 1, Decimal('120.00')))
+        self.deliver_bulk(2, self.curd, 4)
+        call_command('settle_vendors', until=(self.start + timedelta(hours=3)).isoformat(), stdout=StringIO())
+        settlement = VendorSettlement.objects.get(vendor=self.vendor)
+
+        self.client.force_login(self.vendor)
+        response = self.client.get(reverse('settlement_export', args=[settlement.id]))
+        self.assertTrue(response.streaming)
+        rows = [line.split(',') for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows[0][:3], ['batch', 'vendor', 'source'])
+        self.assertEqual([(row[2], row[8], row[9], row[11]) for row in rows[1:]],
+                         [('daily', 'Thali', '2', '160.00'), ('bulk', 'Curd', '4', '60.00')])
+
+        # Other vendors can't read it
+        self.client.force_login(self.other_vendor)
+        self.assertEqual(self.client.get(reverse('settlement_export', args=[settlement.id])).status_code, 404)
+        self.assertEqual(SettlementBatch.objects.count(), 1)
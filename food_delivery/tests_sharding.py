@@ -0,0 +1,181 @@
+import sqlite3
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from django.core import mail
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .capacity import set_capacities
+from .models import CustomUser, MealType, SubscriptionPlan, UserSubscription, VendorMenuItem, DailyMenu, DailyMenuItem, \
+                    DailyOrder, DailyOrderItem, DailyOrderRollup, SettlementLine
+from .notifications import process_pending
+from .settlements import settle
+from .sharding import TenantRouter, forget_shards, is_shard, shard_alias, use_shard
+
+class _WithShards(frozenset):
+    # Shard aliases are registered while the test runs, after Django fixed the allowed databases
+    def __contains__(self, alias):
+        return is_shard(alias) or super().__contains__(alias)
+
+
+# TransactionTestCase: shard connections read users and meal types from the test
+# database through ATTACH, which a TestCase would keep locked in its transaction
+@override_settings(NOTIFICATION_WORKER=False)
+class ShardingTest(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.databases = _WithShards(cls.databases)
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(forget_shards)
+        self.shard_dir = Path(tmp.name)
+        self.enterContext(override_settings(SHARD_DIR=self.shard_dir))
+
+        self.today = date.today()
+        self.lunch = MealType.objects.create(name='Lunch')
+        plan = SubscriptionPlan.objects.create(name='Monthly', duration_days=30)
+        plan.meal_types_included.add(self.lunch)
+        self.vendor = vendor = CustomUser.objects.create_user(username='vendor1', password='x', user_type='vendor')
+        self.thali = thali = VendorMenuItem.objects.create(vendor=vendor, name='Thali', price=Decimal('80.00'), meal_type='lunch')
+        self.wardens, self.residents = {}, {}
+        for name in ('north', 'south'):
+            warden = CustomUser.objects.create_user(username=f'warden_{name}', password='x', user_type='warden')
+            resident = CustomUser.objects.create_user(username=f'resident_{name}', password='x',
+                                                      user_type='resident', warden=warden)
+            subscription = UserSubscription.objects.create(user=resident, plan=plan, is_paid=True,
+                                                           start_date=self.today - timedelta(days=1),
+                                                           end_date=self.today + timedelta(days=29))
+            order = DailyOrder.objects.create(user=resident, user_subscription=subscription, meal_type=self.lunch,
+                                              order_date=self.today - timedelta(days=1), status='delivered')
+            DailyOrderItem.objects.create(daily_order=order, menu_item=thali, quantity=2, price_at_order_time=thali.price)
+            self.wardens[name], self.residents[name] = warden, resident
+        call_command('create_shard', '--warden', 'warden_north', stdout=StringIO())
+
+    def shard_count(self, table):
+        db = sqlite3.connect(self.shard_dir / f'tenant_{self.wardens["north"].id}.sqlite3')
+        try:
+            return db.execute(f'SELECT COUNT(*) FROM food_delivery_{table}').fetchone()[0]
+        finally:
+            db.close()
+
+    def test_hostel_rows_move_to_its_shard(self):
+        self.assertEqual(self.shard_count('dailyorder'), 1)
+        self.assertEqual(self.shard_count('dailyorderitem'), 1)
+        self.assertEqual(self.shard_count('usersubscription'), 1)
+        # Only the other hostel is left in default
+        self.assertEqual(list(DailyOrder.objects.values_list('user__username', flat=True)), ['resident_south'])
+        with use_shard(shard_alias(self.wardens['north'].id)):
+            # Joins to users and meal types resolve through the attached catalog
+            order = DailyOrder.objects.select_related('user', 'meal_type').get()
+            self.assertEqual((order.user.username, order.meal_type.name), ('resident_north', 'Lunch'))
+
+    def test_requests_use_the_residents_hostel(self):
+        self.client.force_login(self.residents['north'])
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'Monthly')
+
+        self.client.force_login(self.wardens['north'])
+        stats = self.client.get(reverse('warden_stats')).context['stats']
+        self.assertEqual(stats['totals']['consumed'], 1)
+
+    def test_commands_fan_out(self):
+        call_command('generate_daily_orders', '--parallel', '2', stdout=StringIO())
+        self.assertEqual(self.shard_count('dailyorder'), 2)
+        self.assertEqual(DailyOrder.objects.count(), 2)
+
+        # Yesterday's delivered orders are summed over both databases
+        call_command('refresh_rollups', stdout=StringIO())
+        rollup = DailyOrderRollup.objects.get(status='delivered', vendor=None)
+        self.assertEqual((rollup.order_count, rollup.item_quantity, rollup.revenue), (2, 4, Decimal('320.00')))
+
+    def test_settled_items_stay_settled_after_their_hostel_moves(self):
+        now = timezone.now()
+        DailyOrder.objects.update(delivered_time=now - timedelta(hours=1))
+        settle(now - timedelta(minutes=30))
+        call_command('create_shard', '--warden', 'warden_south', stdout=StringIO())
+        south = shard_alias(self.wardens['south'].id)
+        line = SettlementLine.objects.get()
+        self.assertEqual(line.database, south)
+
+        # Delivered again in its new database: a new stamp, but the item is already paid for
+        with use_shard(south):
+            DailyOrder.objects.update(delivered_time=now - timedelta(minutes=20))
+        self.assertFalse(settle().settlements.exists())
+        self.assertEqual(SettlementLine.objects.get().item_id, line.item_id)
+
+    def test_admin_dashboard_counts_every_hostel(self):
+        for alias in (shard_alias(self.wardens['north'].id), 'default'):
+            with use_shard(alias):
+                DailyOrder.objects.update(order_date=self.today, status='submitted')
+        admin = CustomUser.objects.create_user(username='admin1', password='x', user_type='admin', is_staff=True)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('custom_admin_dashboard'))
+        self.assertEqual((response.context['total_active_subscriptions'], response.context['pending_daily_orders_today']), (2, 2))
+        self.assertEqual({order.user.username for order in response.context['recent_orders']},
+                         {'resident_north', 'resident_south'})
+
+    def test_shards_only_get_tenant_tables(self):
+        router = TenantRouter()
+        alias = shard_alias(self.wardens['north'].id)
+        self.assertTrue(router.allow_migrate(alias, 'food_delivery', 'dailyorder'))
+        self.assertFalse(router.allow_migrate(alias, 'food_delivery', 'mealtype'))
+        self.assertFalse(router.allow_migrate(alias, 'auth', 'permission'))
+        self.assertIsNone(router.allow_migrate('default', 'food_delivery', 'dailyorder'))
+
+    def test_sharded_resident_places_an_order(self):
+        menu = DailyMenu.objects.create(vendor=self.vendor, meal_type=self.lunch, menu_date=self.today)
+        menu.available_items.add(self.thali)
+        set_capacities(menu, {self.thali.id: 5})
+
+        self.client.force_login(self.residents['north'])
+        url = reverse('resident_daily_order_select_with_date_meal', args=[self.lunch.id, self.today.isoformat()])
+        response = self.client.post(url, {f'quantity_{self.thali.id}': 2})
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+
+        # The order goes to the hostel's shard, the portions are taken from the menu in default
+        self.assertEqual(self.shard_count('dailyorder'), 2)
+        self.assertEqual(self.shard_count('dailyorderitem'), 2)
+        self.assertEqual(list(DailyOrder.objects.values_list('user__username', flat=True)), ['resident_south'])
+        self.assertEqual(DailyMenuItem.objects.get().remaining, 3)
+
+    @override_settings(NOTIFICATION_BACKENDS=['food_delivery.notifications.EmailNotificationBackend'])
+    def test_vendor_and_agent_pages_reach_every_hostel(self):
+        north = shard_alias(self.wardens['north'].id)
+        agent = CustomUser.objects.create_user(username='agent1', password='x', user_type='delivery_agent')
+        CustomUser.objects.filter(id=self.residents['north'].id).update(email='north@example.com')
+        for alias in (north, 'default'):
+            with use_shard(alias):
+                DailyOrder.objects.update(status='prepared', delivery_agent=agent)
+        with use_shard(north):
+            order_id = DailyOrder.objects.get().id
+
+        self.client.force_login(self.vendor)
+        response = self.client.get(reverse('vendor_orders_list'))
+        self.assertContains(response, 'resident_north')
+        self.assertContains(response, 'resident_south')
+        self.assertContains(response, f'?db={north}')
+
+        self.client.force_login(agent)
+        self.assertContains(self.client.get(reverse('delivery_agent_orders')), f'?db={north}')
+        process_pending()
+        mail.outbox = []
+        self.client.get(reverse('delivery_accept_order', args=[order_id]), {'db': north})
+        self.assertEqual(process_pending(), 1)
+        self.assertEqual(mail.outbox[0].to, ['north@example.com'])
+        with use_shard(north):
+            self.assertEqual(DailyOrder.objects.get().status, 'out_for_delivery')
+        self.assertEqual(DailyOrder.objects.get().status, 'prepared')
+
+        self.client.force_login(self.vendor)
+        url = reverse('vendor_update_order_status', args=[order_id])
+        self.client.post(f'{url}?db={north}', {'status': 'delivered'})
+        with use_shard(north):
+            self.assertIsNotNone(DailyOrder.objects.get(status='delivered').delivered_time)
+        self.assertEqual(self.client.get(url, {'db': 'tenant_999'}).status_code, 404)
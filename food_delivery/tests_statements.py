@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from .models import CustomUser, MealType, SubscriptionPlan, UserSubscription, VendorMenuItem, DailyOrder, \
+                    DailyOrderItem, DailyOrderArchive, Payment, BulkOrder
+from .statements import MANIFEST, generate, read_manifest
+
+class StatementTest(TestCase):
+    def setUp(self):
+        self.month = date.today().replace(day=1)
+        self.out = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.out)
+        self.directory = os.path.join(self.out, f'{self.month:%Y-%m}')
+        lunch = MealType.objects.create(name='Lunch')
+        plan = SubscriptionPlan.objects.create(name='Monthly', duration_days=30)
+        vendor = CustomUser.objects.create_user(username='vendor1', password='x', user_type='vendor')
+        thali = VendorMenuItem.objects.create(vendor=vendor, name='Thali', price=Decimal('80.00'), meal_type='lunch')
+        self.warden = CustomUser.objects.create_user(username='warden1', password='x', user_type='warden')
+
+        for n in range(3):
+            resident = CustomUser.objects.create_user(username=f'resident{n}', password='x', user_type='resident',
+                                                      warden=self.warden)
+            subscription = UserSubscription.objects.create(user=resident, plan=plan, is_paid=True, start_date=self.month,
+                                                           end_date=self.month + timedelta(days=29))
+            Payment.objects.create(user=resident, user_subscription=subscription, amount=Decimal('3000.00'),
+                                   is_successful=True)
+            for day, status in ((1, 'delivered'), (2, 'cancelled')):
+                order = DailyOrder.objects.create(user=resident, user_subscription=subscription, meal_type=lunch,
+                                                  order_date=self.month + timedelta(days=day - 1), status=status)
+                DailyOrderItem.objects.create(daily_order=order, menu_item=thali, quantity=2,
+                                              price_at_order_time=Decimal('75.00'))
+            DailyOrderArchive.objects.create(
+                id=1000 + n, user=resident, user_subscription=subscription, meal_type=lunch,
+                order_date=self.month + timedelta(days=2), status='delivered', ordered_at=timezone.now(),
+                items=[[thali.id, 'Thali', 1, '80.00']], total_cost=Decimal('80.00'),
+            )
+        # Outside the month
+        DailyOrder.objects.create(user=resident, user_subscription=subscription, meal_type=lunch,
+                                  order_date=self.month - timedelta(days=1), status='delivered')
+        BulkOrder.objects.create(warden=self.warden, meal_type=lunch, order_date=self.month, total_cost=Decimal('500.00'))
+
+    def read(self, entry):
+        with open(os.path.join(self.directory, entry['file']), 'rb') as f:
+            content = f.read()
+        self.assertEqual(hashlib.sha256(content).hexdigest(), entry['sha256'])
+        return content.decode()
+
+    def test_resident_statements_and_hostel_summary(self):
+        self.assertEqual(generate(self.month, self.out, chunk_size=2), (4, 0))
+        manifest = read_manifest(self.directory)
+        self.assertEqual(set(manifest), {'resident:%d' % user.id for user in self.warden.residents.all()} |
+                         {f'warden:{self.warden.id}'})
+
+        statement = self.read(manifest[f'resident:{self.warden.residents.get(username="resident1").id}'])
+        self.assertIn('2 &times; Thali @ ₹75.00', statement)
+        # Two meals ordered, one delivered live and one archived; the cancelled one isn't charged
+        self.assertIn('<td>2</td>\n        <td>2</td>\n        <td>1</td>\n        <td class="num">₹230.00</td>\n'
+                      '        <td class="num">₹3000.00</td>', statement)
+
+        summary = self.read(manifest[f'warden:{self.warden.id}'])
+        self.assertIn('3 residents', summary)
+        self.assertIn('<td>6</td>\n        <td>6</td>\n        <td>3</td>\n        <td class="num">₹690.00</td>\n'
+                      '        <td class="num">₹9000.00</td>\n        <td class="num">1 (₹500.00)</td>', summary)
+
+    def test_resumes_after_an_interruption(self):
+        generate(self.month, self.out, chunk_size=1)
+        first = read_manifest(self.directory)
+        manifest_path = os.path.join(self.directory, MANIFEST)
+        with open(manifest_path) as f:
+            lines = f.readlines()
+        # Cut off after the first statement, in the middle of writing the second line
+        with open(manifest_path, 'w') as f:
+            f.write(lines[0] + lines[1][:20])
+
+        self.assertEqual(generate(self.month, self.out, chunk_size=1), (3, 1))
+        self.assertEqual(read_manifest(self.directory), first)
+        self.assertEqual(generate(self.month, self.out), (0, 4))
+
+    def test_process_pool_renders_the_same_files(self):
+        generate(self.month, self.out)
+        serial = {key: entry['sha256'] for key, entry in read_manifest(self.directory).items()}
+
+        call_command('generate_statements', month=f'{self.month:%Y-%m}', out=self.out, workers=2, fresh=True,
+                     stdout=StringIO())
+        with open(os.path.join(self.directory, MANIFEST)) as f:
+            pooled = {entry['statement']: entry['sha256'] for entry in map(json.loads, f)}
+        self.assertEqual(pooled, serial)
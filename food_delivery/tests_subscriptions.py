@@ -0,0 +1,37 @@
+from datetime import date, timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from .models import CustomUser, SubscriptionPlan, UserSubscription
+
+class SubscriptionExpiryTest(TestCase):
+    def setUp(self):
+        self.resident = CustomUser.objects.create_user(
+            username='resident1',
+            password='password123',
+            user_type='resident',
+            is_approved=True
+        )
+        self.plan = SubscriptionPlan.objects.create(name='Monthly', duration_days=30)
+        today = date.today()
+        self.lapsed = UserSubscription.objects.create(
+            user=self.resident, plan=self.plan,
+            start_date=today - timedelta(days=30), end_date=today - timedelta(days=1)
+        )
+        self.current = UserSubscription.objects.create(
+            user=self.resident, plan=self.plan,
+            start_date=today, end_date=today + timedelta(days=29)
+        )
+
+    def test_sweep_expires_only_lapsed_subscriptions(self):
+        call_command('expire_subscriptions', stdout=StringIO())
+
+        self.lapsed.refresh_from_db()
+        self.current.refresh_from_db()
+        self.assertEqual(self.lapsed.status, 'expired')
+        self.assertEqual(self.current.status, 'active')
+        self.assertEqual(list(UserSubscription.objects.live()), [self.current])
+
+    def test_sweep_is_idempotent(self):
+        self.assertEqual(UserSubscription.objects.expire_lapsed(), 1)
+        self.assertEqual(UserSubscription.objects.expire_lapsed(), 0)
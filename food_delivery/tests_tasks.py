@@ -0,0 +1,98 @@
+from datetime import date, timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from .models import BackgroundTask, CustomUser, MealType, SubscriptionPlan, UserSubscription, DailyOrder
+from .tasks import LEASE_TIMEOUT, task, enqueue, claim_tasks, execute_task, enqueue_scheduled, heartbeat, requeue_stale
+
+calls = []
+
+@task
+def record(value):
+    calls.append(value)
+
+@task
+def always_fails():
+    raise RuntimeError('boom')
+
+
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_task_is_claimed_once_and_run(self):
+        queued = record.enqueue('hello')
+        self.assertEqual(claim_tasks(5, 'worker-a'), [queued.id])
+        self.assertEqual(claim_tasks(5, 'worker-b'), [])
+
+        self.assertTrue(execute_task(queued.id, 'worker-a'))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts, queued.locked_by), ('done', 1, 'worker-a'))
+        self.assertEqual(calls, ['hello'])
+
+    def test_failed_task_backs_off_then_fails(self):
+        queued = enqueue(always_fails, max_attempts=2)
+        claim_tasks(1, 'worker-a')
+        self.assertFalse(execute_task(queued.id, 'worker-a'))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'queued')
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn('boom', queued.last_error)
+
+        BackgroundTask.objects.filter(id=queued.id).update(run_at=timezone.now())
+        claim_tasks(1, 'worker-a')
+        execute_task(queued.id, 'worker-a')
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('failed', 2))
+
+    def test_expired_lease_is_requeued_and_the_old_claim_cannot_finish(self):
+        queued = record.enqueue('slow')
+        claim_tasks(1, 'worker-a')
+        later = timezone.now() + LEASE_TIMEOUT * 2
+        # Renewed leases stay with their worker
+        heartbeat([queued.id], 'worker-a')
+        self.assertEqual(requeue_stale(), 0)
+
+        self.assertEqual(requeue_stale(now=later), 1)
+        claim_tasks(1, 'worker-b')
+        self.assertEqual(heartbeat([queued.id], 'worker-a'), 0)
+        execute_task(queued.id, 'worker-a')
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.locked_by, queued.attempts), ('running', 'worker-b', 2))
+
+        self.assertTrue(execute_task(queued.id, 'worker-b'))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'done')
+
+    def test_task_that_keeps_killing_its_worker_fails(self):
+        queued = record.enqueue('crash', max_attempts=2)
+        later = timezone.now() + LEASE_TIMEOUT * 2
+        for _ in range(2):
+            claim_tasks(1, 'worker-a')
+            requeue_stale(now=later)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('failed', 2))
+        self.assertIn('lease', queued.last_error)
+        self.assertEqual(calls, [])
+
+    @override_settings(TASK_SCHEDULE={'tick': {'task': 'food_delivery.tests_tasks.record', 'args': ['tick'], 'every': 3600}})
+    def test_schedule_queues_once_per_slot(self):
+        self.assertEqual(enqueue_scheduled(), 1)
+        self.assertEqual(enqueue_scheduled(), 0)
+        self.assertEqual(BackgroundTask.objects.filter(task_name='food_delivery.tests_tasks.record').count(), 1)
+
+
+class GenerateDailyOrdersTest(TestCase):
+    def test_generates_one_order_per_included_meal_type(self):
+        resident = CustomUser.objects.create_user(username='resident1', password='password123', user_type='resident')
+        plan = SubscriptionPlan.objects.create(name='Full Board', duration_days=30)
+        plan.meal_types_included.set([MealType.objects.create(name='Lunch'), MealType.objects.create(name='Dinner')])
+        UserSubscription.objects.create(
+            user=resident, plan=plan, is_paid=True,
+            start_date=date.today(), end_date=date.today() + timedelta(days=29)
+        )
+
+        call_command('generate_daily_orders', stdout=StringIO())
+        call_command('generate_daily_orders', stdout=StringIO())
+        self.assertEqual(DailyOrder.objects.filter(user=resident, order_date=date.today(), status='pending').count(), 2)
@@ -0,0 +1,37 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+from django.test import TestCase
+from django.urls import reverse
+from .models import CustomUser, MealType, SubscriptionPlan, UserSubscription, DailyOrder
+
+class DashboardTemplateTest(TestCase):
+    def setUp(self):
+        self.resident = CustomUser.objects.create_user(username='resident1', password='x', user_type='resident')
+        self.vendor = CustomUser.objects.create_user(username='vendor1', password='x', user_type='vendor')
+        plan = SubscriptionPlan.objects.create(name='Monthly', base_price=Decimal('1500.00'), duration_days=30)
+        UserSubscription.objects.create(user=self.resident, plan=plan, end_date=date.today() + timedelta(days=10))
+        DailyOrder.objects.create(user=self.resident, meal_type=MealType.objects.create(name='Lunch'),
+                                  order_date=date.today() + timedelta(days=1), status='out_for_delivery')
+
+    def test_templates_are_compiled_once(self):
+        self.assertIsInstance(engines['django'].engine.template_loaders[0], CachedLoader)
+
+    def test_resident_dashboard_uses_stylesheet_not_inline_css(self):
+        self.client.force_login(self.resident)
+        response = self.client.get(reverse('dashboard'))
+
+        self.assertTemplateUsed(response, 'food_delivery/dashboard/_resident.html')
+        self.assertContains(response, 'css/dashboard.css')
+        self.assertContains(response, 'dash-status status-out_for_delivery')
+        self.assertNotContains(response, 'style="')
+        self.assertNotContains(response, '<style>')
+
+    def test_vendor_dashboard_renders_its_section(self):
+        self.client.force_login(self.vendor)
+        response = self.client.get(reverse('dashboard'))
+
+        self.assertTemplateUsed(response, 'food_delivery/dashboard/_vendor.html')
+        self.assertTemplateNotUsed(response, 'food_delivery/dashboard/_resident.html')
+        self.assertContains(response, 'No Pending Orders!')
@@ -0,0 +1,94 @@
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from .models import CustomUser, MealType, SubscriptionPlan, UserSubscription, VendorMenuItem, DailyMenu, DailyOrder, \
+                    SubscriptionUsage
+from .usage import open_ledger, recount
+
+@override_settings(NOTIFICATION_WORKER=False)
+class UsageLedgerTest(TestCase):
+    def setUp(self):
+        self.today = date.today()
+        self.resident = CustomUser.objects.create_user(username='resident1', password='x', user_type='resident')
+        self.agent = CustomUser.objects.create_user(username='agent1', password='x', user_type='delivery_agent')
+        self.lunch = MealType.objects.create(name='Lunch')
+        plan = SubscriptionPlan.objects.create(name='Monthly', duration_days=30)
+        plan.meal_types_included.add(self.lunch)
+        self.subscription = UserSubscription.objects.create(user=self.resident, plan=plan, is_paid=True,
+                                                            start_date=self.today, end_date=self.today + timedelta(days=29))
+        open_ledger(self.subscription)
+
+        vendor = CustomUser.objects.create_user(username='vendor1', password='x', user_type='vendor')
+        self.thali = VendorMenuItem.objects.create(vendor=vendor, name='Thali', price=Decimal('80.00'), meal_type='lunch')
+        DailyMenu.objects.create(vendor=vendor, meal_type=self.lunch, menu_date=self.today).available_items.add(self.thali)
+        self.order_url = reverse('resident_daily_order_select_with_date_meal', args=[self.lunch.id, self.today.isoformat()])
+
+    def usage(self):
+        row = SubscriptionUsage.objects.get(subscription=self.subscription, meal_type=self.lunch)
+        return row.entitled, row.ordered, row.delivered
+
+    def test_order_lifecycle(self):
+        self.client.force_login(self.resident)
+        self.client.post(self.order_url, {f'quantity_{self.thali.id}': 1})
+        self.assertEqual(self.usage(), (30, 1, 0))
+
+        order = DailyOrder.objects.get()
+        DailyOrder.objects.filter(id=order.id).update(delivery_agent=self.agent, status='prepared')
+        self.client.force_login(self.agent)
+        response = self.client.post(reverse('api_v1_agent_bulk_status'), json.dumps({'updates': [
+            {'id': order.id, 'status': 'out_for_delivery'}, {'id': order.id, 'status': 'delivered'},
+        ]}), content_type='application/json')
+        self.assertEqual(len(response.json()['applied']), 2)
+        self.assertEqual(self.usage(), (30, 1, 1))
+
+        # Undoing the delivery and cancelling gives the meal back
+        self.client.post(reverse('delivery_agent_update_daily_order_status', args=[order.id]), {'status': 'cancelled'})
+        self.assertEqual(self.usage(), (30, 0, 0))
+
+    async def test_async_agent_delivery(self):
+        order = await DailyOrder.objects.acreate(user=self.resident, user_subscription=self.subscription,
+                                                 meal_type=self.lunch, order_date=self.today,
+                                                 status='reached_location', delivery_agent=self.agent)
+        await SubscriptionUsage.objects.filter(subscription=self.subscription).aupdate(ordered=1)
+        await self.async_client.aforce_login(self.agent)
+        await self.async_client.post(reverse('delivery_complete_order', args=[order.id]))
+        row = await SubscriptionUsage.objects.aget(subscription=self.subscription)
+        self.assertEqual((row.ordered, row.delivered), (1, 1))
+
+    def test_generated_orders_and_reconcile(self):
+        call_command('generate_daily_orders', stdout=StringIO())
+        self.assertEqual(self.usage(), (30, 1, 0))
+
+        SubscriptionUsage.objects.update(ordered=7)
+        out = StringIO()
+        call_command('reconcile_usage', '--dry-run', stdout=out)
+        self.assertIn('Found 1 drifted', out.getvalue())
+        self.assertEqual(self.usage(), (30, 7, 0))
+        call_command('reconcile_usage', stdout=StringIO())
+        self.assertEqual(self.usage(), (30, 1, 0))
+        self.assertEqual(recount(), [])
+
+    def test_ordering_on_a_generated_order_submits_it(self):
+        call_command('generate_daily_orders', stdout=StringIO())
+        generated = DailyOrder.objects.get()
+        self.client.force_login(self.resident)
+        self.client.post(self.order_url, {f'quantity_{self.thali.id}': 2})
+
+        order = DailyOrder.objects.get()
+        self.assertEqual((order.id, order.status), (generated.id, 'submitted'))
+        self.assertEqual(list(order.items.values_list('quantity', flat=True)), [2])
+        self.assertEqual(self.usage(), (30, 1, 0))
+
+    def test_missing_row_is_counted_from_the_orders(self):
+        SubscriptionUsage.objects.all().delete()
+        DailyOrder.objects.create(user=self.resident, user_subscription=self.subscription, meal_type=self.lunch,
+                                  order_date=self.today - timedelta(days=1), status='delivered')
+        self.client.force_login(self.resident)
+        self.client.post(self.order_url, {f'quantity_{self.thali.id}': 1})
+        self.assertEqual(self.usage(), (30, 2, 1))
+
+        self.assertContains(self.client.get(reverse('dashboard')), 'Lunch: 28 of 30 meals left')
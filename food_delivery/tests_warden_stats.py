@@ -0,0 +1,76 @@
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from .models import CustomUser, MealType, DailyOrder
+from .warden_stats import hostel_stats
+
+class WardenStatsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = date.today()
+        self.warden = CustomUser.objects.create_user(username='warden1', password='x', user_type='warden')
+        self.lunch = MealType.objects.create(name='Lunch')
+        self.dinner = MealType.objects.create(name='Dinner')
+        self.alice = CustomUser.objects.create_user(username='alice', password='x', user_type='resident', warden=self.warden)
+        self.bob = CustomUser.objects.create_user(username='bob', password='x', user_type='resident', warden=self.warden)
+        CustomUser.objects.create_user(username='carol', password='x', user_type='resident', warden=self.warden)
+        outsider = CustomUser.objects.create_user(username='dave', password='x', user_type='resident')
+
+        yesterday = self.today - timedelta(days=1)
+        DailyOrder.objects.create(user=self.alice, meal_type=self.lunch, order_date=yesterday, status='delivered')
+        DailyOrder.objects.create(user=self.alice, meal_type=self.dinner, order_date=yesterday, status='delivered')
+        self.missed = DailyOrder.objects.create(user=self.bob, meal_type=self.lunch, order_date=yesterday, status='submitted')
+        DailyOrder.objects.create(user=self.bob, meal_type=self.dinner, order_date=yesterday, status='cancelled')
+        # Today's open order isn't missed yet, and other hostels don't count
+        DailyOrder.objects.create(user=self.bob, meal_type=self.lunch, order_date=self.today, status='submitted')
+        DailyOrder.objects.create(user=outsider, meal_type=self.lunch, order_date=yesterday, status='delivered')
+
+    def test_consumption_missed_meals_and_headcounts(self):
+        stats = hostel_stats(self.warden, weeks=2)
+        residents = {r['username']: r for r in stats['residents']}
+        self.assertEqual(list(residents), ['bob', 'alice', 'carol'])
+        self.assertEqual((residents['alice']['consumed'], residents['alice']['missed']), (2, 0))
+        self.assertEqual((residents['bob']['missed'], residents['bob']['cancelled']), (1, 1))
+        self.assertEqual(residents['carol']['consumed'], 0)
+        self.assertEqual(stats['totals'], {'consumed': 2, 'missed': 1, 'cancelled': 1})
+
+        lunch = {(h['week'], h['meal_type']): h for h in stats['headcounts']}
+        week = self.today - timedelta(days=1)
+        week -= timedelta(days=week.weekday())
+        self.assertEqual(lunch[week, 'Lunch']['residents'], 1)
+        self.assertEqual(lunch[week, 'Lunch']['missed'], 1)
+
+    def test_cached_until_an_order_changes(self):
+        hostel_stats(self.warden)
+        # Order version and resident list only
+        with self.assertNumQueries(2):
+            stats = hostel_stats(self.warden)
+        self.assertEqual(stats['totals']['consumed'], 2)
+
+        self.missed.status = 'delivered'
+        self.missed.save()
+        self.assertEqual(hostel_stats(self.warden)['totals']['consumed'], 3)
+
+    def test_deleted_orders_and_moved_residents_invalidate_the_cache(self):
+        hostel_stats(self.warden)
+        self.missed.delete()
+        self.assertEqual(hostel_stats(self.warden)['totals']['missed'], 0)
+
+        # Same number of residents, but not the same ones
+        other = CustomUser.objects.create_user(username='other_warden', password='x', user_type='warden')
+        CustomUser.objects.filter(id=self.alice.id).update(warden=other)
+        CustomUser.objects.filter(username='dave').update(warden=self.warden)
+        stats = hostel_stats(self.warden)
+        self.assertEqual(sorted(r['username'] for r in stats['residents']), ['bob', 'carol', 'dave'])
+        self.assertEqual(stats['totals']['consumed'], 1)
+
+    def test_page(self):
+        self.client.force_login(self.warden)
+        response = self.client.get(reverse('warden_stats'), {'weeks': 99})
+        self.assertEqual(response.context['stats']['weeks'], 12)
+        self.assertContains(response, 'alice')
+        self.assertNotContains(response, 'dave')
+
+        self.client.force_login(self.alice)
+        self.assertEqual(self.client.get(reverse('warden_stats')).status_code, 302)
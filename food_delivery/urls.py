@@ -1,6 +1,6 @@
 # food_delivery/urls.py
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.home_view, name='home'),
@@ -17,8 +17,10 @@ urlpatterns = [
 
     # Warden URLs
     path('warden/dashboard/', views.warden_dashboard, name='warden_dashboard'),
+    path('warden/stats/', views.warden_stats, name='warden_stats'),
     path('warden/users/', views.warden_manage_users, name='warden_manage_users'),
     path('warden/bulk-order/', views.warden_bulk_order, name='warden_bulk_order'),
+    path('warden/bulk-order/<int:order_id>/delivered/', views.warden_confirm_bulk_delivery, name='warden_confirm_bulk_delivery'),
 
     # Vendor URLs
     path('vendor/menu-items/', views.vendor_menu_item_list, name='vendor_menu_item_list'),
@@ -36,6 +38,8 @@ urlpatterns = [
     ),
 
     # path('vendor/daily-order/<int:order_id>/update-status/', views.vendor_update_daily_order_status, name='vendor_update_daily_order_status'),
+    path('vendor/production/', views.vendor_production_sheet, name='vendor_production_sheet'),
+    path('vendor/settlements/', views.vendor_settlements, name='vendor_settlements'),
     path('vendor/my-subscriptions/', views.vendor_manage_subscriptions, name='vendor_manage_subscriptions'),
     path('vendor/menu-items/', views.vendor_menu_item_list, name='vendor_menu_item_list'),
 
@@ -46,6 +50,9 @@ urlpatterns = [
     path('admin-daily-orders/pending/', views.admin_pending_daily_orders_view, name='admin_pending_daily_orders'),
 
     path('site-admin/dashboard/', views.custom_admin_dashboard, name='custom_admin_dashboard'),
+    path('site-admin/analytics/', views.custom_admin_analytics, name='custom_admin_analytics'),
+    path('site-admin/settlements/', views.custom_admin_settlements, name='custom_admin_settlements'),
+    path('settlements/<int:pk>/export/', views.settlement_export, name='settlement_export'),
     path('site-admin/users/', views.custom_admin_manage_users, name='custom_admin_manage_users'),
     path('site-admin/wardens/', views.custom_admin_manage_wardens, name='custom_admin_manage_wardens'),
     path('site-admin/plans/', views.custom_admin_manage_plans, name='custom_admin_manage_plans'),
@@ -121,5 +128,13 @@ path(
     name='delivery_agent_history'
 ),
 
+    # JSON API (read-only, versioned)
+    path('api/v1/menu/today/', api.menu_today, name='api_v1_menu_today'),
+    path('api/v1/orders/upcoming/', api.upcoming_orders, name='api_v1_upcoming_orders'),
+    path('api/v1/subscriptions/', api.subscription_status, name='api_v1_subscriptions'),
+    path('api/v1/agent/assignments/', api.agent_assignments, name='api_v1_agent_assignments'),
+    path('api/v1/agent/manifest/', api.agent_manifest, name='api_v1_agent_manifest'),
+    path('api/v1/agent/manifest/status/', api.agent_bulk_status, name='api_v1_agent_bulk_status'),
+
 
 ]
\ No newline at end of file
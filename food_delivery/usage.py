@@ -0,0 +1,199 @@
+# food_delivery/usage.py
+"""Subscription usage ledger (SubscriptionUsage), maintained incrementally.
+
+Every write that creates an order or changes its status also applies the
+matching delta to the order's (subscription, meal type) row, with an F()
+update in the same transaction: +1 ordered for a new order, -1 when it is
+cancelled, +1 delivered on delivery, and the reverse of each when a status is
+undone. Reading what is left of an entitlement is then one indexed lookup
+instead of counting ``daily_orders_from_subscription``.
+
+Writes whose effect can't be known row by row (``bulk_create`` with
+``ignore_conflicts``) call ``recount()`` for the subscriptions they touched,
+and the ``reconcile_usage`` command recounts everything to catch drift.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from .models import DailyOrder, DailyOrderArchive, SubscriptionUsage, UserSubscription
+from .sharding import tenant_atomic
+
+
+def _weight(status):
+    """(ordered, delivered) contribution of one order in ``status``."""
+    return int(status != 'cancelled'), int(status == 'delivered')
+
+
+def entitlement(subscription):
+    if not (subscription.start_date and subscription.end_date):
+        return 0
+    return max((subscription.end_date - subscription.start_date).days + 1, 0)
+
+
+def open_ledger(subscription):
+    """Create the empty rows for each meal type the subscription's plan covers."""
+    entitled = entitlement(subscription)
+    SubscriptionUsage.objects.bulk_create([
+        SubscriptionUsage(subscription=subscription, meal_type_id=meal_type_id, entitled=entitled)
+        for meal_type_id in subscription.plan.meal_types_included.values_list('id', flat=True)
+    ], ignore_conflicts=True)
+
+
+def _apply(deltas):
+    """Apply {(subscription_id, meal_type_id): (ordered, delivered)} deltas."""
+    missing = set()
+    for (subscription_id, meal_type_id), (ordered, delivered) in deltas.items():
+        if not subscription_id or not (ordered or delivered):
+            continue
+        changed = SubscriptionUsage.objects.filter(
+            subscription_id=subscription_id, meal_type_id=meal_type_id
+        ).update(ordered=F('ordered') + ordered, delivered=F('delivered') + delivered)
+        if not changed:
+            missing.add(subscription_id)
+    # No row yet (e.g. a subscription from before the ledger): count it from scratch,
+    # which already includes the change being recorded
+    if missing:
+        recount(missing)
+
+
+def record_new_order(order):
+    """Count an order that was just created."""
+    _apply({(order.user_subscription_id, order.meal_type_id): _weight(order.status)})
+
+
+def stamp_delivery(order, old_status):
+    """Set ``delivered_time`` on an unsaved ``order`` that is moving into
+    delivered, so settlement (which selects on it) sees every delivery,
+    including a repeated one."""
+    if order.status == 'delivered' and old_status != 'delivered':
+        order.delivered_time = timezone.now()
+
+
+def record_status_change(order, old_status):
+    """Count ``order`` moving from ``old_status`` to its current status."""
+    if old_status == order.status:
+        return
+    (old_ordered, old_delivered), (ordered, delivered) = _weight(old_status), _weight(order.status)
+    _apply({(order.user_subscription_id, order.meal_type_id): (ordered - old_ordered, delivered - old_delivered)})
+
+
+SET_STATUS_TRIES = 3
+
+
+def _locked_rows(orders):
+    return list(orders.select_for_update().values_list('id', 'user_subscription_id', 'meal_type_id', 'status'))
+
+
+def set_status(orders, status, **changes):
+    """UPDATE the orders in queryset ``orders`` to ``status`` (plus any other
+    ``changes``) and move the ledger with them. Orders moving into delivered
+    get ``delivered_time`` stamped (unless ``changes`` sets it). Returns the
+    ids of the orders updated.
+
+    The old statuses are read under a row lock, and the UPDATE (one per old
+    status) keeps every condition of ``orders`` (e.g. the agent and the
+    statuses a change may follow) plus the status that was read, so a row
+    changed by someone else in between is never overwritten. SQLite has no row
+    locks: if the UPDATEs then match fewer rows than were read, the transaction
+    is rolled back and run again on fresh rows, so the ledger deltas always
+    match exactly what was changed."""
+    for _ in range(SET_STATUS_TRIES):
+        with tenant_atomic():
+            rows = _locked_rows(orders)
+            ids = [row[0] for row in rows]
+            if not ids:
+                return ids
+            by_old_status = {}
+            for order_id, _, _, old_status in rows:
+                by_old_status.setdefault(old_status, []).append(order_id)
+            stamp = {'delivered_time': timezone.now()} if status == 'delivered' else {}
+            updated = sum(
+                orders.filter(id__in=group, status=old_status).update(
+                    status=status, **{**(stamp if old_status != status else {}), **changes}
+                )
+                for old_status, group in by_old_status.items()
+            )
+            if updated == len(ids):
+                _apply(_deltas(rows, status))
+                return ids
+            transaction.set_rollback(True)
+    raise RuntimeError(f'Orders kept changing while being set to {status}; giving up after {SET_STATUS_TRIES} tries.')
+
+
+def _deltas(rows, status):
+    ordered, delivered = _weight(status)
+    deltas = {}
+    for _, subscription_id, meal_type_id, old_status in rows:
+        old_ordered, old_delivered = _weight(old_status)
+        delta = deltas.setdefault((subscription_id, meal_type_id), [0, 0])
+        delta[0] += ordered - old_ordered
+        delta[1] += delivered - old_delivered
+    return deltas
+
+
+def count_usage(subscription_ids=None):
+    """{subscription_id: {meal_type_id: [ordered, delivered]}} counted from the
+    live and archived order tables."""
+    counts = {}
+    for model in (DailyOrder, DailyOrderArchive):
+        rows = model.objects.filter(user_subscription__isnull=False)
+        if subscription_ids is not None:
+            rows = rows.filter(user_subscription__in=subscription_ids)
+        for subscription_id, meal_type_id, ordered, delivered in rows.values_list(
+            'user_subscription', 'meal_type'
+        ).annotate(
+            ordered=Count('id', filter=~Q(status='cancelled')),
+            delivered=Count('id', filter=Q(status='delivered')),
+        ).order_by():
+            total = counts.setdefault(subscription_id, {}).setdefault(meal_type_id, [0, 0])
+            total[0] += ordered
+            total[1] += delivered
+    return counts
+
+
+def recount(subscription_ids=None, dry_run=False):
+    """Rewrite the ledger rows of ``subscription_ids`` (default: all) from the
+    order tables. Returns the rows that were wrong, as (subscription_id,
+    meal_type_id, (entitled, ordered, delivered) stored, ... counted)."""
+    subscriptions = UserSubscription.objects.prefetch_related('plan__meal_types_included')
+    ledger = SubscriptionUsage.objects.all()
+    if subscription_ids is not None:
+        subscription_ids = list(subscription_ids)
+        subscriptions = subscriptions.filter(id__in=subscription_ids)
+        ledger = ledger.filter(subscription__in=subscription_ids)
+
+    with tenant_atomic():
+        counted = count_usage(subscription_ids)
+        expected = {}
+        for subscription in subscriptions:
+            entitled = entitlement(subscription)
+            for meal_type in subscription.plan.meal_types_included.all():
+                expected[subscription.id, meal_type.id] = (entitled, 0, 0)
+            for meal_type_id, (ordered, delivered) in counted.get(subscription.id, {}).items():
+                expected[subscription.id, meal_type_id] = (entitled, ordered, delivered)
+
+        stored = {
+            (row.subscription_id, row.meal_type_id): row
+            for row in ledger.select_for_update()
+        }
+        drift = []
+        for key, values in expected.items():
+            row = stored.get(key)
+            current = (row.entitled, row.ordered, row.delivered) if row else None
+            if current != values:
+                drift.append((*key, current, values))
+        if dry_run or not drift:
+            return drift
+
+        stale, new = [], []
+        for subscription_id, meal_type_id, current, (entitled, ordered, delivered) in drift:
+            row = stored.get((subscription_id, meal_type_id))
+            if row is None:
+                new.append(SubscriptionUsage(subscription_id=subscription_id, meal_type_id=meal_type_id,
+                                             entitled=entitled, ordered=ordered, delivered=delivered))
+            else:
+                row.entitled, row.ordered, row.delivered = entitled, ordered, delivered
+                stale.append(row)
+        SubscriptionUsage.objects.bulk_update(stale, ['entitled', 'ordered', 'delivered'], batch_size=500)
+        SubscriptionUsage.objects.bulk_create(new, batch_size=500, ignore_conflicts=True)
+    return drift
@@ -1,13 +1,34 @@
 # food_delivery/views.py
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, StreamingHttpResponse
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.utils import timezone
+from django.core import signing
+from django.urls import reverse
+from urllib.parse import urlencode
+import secrets
 from datetime import date, timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, Sum
 from django.contrib.auth import authenticate, login, logout
 from .models import CustomUser, MealType, SubscriptionPlan, UserSubscription, \
                     VendorMenuItem, DailyMenu, DailyOrder, DailyOrderItem, Payment, VendorSubscription, \
-                    BulkOrder, BulkOrderItem
+                    BulkOrder, BulkOrderItem, DailyOrderRollup, PaymentRollup, RollupCheckpoint, DemandSnapshotItem, \
+                    DemandForecast, SubscriptionUsage, SettlementBatch, VendorSettlement
+from .rollups import ORDER_CHECKPOINT
+from .routers import read_from_replica
+from .notifications import notify_status_change
+from .history import aforget_history_total, delivery_history_page
+from .conditional import conditional_page, freshness
+from .cutoffs import is_slot_open, live_demand, slot_closes_at
+from .reference import meal_types
+from .capacity import SoldOut, move_portions, remaining_counts, reserve, set_capacities
+from .warden_stats import DEFAULT_WEEKS, MAX_WEEKS, hostel_stats
+from .usage import open_ledger, record_new_order, record_status_change, set_status, stamp_delivery
+from .sharding import fan_out, gather, shard_from_query, tenant_atomic
+from .settlements import export_lines
 
 from .forms import CustomUserCreationForm, UserSubscribeForm, VendorMenuItemForm, DailyMenuForm, \
                    DailyOrderSelectionForm, VendorUpdateDailyOrderStatusForm, \
@@ -78,46 +99,68 @@ def logout_view(request):
 
 def subscription_plans_view(request):
 
-    plans = SubscriptionPlan.objects.filter(is_active=True).order_by('name')
+    plans = SubscriptionPlan.objects.filter(is_active=True).prefetch_related('meal_types_included').order_by('name')
 
     if request.user.is_authenticated and request.user.user_type == 'resident':
         # Get IDs of plans the user currently has an active, valid subscription for
-        subscribed_plan_ids = UserSubscription.objects.filter(
-            user=request.user,
-            status='active',
-            end_date__gte=date.today()
+        subscribed_plan_ids = UserSubscription.objects.live().filter(
+            user=request.user
         ).values_list('plan', flat=True)
         
         plans = plans.exclude(id__in=subscribed_plan_ids)
 
     return render(request, 'food_delivery/subscription_plans.html', {'plans': plans})
 
+# The plan being paid for travels as one signed token instead of session keys,
+# so the subscribe -> pay -> process hand-off never writes the session table.
+PAYMENT_TOKEN_SALT = 'food_delivery.payment'
+PAYMENT_TOKEN_MAX_AGE = 30 * 60
+
+def _make_payment_token(user, plan):
+    return signing.dumps({
+        'user': user.id,
+        'plan': plan.id,
+        'name': plan.name,
+        'amount': str(plan.base_price),  # Use string for signing safety
+        'days': plan.duration_days,
+        'issued': timezone.now().timestamp(),
+        # Stored on the Payment, whose unique constraint lets each token pay once
+        'nonce': secrets.token_hex(16),
+    }, salt=PAYMENT_TOKEN_SALT, compress=True)
+
+def _read_payment_token(request, token):
+    # Returns the payment details, or None if the token is missing, tampered, expired or not ours
+    if not token:
+        return None
+    try:
+        data = signing.loads(token, salt=PAYMENT_TOKEN_SALT, max_age=PAYMENT_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    if data.get('user') != request.user.id or not data.get('nonce'):
+        return None
+    return data
+
 @login_required
 @user_passes_test(is_resident)
 def subscribe_to_plan_view(request, plan_id):
-    # This view now just prepares the payment session, it does NOT create the subscription.
+    # This view now just prepares the payment token, it does NOT create the subscription.
     plan = get_object_or_404(SubscriptionPlan, id=plan_id, is_active=True)
-    
-    # Store plan details in the session to carry over to the payment page
-    request.session['payment_plan_id'] = plan.id
-    request.session['payment_plan_name'] = plan.name
-    request.session['payment_amount'] = str(plan.base_price) # Use string for session safety
-    request.session['payment_duration_days'] = plan.duration_days
-
-    return redirect('payment_page')
+    return redirect(f"{reverse('payment_page')}?{urlencode({'token': _make_payment_token(request.user, plan)})}")
 
 @login_required
 @user_passes_test(is_resident)
 def payment_page(request):
     # This view displays the dummy payment form
-    plan_id = request.session.get('payment_plan_id')
-    if not plan_id:
+    token = request.GET.get('token')
+    payment = _read_payment_token(request, token)
+    if not payment:
         messages.error(request, "No subscription plan selected. Please choose a plan first.")
         return redirect('subscription_plans')
 
     context = {
-        'plan_name': request.session.get('payment_plan_name'),
-        'amount': request.session.get('payment_amount'),
+        'plan_name': payment['name'],
+        'amount': payment['amount'],
+        'payment_token': token,
         'form': DummyPaymentForm()
     }
     return render(request, 'food_delivery/payment_page.html', context)
@@ -127,42 +170,43 @@ def payment_page(request):
 def process_payment(request):
     # This view processes the dummy payment and creates the subscription.
     if request.method == 'POST':
-        plan_id = request.session.get('payment_plan_id')
-        amount = request.session.get('payment_amount')
-        duration_days = request.session.get('payment_duration_days')
-
-        if not all([plan_id, amount, duration_days]):
+        payment = _read_payment_token(request, request.POST.get('payment_token'))
+        if not payment:
             messages.error(request, "Your session expired. Please try again.")
             return redirect('subscription_plans')
-            
-        plan = get_object_or_404(SubscriptionPlan, id=plan_id)
+
+        plan = get_object_or_404(SubscriptionPlan, id=payment['plan'])
 
         # Create the UserSubscription and Payment records
         start_date = date.today()
-        end_date = start_date + timedelta(days=duration_days - 1)
-        
-        new_subscription = UserSubscription.objects.create(
-            user=request.user,
-            plan=plan,
-            start_date=start_date,
-            end_date=end_date,
-            total_amount_paid=amount,
-            is_paid=True, # Mark as paid
-            status='active'
-        )
+        end_date = start_date + timedelta(days=payment['days'] - 1)
+        amount = payment['amount']
 
-        Payment.objects.create(
-            user=request.user,
-            user_subscription=new_subscription,
-            amount=amount,
-            is_successful=True
-        )
+        try:
+            with tenant_atomic():
+                new_subscription = UserSubscription.objects.create(
+                    user=request.user,
+                    plan=plan,
+                    start_date=start_date,
+                    end_date=end_date,
+                    total_amount_paid=amount,
+                    is_paid=True, # Mark as paid
+                    status='active'
+                )
+                open_ledger(new_subscription)
+
+                Payment.objects.create(
+                    user=request.user,
+                    user_subscription=new_subscription,
+                    amount=amount,
+                    is_successful=True,
+                    token_nonce=payment['nonce'],
+                )
+        except IntegrityError:
+            # A resubmitted (or concurrently submitted) form carries the same token; don't charge twice
+            messages.info(request, f'You are already subscribed to "{plan.name}".')
+            return redirect('dashboard')
 
-        # Clean up the session
-        for key in ['payment_plan_id', 'payment_plan_name', 'payment_amount', 'payment_duration_days']:
-            if key in request.session:
-                del request.session[key]
-        
         messages.success(request, f'Payment successful! You are now subscribed to "{plan.name}".')
         return redirect('dashboard')
     
@@ -176,19 +220,6 @@ from django.shortcuts import get_object_or_404, redirect, render
 @user_passes_test(is_resident)
 def resident_daily_order_select(request, meal_type_id=None, order_date_str=None):
 
-    # Active paid subscriptions
-    user_subscriptions = UserSubscription.objects.filter(
-        user=request.user,
-        status='active',
-        is_paid=True,
-        start_date__lte=date.today(),
-        end_date__gte=date.today()
-    ).prefetch_related('plan__meal_types_included')
-
-    if not user_subscriptions.exists():
-        messages.warning(request, "You don't have an active subscription to place an order.")
-        return redirect('subscription_plans')
-
     # Order date
     order_date = date.today()
     if order_date_str:
@@ -197,6 +228,25 @@ def resident_daily_order_select(request, meal_type_id=None, order_date_str=None)
         except ValueError:
             messages.error(request, "Invalid date format.")
             return redirect('resident_daily_order_select')
+    if order_date < date.today():
+        messages.error(request, "Orders can't be placed for past dates.")
+        return redirect('resident_daily_order_select')
+
+    # Late writes are turned away from the cached cutoffs before any query runs
+    if request.method == 'POST' and meal_type_id and not is_slot_open(meal_type_id, order_date):
+        messages.error(request, "Ordering for this meal has closed.")
+        return redirect('resident_daily_order_select_with_date_meal', meal_type_id, order_date.isoformat())
+
+    # Active paid subscriptions
+    user_subscriptions = UserSubscription.objects.live().filter(
+        user=request.user,
+        is_paid=True,
+        start_date__lte=date.today()
+    ).prefetch_related('plan__meal_types_included')
+
+    if not user_subscriptions.exists():
+        messages.warning(request, "You don't have an active subscription to place an order.")
+        return redirect('subscription_plans')
 
     # Eligible meal types
     eligible_meal_types_ids = {
@@ -225,6 +275,7 @@ def resident_daily_order_select(request, meal_type_id=None, order_date_str=None)
 
     daily_menu = None
     filtered_items = []
+    slot_open = selected_meal_type is not None and is_slot_open(selected_meal_type.id, order_date)
 
     if selected_meal_type:
         daily_menu = DailyMenu.objects.filter(
@@ -242,7 +293,7 @@ def resident_daily_order_select(request, meal_type_id=None, order_date_str=None)
             filtered_items = []
             for item in daily_menu.available_items.all():
                 # Item is available if it's global OR linked to one of user's plans
-                is_linked_to_plan = item.subscription_plans.filter(id__in=user_plan_ids).exists()
+                is_linked_to_plan = any(plan.id in user_plan_ids for plan in item.subscription_plans.all())
                 if item.is_available_globally or is_linked_to_plan:
                     filtered_items.append(item)
 
@@ -256,6 +307,10 @@ def resident_daily_order_select(request, meal_type_id=None, order_date_str=None)
             meal_type=selected_meal_type
         ).first()
 
+        if request.method == 'POST' and filtered_items and not slot_open:
+            messages.error(request, "Ordering for this meal has closed.")
+            return redirect('resident_daily_order_select_with_date_meal', selected_meal_type.id, order_date.isoformat())
+
         if request.method == 'POST' and filtered_items:
             covering_subscription = user_subscriptions.filter(
                 plan__meal_types_included=selected_meal_type
@@ -265,32 +320,74 @@ def resident_daily_order_select(request, meal_type_id=None, order_date_str=None)
                 messages.error(request, "No active subscription covers this meal.")
                 return redirect('resident_daily_order_select')
 
-            if existing_daily_order:
-                daily_order = existing_daily_order
-                daily_order.items.all().delete()
-            else:
-                daily_order = DailyOrder.objects.create(
-                    user=request.user,
-                    user_subscription=covering_subscription,
-                    order_date=order_date,
-                    meal_type=selected_meal_type,
-                    status='submitted'
-                )
-
+            wanted = {}
             for item in filtered_items:
                 qty = int(request.POST.get(f'quantity_{item.id}', 0))
-                price = item.price
                 if qty > 0:
-                    DailyOrderItem.objects.create(
-                        daily_order=daily_order,
-                        menu_item=item,
-                        quantity=qty,
-                        price_at_order_time=price
-                    )
-
-            messages.success(request, "Your order has been placed successfully.")
+                    wanted[item.id] = qty
+            # A cancelled order already gave its portions back
+            previous = {}
+            reopened = existing_daily_order is not None and existing_daily_order.status == 'cancelled'
+            if existing_daily_order and not reopened:
+                previous = dict(existing_daily_order.items.values_list('menu_item_id', 'quantity'))
+            old_status = existing_daily_order and existing_daily_order.status
+
+            try:
+                # Portions are taken in default and the order written to the hostel's database;
+                # a failure in either rolls both back
+                with transaction.atomic(), tenant_atomic():
+                    reserve(order_date, selected_meal_type.id, wanted, previous)
+
+                    if existing_daily_order:
+                        daily_order = existing_daily_order
+                        daily_order.items.all().delete()
+                        # The slot holds one order per resident, so ordering again after a
+                        # cancellation reopens the cancelled order with the new items, and
+                        # ordering on top of a generated (pending) order submits it
+                        if old_status in ('cancelled', 'pending'):
+                            daily_order.status = 'submitted'
+                        # Replacing items alone would leave the order's pages looking unchanged
+                        daily_order.save(update_fields=['status', 'updated_at'])
+                        record_status_change(daily_order, old_status)
+                    else:
+                        daily_order = DailyOrder.objects.create(
+                            user=request.user,
+                            user_subscription=covering_subscription,
+                            order_date=order_date,
+                            meal_type=selected_meal_type,
+                            status='submitted'
+                        )
+                        record_new_order(daily_order)
+
+                    for item in filtered_items:
+                        if item.id in wanted:
+                            DailyOrderItem.objects.create(
+                                daily_order=daily_order,
+                                menu_item=item,
+                                quantity=wanted[item.id],
+                                price_at_order_time=item.price
+                            )
+            except SoldOut as sold_out:
+                name = next(item.name for item in filtered_items if item.id == sold_out.menu_item_id)
+                messages.error(request, f"Sorry, there aren't enough portions of {name} left. Please change your order.")
+                return redirect('resident_daily_order_select_with_date_meal', selected_meal_type.id, order_date.isoformat())
+
+            if reopened:
+                messages.success(request, "Your cancelled order has been placed again.")
+            else:
+                messages.success(request, "Your order has been placed successfully.")
             return redirect('dashboard')
 
+    if filtered_items:
+        remaining = remaining_counts(order_date, selected_meal_type.id)
+        held = {}
+        if existing_daily_order and existing_daily_order.status != 'cancelled':
+            held = dict(existing_daily_order.items.values_list('menu_item_id', 'quantity'))
+        for item in filtered_items:
+            item.remaining = remaining.get(item.id)
+            # The resident's own portions can always be kept
+            item.max_quantity = 10 if item.remaining is None else min(10, item.remaining + held.get(item.id, 0))
+
     context = {
         'order_date': order_date,
         'eligible_meal_types': eligible_meal_types,
@@ -298,7 +395,9 @@ def resident_daily_order_select(request, meal_type_id=None, order_date_str=None)
         'daily_menu': daily_menu,
         'filtered_items': filtered_items,
         'existing_daily_order': existing_daily_order,
-        'user_active_subscription': user_active_subscription
+        'user_active_subscription': user_active_subscription,
+        'slot_open': slot_open,
+        'slot_closes_at': selected_meal_type and slot_closes_at(selected_meal_type.id, order_date),
     }
 
     return render(request, 'food_delivery/resident_daily_order_select.html', context)
@@ -423,6 +522,7 @@ def vendor_daily_menu_create_update(request):
             )
 
             daily_menu.available_items.set(available_items)
+            set_capacities(daily_menu, form.capacities)
 
             messages.success(
                 request,
@@ -435,7 +535,18 @@ def vendor_daily_menu_create_update(request):
         messages.error(request, "Please fix the errors below.")
 
     else:
-        form = DailyMenuForm(vendor=request.user)
+        # ?menu_date=&meal_type= opens that menu with its items and limits filled in
+        initial = {key: request.GET[key] for key in ('menu_date', 'meal_type') if request.GET.get(key)}
+        daily_menu = None
+        if len(initial) == 2:
+            try:
+                daily_menu = DailyMenu.objects.filter(
+                    vendor=request.user, menu_date=date.fromisoformat(initial['menu_date']),
+                    meal_type_id=int(initial['meal_type']),
+                ).prefetch_related('entries').first()
+            except ValueError:
+                initial = {}
+        form = DailyMenuForm(instance=daily_menu, initial=initial, vendor=request.user)
 
     return render(
         request,
@@ -448,8 +559,14 @@ def vendor_daily_menu_create_update(request):
 
 from . forms import OrderStatusUpdateForm
 
+def _sold_out_message(order, sold_out):
+    # Reopening a cancelled order needs its portions back, which others may have taken
+    name = order.items.filter(menu_item_id=sold_out.menu_item_id).values_list('menu_item__name', flat=True).first()
+    return f"This order can't be reopened: there aren't enough portions of {name} left."
+
 @login_required
 @user_passes_test(is_vendor)
+@shard_from_query
 def vendor_update_order_status(request, order_id):
 
     # ✅ Fetch order with resident + meal
@@ -467,11 +584,23 @@ def vendor_update_order_status(request, order_id):
     )
 
     if request.method == 'POST':
+        old_status = order.status
         form = OrderStatusUpdateForm(request.POST, instance=order)
         if form.is_valid():
-            form.save()
-            messages.success(request, "Order status updated successfully.")
-            return redirect('dashboard')
+            order = form.save(commit=False)
+            stamp_delivery(order, old_status)
+            try:
+                with transaction.atomic(), tenant_atomic():
+                    move_portions(order, old_status)
+                    order.save()
+                    record_status_change(order, old_status)
+            except SoldOut as sold_out:
+                form.add_error('status', _sold_out_message(order, sold_out))
+                order.status = old_status
+            else:
+                notify_status_change(order.id, order.status, order.database)
+                messages.success(request, "Order status updated successfully.")
+                return redirect('dashboard')
     else:
         form = OrderStatusUpdateForm(instance=order)
 
@@ -483,20 +612,30 @@ def vendor_update_order_status(request, order_id):
 
 @login_required
 @user_passes_test(is_delivery_agent)
+@shard_from_query
 def delivery_agent_update_daily_order_status(request, order_id):
     order = get_object_or_404(DailyOrder, id=order_id, delivery_agent=request.user)
 
     if request.method == 'POST':
+        old_status = order.status
         form = DeliveryAgentUpdateDailyOrderStatusForm(request.POST, instance=order)
         if form.is_valid():
             new_status = form.cleaned_data['status']
             if new_status == 'out_for_delivery' and not order.assigned_time:
                 order.assigned_time = timezone.now()
-            elif new_status == 'delivered' and not order.delivered_time:
-                order.delivered_time = timezone.now()
-            order.save()
-            messages.success(request, f"Daily Order {order.id} status updated to {order.get_status_display()}.")
-            return redirect('dashboard')
+            stamp_delivery(order, old_status)
+            try:
+                with transaction.atomic(), tenant_atomic():
+                    move_portions(order, old_status)
+                    order.save()
+                    record_status_change(order, old_status)
+            except SoldOut as sold_out:
+                form.add_error('status', _sold_out_message(order, sold_out))
+                order.status = old_status
+            else:
+                notify_status_change(order.id, order.status, order.database)
+                messages.success(request, f"Daily Order {order.id} status updated to {order.get_status_display()}.")
+                return redirect('dashboard')
         else:
             messages.error(request, "Failed to update delivery status.")
     else:
@@ -511,11 +650,17 @@ def delivery_agent_update_daily_order_status(request, order_id):
 
 
 @login_required
+@read_from_replica
 def admin_pending_daily_orders_view(request):
     today = date.today()
-    pending_orders = DailyOrder.objects.filter(
-        order_date__gte=today
-    ).exclude(status__in=['delivered', 'cancelled']).order_by('order_date', 'meal_type', 'status')
+    pending_orders = sorted((
+        order for orders in fan_out(lambda alias: list(DailyOrder.objects.filter(
+            order_date__gte=today
+        ).exclude(status__in=['delivered', 'cancelled']).select_related(
+            'user', 'delivery_agent'
+        ).order_by('order_date', 'meal_type', 'status'))).values()
+        for order in orders
+    ), key=lambda order: (order.order_date, order.meal_type_id, order.status))
 
     context = {
         'pending_orders': pending_orders
@@ -524,6 +669,7 @@ def admin_pending_daily_orders_view(request):
 
 @login_required
 @user_passes_test(is_vendor)
+@shard_from_query
 def vendor_assign_delivery_agent(request, order_id):
     order = get_object_or_404(DailyOrder, id=order_id)
 
@@ -534,6 +680,7 @@ def vendor_assign_delivery_agent(request, order_id):
     # Given current simple model, we'll proceed.
 
     if request.method == 'POST':
+        old_status = order.status
         form = AdminAssignDeliveryAgentForm(request.POST, instance=order)
         if form.is_valid():
             order = form.save(commit=False)
@@ -545,7 +692,10 @@ def vendor_assign_delivery_agent(request, order_id):
             elif not order.delivery_agent:
                 order.assigned_time = None
             
-            order.save()
+            with tenant_atomic():
+                order.save()
+                record_status_change(order, old_status)
+            notify_status_change(order.id, order.status, order.database)
             messages.success(request, f"Delivery agent assigned for Daily Order {order.id}.")
             return redirect('vendor_orders_list')
         else:
@@ -561,7 +711,26 @@ def vendor_assign_delivery_agent(request, order_id):
     return render(request, 'food_delivery/admin_assign_delivery_agent_to_daily_order.html', context)
 
 
+def _dashboard_state(request):
+    user = request.user
+    today = date.today()
+    if user.user_type == 'resident':
+        return [
+            freshness(UserSubscription.objects.filter(user=user, end_date__gte=today)),
+            freshness(SubscriptionUsage.objects.filter(subscription__user=user, subscription__end_date__gte=today)),
+            freshness(DailyOrder.objects.filter(user=user, order_date__gte=today)),
+            freshness(Payment.objects.filter(user=user), 'payment_date'),
+        ]
+    if user.user_type == 'delivery_agent':
+        return [freshness(DailyOrder.objects.filter(delivery_agent=user, order_date__gte=today)
+                          .exclude(status__in=['delivered', 'cancelled']))]
+    # Vendor and admin dashboards also show rows without an updated_at
+    return None
+
+
 @login_required
+@read_from_replica
+@conditional_page(_dashboard_state)
 def dashboard_view(request):
     if request.user.user_type == 'admin' or request.user.is_staff:
         return redirect('custom_admin_dashboard')
@@ -570,7 +739,10 @@ def dashboard_view(request):
         context['user_subscriptions'] = UserSubscription.objects.filter(
             user=request.user,
             end_date__gte=date.today()
-        ).order_by('-start_date').prefetch_related('plan__meal_types_included')
+        ).order_by('-start_date').prefetch_related(
+            'plan__meal_types_included',
+            Prefetch('usage', queryset=SubscriptionUsage.objects.select_related('meal_type').order_by('meal_type__name')),
+        )
 
         context['upcoming_daily_orders'] = DailyOrder.objects.filter(
             user=request.user,
@@ -583,37 +755,46 @@ def dashboard_view(request):
         context['vendor_menu_items'] = VendorMenuItem.objects.filter(vendor=request.user, is_available_globally=True).order_by('meal_type', 'name')
         
         context['vendor_daily_menus'] = DailyMenu.objects.filter(vendor=request.user, menu_date__gte=date.today()).order_by('menu_date', 'meal_type')
-        context['vendor_daily_orders_to_prepare'] = DailyOrder.objects.filter(
-            order_date__gte=date.today(),
-            status__in=['submitted', 'prepared'],
-            items__menu_item__vendor=request.user
-        ).distinct().order_by('order_date', 'meal_type').prefetch_related('items__menu_item')
-        
+        context['vendor_daily_orders_to_prepare'] = sorted((
+            order for orders in fan_out(lambda alias: list(DailyOrder.objects.filter(
+                order_date__gte=date.today(),
+                status__in=['submitted', 'prepared'],
+                items__menu_item__vendor=request.user
+            ).distinct().order_by('order_date', 'meal_type').prefetch_related('items__menu_item'))).values()
+            for order in orders
+        ), key=lambda order: (order.order_date, order.meal_type_id))
+
+        context['forecast_day'] = date.today() + timedelta(days=1)
+        context['vendor_forecasts'] = DemandForecast.objects.filter(
+            vendor=request.user, day=context['forecast_day']
+        ).select_related('menu_item', 'meal_type').order_by('meal_type__name', '-quantity')
+
     elif request.user.user_type == 'delivery_agent':
-        context['assigned_daily_orders'] = DailyOrder.objects.filter(
-            delivery_agent=request.user,
-            order_date__gte=date.today()
-        ).exclude(status__in=['delivered', 'cancelled']).order_by('order_date', 'status').prefetch_related('items__menu_item')
+        context['assigned_daily_orders'] = sorted((
+            order for orders in fan_out(lambda alias: list(DailyOrder.objects.filter(
+                delivery_agent=request.user,
+                order_date__gte=date.today()
+            ).exclude(status__in=['delivered', 'cancelled']).order_by('order_date', 'status').prefetch_related('items__menu_item'))).values()
+            for order in orders
+        ), key=lambda order: (order.order_date, order.status))
 
     elif request.user.user_type == 'warden':
         return redirect('warden_dashboard')
 
     elif request.user.user_type == 'admin':
-        context['total_active_subscriptions'] = UserSubscription.objects.filter(status='active', end_date__gte=date.today()).count()
-        context['pending_daily_orders_today'] = DailyOrder.objects.filter(order_date=date.today(), status__in=['submitted', 'prepared']).count()
-        context['vendors_count'] = CustomUser.objects.filter(user_type='vendor').count()
-        context['delivery_agents_count'] = CustomUser.objects.filter(user_type='delivery_agent').count()
+        context.update(_admin_counts())
 
     return render(request, 'food_delivery/dashboard.html', context)
 
 @login_required
 @user_passes_test(is_warden)
+@read_from_replica
 def warden_dashboard(request):
     # Pending user approvals
     pending_users = CustomUser.objects.filter(is_approved=False, warden=request.user).exclude(is_superuser=True).exclude(user_type='admin')
     
     # Recent bulk orders
-    recent_bulk_orders = BulkOrder.objects.filter(warden=request.user).order_by('-ordered_at')[:5]
+    recent_bulk_orders = list(BulkOrder.objects.filter(warden=request.user).select_related('meal_type').order_by('-ordered_at')[:5])
 
     context = {
         'pending_users': pending_users,
@@ -622,6 +803,20 @@ def warden_dashboard(request):
     }
     return render(request, 'food_delivery/warden_dashboard.html', context)
 
+@login_required
+@user_passes_test(is_warden)
+@read_from_replica
+def warden_stats(request):
+    try:
+        weeks = int(request.GET.get('weeks', DEFAULT_WEEKS))
+    except ValueError:
+        weeks = DEFAULT_WEEKS
+    weeks = min(max(weeks, 1), MAX_WEEKS)
+    return render(request, 'food_delivery/warden_stats.html', {
+        'stats': hostel_stats(request.user, weeks),
+        'week_choices': [1, 2, 4, 8, 12],
+    })
+
 @login_required
 @user_passes_test(is_warden)
 def warden_manage_users(request):
@@ -690,17 +885,110 @@ def warden_bulk_order(request):
 
 
 @login_required
+@user_passes_test(is_warden)
+def warden_confirm_bulk_delivery(request, order_id):
+    # The warden receives a bulk order, so they are the one who marks it delivered;
+    # the stamp is what puts it in the vendor's next settlement
+    if request.method == 'POST':
+        delivered = BulkOrder.objects.filter(
+            id=order_id, warden=request.user
+        ).exclude(status__in=['delivered', 'cancelled']).update(status='delivered', delivered_time=timezone.now())
+        if delivered:
+            messages.success(request, "Bulk order marked as delivered.")
+        else:
+            messages.error(request, "This bulk order can't be marked as delivered.")
+    return redirect('warden_dashboard')
 
-def custom_admin_dashboard(request):
-    context = {
-        'total_active_subscriptions': UserSubscription.objects.filter(status='active', end_date__gte=date.today()).count(),
-        'pending_daily_orders_today': DailyOrder.objects.filter(order_date=date.today(), status__in=['submitted', 'prepared']).count(),
+
+def _admin_counts():
+    # Subscriptions and orders are counted in every hostel database, users in default
+    return {
+        'total_active_subscriptions': sum(gather(lambda: UserSubscription.objects.live().count())),
+        'pending_daily_orders_today': sum(gather(lambda: DailyOrder.objects.filter(
+            order_date=date.today(), status__in=['submitted', 'prepared']).count())),
         'vendors_count': CustomUser.objects.filter(user_type='vendor').count(),
         'delivery_agents_count': CustomUser.objects.filter(user_type='delivery_agent').count(),
-        'recent_orders': DailyOrder.objects.order_by('-ordered_at')[:5] # Get 5 most recent orders
     }
+
+@login_required
+@read_from_replica
+def custom_admin_dashboard(request):
+    context = _admin_counts()
+    # The 5 most recent orders of each database, then the 5 most recent of those
+    context['recent_orders'] = sorted(
+        (order for orders in gather(lambda: list(DailyOrder.objects.select_related('user').order_by('-ordered_at')[:5]))
+         for order in orders),
+        key=lambda order: order.ordered_at, reverse=True
+    )[:5]
     return render(request, 'food_delivery/custom_admin/dashboard.html', context)
 
+def _with_bar_widths(rows, key):
+    # Scale each row against the largest value so templates can draw CSS bars
+    peak = max((row[key] or 0 for row in rows), default=0)
+    for row in rows:
+        row['bar_width'] = round((row[key] or 0) * 100 / peak) if peak else 0
+    return rows
+
+@login_required
+@user_passes_test(is_admin)
+@read_from_replica
+def custom_admin_analytics(request):
+    # Charts read only the rollup tables maintained by `manage.py refresh_rollups`
+    today = date.today()
+    since = today - timedelta(days=29)
+    month_start = today.replace(day=1)
+    order_rollups = DailyOrderRollup.objects.exclude(status='cancelled')
+
+    # Rows without a vendor count each order once; vendor rows only split it up
+    orders_per_day = order_rollups.filter(vendor__isnull=True, day__gte=since).values('day').annotate(
+        orders=Sum('order_count'), revenue=Sum('revenue')
+    ).order_by('day')
+    revenue_per_vendor = order_rollups.filter(vendor__isnull=False, day__gte=month_start).values('vendor__username').annotate(
+        orders=Sum('order_count'), revenue=Sum('revenue')
+    ).order_by('-revenue')
+    orders_per_meal_type = order_rollups.filter(vendor__isnull=True, day__gte=month_start).values('meal_type__name').annotate(
+        orders=Sum('order_count'), items=Sum('item_quantity')
+    ).order_by('meal_type__name')
+    revenue_per_plan = PaymentRollup.objects.filter(day__gte=month_start).values('plan__name').annotate(
+        payments=Sum('payment_count'), amount=Sum('amount')
+    ).order_by('-amount')
+
+    context = {
+        'since': since,
+        'month_start': month_start,
+        'orders_per_day': _with_bar_widths(list(orders_per_day), 'orders'),
+        'revenue_per_vendor': _with_bar_widths(list(revenue_per_vendor), 'revenue'),
+        'orders_per_meal_type': _with_bar_widths(list(orders_per_meal_type), 'orders'),
+        'revenue_per_plan': _with_bar_widths(list(revenue_per_plan), 'amount'),
+        'last_refreshed': RollupCheckpoint.objects.filter(name=ORDER_CHECKPOINT).values_list('updated_at', flat=True).first(),
+    }
+    return render(request, 'food_delivery/custom_admin/analytics.html', context)
+
+SETTLEMENT_BATCHES_SHOWN = 12
+
+@login_required
+@user_passes_test(is_admin)
+@read_from_replica
+def custom_admin_settlements(request):
+    # Written by `manage.py settle_vendors`; batches and their settlements never change
+    batches = SettlementBatch.objects.prefetch_related(
+        Prefetch('settlements', queryset=VendorSettlement.objects.select_related('vendor').order_by('-amount'))
+    )[:SETTLEMENT_BATCHES_SHOWN]
+    return render(request, 'food_delivery/custom_admin/settlements.html', {'batches': batches})
+
+@login_required
+def settlement_export(request, pk):
+    """CSV of the order items behind one vendor settlement, streamed as it is
+    read. Open to admins and to the vendor being paid."""
+    settlement = get_object_or_404(VendorSettlement.objects.select_related('batch'), pk=pk)
+    if not (is_admin(request.user) or settlement.vendor_id == request.user.id):
+        raise Http404("No VendorSettlement matches the given query.")
+
+    response = StreamingHttpResponse(export_lines(settlement), content_type='text/csv')
+    filename = f'settlement-{settlement.vendor_id}-{settlement.batch.period_end:%Y%m%d%H%M}.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 @login_required
 @user_passes_test(is_admin)
 def custom_admin_manage_users(request):
@@ -769,7 +1057,7 @@ def custom_admin_manage_wardens(request):
 @login_required
 
 def custom_admin_manage_plans(request):
-    plans = SubscriptionPlan.objects.all().order_by('name')
+    plans = SubscriptionPlan.objects.prefetch_related('meal_types_included').order_by('name')
     context = {
         'plans': plans
     }
@@ -849,13 +1137,67 @@ def admin_meal_type_list_create(request):
     })
 
 
+@login_required
+@user_passes_test(is_vendor)
+@read_from_replica
+def vendor_production_sheet(request):
+    """Quantities to cook per meal slot, read from the demand snapshots frozen
+    at each slot's cutoff rather than aggregated from live orders. Meal types
+    without a cutoff are never frozen, so theirs come from the live orders."""
+    try:
+        day = date.fromisoformat(request.GET['date']) if request.GET.get('date') else date.today()
+    except ValueError:
+        raise Http404("Invalid date.")
+
+    lines = DemandSnapshotItem.objects.filter(
+        vendor=request.user, snapshot__day=day
+    ).select_related('snapshot__meal_type', 'menu_item').order_by('menu_item__name')
+    slots = {}
+    for line in lines:
+        slot = slots.setdefault(line.snapshot.meal_type.name, {'frozen_at': line.snapshot.frozen_at, 'lines': []})
+        slot['lines'].append({'name': line.menu_item.name, 'order_count': line.order_count, 'quantity': line.quantity})
+
+    open_meals = {meal_type.id: meal_type.name for meal_type in meal_types() if meal_type.order_cutoff is None}
+    demand = live_demand(day, list(open_meals), vendor_id=request.user.id) if open_meals else {}
+    names = dict(VendorMenuItem.objects.filter(
+        id__in=[menu_item_id for items in demand.values() for menu_item_id in items]
+    ).values_list('id', 'name')) if demand else {}
+    for meal_type_id, items in demand.items():
+        slots[open_meals[meal_type_id]] = {'frozen_at': None, 'lines': sorted((
+            {'name': names[menu_item_id], 'order_count': item['order_count'], 'quantity': item['quantity']}
+            for menu_item_id, item in items.items()
+        ), key=lambda line: line['name'])}
+    slots = dict(sorted(slots.items()))
+
+    return render(request, 'food_delivery/vendor_production_sheet.html', {
+        'day': day,
+        'slots': slots,
+        'previous_day': day - timedelta(days=1),
+        'next_day': day + timedelta(days=1),
+    })
+
+
+@login_required
+@user_passes_test(is_vendor)
+@read_from_replica
+def vendor_settlements(request):
+    settlements = VendorSettlement.objects.filter(
+        vendor=request.user
+    ).select_related('batch').order_by('-batch__period_end')[:SETTLEMENT_BATCHES_SHOWN]
+    return render(request, 'food_delivery/vendor_settlements.html', {'settlements': settlements})
+
+
 @login_required
 @user_passes_test(is_vendor)
 def vendor_orders_list(request):
 
-    orders = DailyOrder.objects.filter(
-        items__menu_item__vendor=request.user
-    ).select_related('user', 'meal_type').distinct()
+    # Every hostel's orders; each keeps its database for the links to it
+    orders = [
+        order for orders in fan_out(lambda alias: list(DailyOrder.objects.filter(
+            items__menu_item__vendor=request.user
+        ).select_related('user').distinct())).values()
+        for order in orders
+    ]
 
     return render(
         request,
@@ -864,13 +1206,49 @@ def vendor_orders_list(request):
     )
 
 
+# --- Delivery agent views ---
+# These are async so that a burst of agents at dispatch time doesn't pin one worker
+# per request under ASGI. They use the async ORM, and materialise querysets before
+# rendering, since templates can't run queries from an async context. Two calls stay
+# behind sync_to_async: fan_out, whose reads across every hostel database run on a
+# thread pool, and set_status, whose transaction (not available to the async ORM)
+# keeps the usage ledger in step with a delivery. An order is acted on in the
+# database named by ?db=.
+
+AGENT_OPEN_STATUSES = ['out_for_delivery', 'prepared', 'submitted', 'reached_location']
+
+async def _aget_agent(request):
+    # Resolve the user once and replace the lazy request.user, which would
+    # otherwise hit the database synchronously when templates touch it
+    request.user = await request.auser()
+    return request.user
+
+def _agent_open_order(agent, order_id):
+    # Only the agent's own order, and only while it is open: a delivered or cancelled
+    # order is no longer theirs to move, even if the page they act from is stale
+    return DailyOrder.objects.filter(id=order_id, delivery_agent=agent, status__in=AGENT_OPEN_STATUSES)
+
+async def _aupdate_agent_order(request, order_id, **changes):
+    # Moves between open statuses leave the usage ledger as it is, so they are
+    # one conditional UPDATE through the async ORM
+    agent = await _aget_agent(request)
+    if not await _agent_open_order(agent, order_id).aupdate(**changes):
+        raise Http404("No DailyOrder matches the given query.")
+    notify_status_change(order_id, changes['status'])
+
+def _agent_orders_state(request):
+    return gather(lambda: freshness(DailyOrder.objects.filter(delivery_agent=request.user, status__in=AGENT_OPEN_STATUSES)))
+
 @login_required
 @user_passes_test(lambda u: u.user_type == 'delivery_agent')
-def delivery_agent_orders(request):
-    orders = DailyOrder.objects.filter(
-        delivery_agent=request.user,
-        status__in=['out_for_delivery', 'prepared', 'submitted', 'reached_location']
-    ).select_related('user', 'meal_type')
+@conditional_page(_agent_orders_state)
+async def delivery_agent_orders(request):
+    agent = await _aget_agent(request)
+    by_database = await sync_to_async(fan_out)(lambda alias: list(DailyOrder.objects.filter(
+        delivery_agent=agent,
+        status__in=AGENT_OPEN_STATUSES
+    ).select_related('user', 'meal_type')))
+    orders = [order for orders in by_database.values() for order in orders]
 
     return render(
         request,
@@ -881,73 +1259,68 @@ def delivery_agent_orders(request):
 
 @login_required
 @user_passes_test(lambda u: u.user_type == 'delivery_agent')
-def delivery_accept_order(request, order_id):
-    order = get_object_or_404(
-        DailyOrder,
-        id=order_id,
-        delivery_agent=request.user
+@shard_from_query
+async def delivery_accept_order(request, order_id):
+    await _aupdate_agent_order(
+        request, order_id,
+        status='out_for_delivery',
+        assigned_time=timezone.now()
     )
 
-    order.status = 'out_for_delivery'
-    order.assigned_time = timezone.now()
-    order.save()
-
     messages.success(request, "Order accepted. You are now out for delivery.")
     return redirect('delivery_agent_orders')
 
 
 @login_required
 @user_passes_test(lambda u: u.user_type == 'delivery_agent')
-def delivery_reject_order(request, order_id):
-    order = get_object_or_404(
-        DailyOrder,
-        id=order_id,
-        delivery_agent=request.user
+@shard_from_query
+async def delivery_reject_order(request, order_id):
+    await _aupdate_agent_order(
+        request, order_id,
+        delivery_agent=None,
+        status='prepared'
     )
 
-    order.delivery_agent = None
-    order.status = 'prepared'
-    order.save()
-
     messages.warning(request, "Order rejected.")
     return redirect('delivery_agent_orders')
 
 
 @login_required
 @user_passes_test(lambda u: u.user_type == 'delivery_agent')
-def delivery_reached_location(request, order_id):
-    order = get_object_or_404(
-        DailyOrder,
-        id=order_id,
-        delivery_agent=request.user
+@shard_from_query
+async def delivery_reached_location(request, order_id):
+    await _aupdate_agent_order(
+        request, order_id,
+        status='reached_location'
     )
 
-    order.status = 'reached_location'
-    order.save()
-
     messages.info(request, "You have reached the location.")
     return redirect('delivery_agent_orders')
 
 
 @login_required
 @user_passes_test(lambda u: u.user_type == 'delivery_agent')
-def delivery_complete_order(request, order_id):
-    order = get_object_or_404(
-        DailyOrder,
-        id=order_id,
-        delivery_agent=request.user
-    )
-
-    order.status = 'delivered'
-    order.delivered_time = timezone.now()
-    order.save()
+@shard_from_query
+async def delivery_complete_order(request, order_id):
+    agent = await _aget_agent(request)
+    # A delivery counts in the usage ledger, so it goes through set_status
+    if not await sync_to_async(set_status)(_agent_open_order(agent, order_id), 'delivered'):
+        raise Http404("No DailyOrder matches the given query.")
+    notify_status_change(order_id, 'delivered')
+    await aforget_history_total('delivery_agent', agent.id)
 
     messages.success(request, "Delivery completed.")
     return redirect('delivery_agent_orders')
 
 
+def _tracking_state(request, order_id):
+    state = freshness(DailyOrder.objects.filter(id=order_id, user=request.user))
+    # Not the user's order: let the view answer with its 404
+    return [state] if state[1] else None
+
 @login_required
 @user_passes_test(lambda u: u.user_type == 'resident')
+@conditional_page(_tracking_state)
 def resident_live_delivery_tracking(request, order_id):
     order = get_object_or_404(
         DailyOrder,
@@ -964,29 +1337,28 @@ def resident_live_delivery_tracking(request, order_id):
 
 @login_required
 @user_passes_test(lambda u: u.user_type == 'resident')
+@read_from_replica
 def resident_delivery_history(request):
-    orders = DailyOrder.objects.filter(
-        user=request.user,
-        status='delivered'
-    ).order_by('-delivered_time')
+    orders, next_cursor, total = delivery_history_page('user', request.user, request.GET.get('before'))
 
     return render(
         request,
         'food_delivery/delivery_history.html',
-        {'orders': orders}
+        {'orders': orders, 'next_cursor': next_cursor, 'total': total}
     )
 
 
 @login_required
 @user_passes_test(lambda u: u.user_type == 'delivery_agent')
-def delivery_agent_history(request):
-    orders = DailyOrder.objects.filter(
-        delivery_agent=request.user,
-        status='delivered'
-    ).order_by('-delivered_time')
+@read_from_replica
+async def delivery_agent_history(request):
+    agent = await _aget_agent(request)
+    orders, next_cursor, total = await sync_to_async(delivery_history_page)(
+        'delivery_agent', agent, request.GET.get('before')
+    )
 
     return render(
         request,
         'food_delivery/delivery_history2.html',
-        {'orders': orders}
+        {'orders': orders, 'next_cursor': next_cursor, 'total': total}
     )
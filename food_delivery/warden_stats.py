@@ -0,0 +1,117 @@
+# food_delivery/warden_stats.py
+"""Meal consumption statistics for a warden's hostel.
+
+Everything comes from one aggregate query over the residents' DailyOrders,
+grouped by resident, meal type and week, plus one query for the resident list.
+Per-resident totals and per-meal headcounts are folded from those rows.
+
+Results are cached per warden. A cached entry is reused only while the
+hostel's orders in its weeks still have the same count and latest
+``updated_at`` (one aggregate query) and the hostel has the same residents.
+So an edit that keeps ``updated_at`` current, an order deleted or archived,
+and a resident joining, leaving or moving to another warden all invalidate it
+without having to know about this cache.
+"""
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+from .models import CustomUser, DailyOrder
+
+DEFAULT_WEEKS = 4
+# Finished orders are archived after 90 days; stay inside the live table
+MAX_WEEKS = 12
+STATS_CACHE_SECONDS = 3600
+
+CONSUMED = Q(status='delivered')
+CANCELLED = Q(status='cancelled')
+
+
+def _cache_key(warden_id, weeks):
+    return f'warden_stats:{warden_id}:{weeks}'
+
+
+def _since(today, weeks):
+    # Whole weeks, Monday to Sunday, ending with the current one
+    return today - timedelta(days=today.weekday() + 7 * (weeks - 1))
+
+
+def _orders_version(warden, since):
+    """(order count, latest updated_at) of the hostel's orders from ``since`` on."""
+    version = DailyOrder.objects.filter(user__warden=warden, order_date__gte=since).aggregate(
+        count=Count('id'), changed=Max('updated_at'),
+    )
+    return version['count'], version['changed']
+
+
+def hostel_stats(warden, weeks=DEFAULT_WEEKS):
+    """Stats for the ``weeks`` weeks up to today, from cache when still valid."""
+    today = date.today()
+    since = _since(today, weeks)
+    key = _cache_key(warden.id, weeks)
+    cached = cache.get(key)
+    residents = list(CustomUser.objects.filter(
+        warden=warden, user_type='resident'
+    ).values_list('id', 'username').order_by('id'))
+    version = _orders_version(warden, since)
+    resident_ids = [resident_id for resident_id, _ in residents]
+    if cached is not None and cached['today'] == today:
+        if version == cached['orders_version'] and resident_ids == cached['resident_ids']:
+            return cached
+
+    stats = compute_hostel_stats(warden, residents, today, weeks)
+    stats.update(today=today, computed_at=timezone.now(), orders_version=version, resident_ids=resident_ids)
+    cache.set(key, stats, STATS_CACHE_SECONDS)
+    return stats
+
+
+def compute_hostel_stats(warden, residents, today, weeks):
+    """Stats for the hostel's ``residents`` ([(id, username)])."""
+    since = _since(today, weeks)
+    # A meal is missed when its day has passed and it was neither delivered nor cancelled
+    missed = Q(order_date__lt=today) & ~CONSUMED & ~CANCELLED
+    rows = DailyOrder.objects.filter(
+        user__warden=warden, order_date__gte=since, order_date__lte=today
+    ).values(
+        'user_id', 'meal_type__name', week=TruncWeek('order_date')
+    ).annotate(
+        consumed=Count('id', filter=CONSUMED),
+        missed=Count('id', filter=missed),
+        cancelled=Count('id', filter=CANCELLED),
+    ).order_by()
+
+    by_resident = {
+        resident_id: {'username': username, 'consumed': 0, 'missed': 0, 'cancelled': 0, 'by_meal': {}}
+        for resident_id, username in residents
+    }
+    headcounts = {}
+    meal_types = set()
+    for row in rows:
+        meal = row['meal_type__name']
+        meal_types.add(meal)
+        resident = by_resident.get(row['user_id'])
+        if resident is not None:
+            for field in ('consumed', 'missed', 'cancelled'):
+                resident[field] += row[field]
+            resident['by_meal'][meal] = resident['by_meal'].get(meal, 0) + row['consumed']
+
+        week = row['week'].date() if hasattr(row['week'], 'date') else row['week']
+        slot = headcounts.setdefault((week, meal), {'week': week, 'meal_type': meal, 'residents': 0, 'meals': 0, 'missed': 0})
+        slot['residents'] += row['consumed'] > 0
+        slot['meals'] += row['consumed']
+        slot['missed'] += row['missed']
+
+    meal_types = sorted(meal_types)
+    resident_rows = sorted(by_resident.values(), key=lambda r: (-r['missed'], r['username']))
+    for resident in resident_rows:
+        resident['by_meal'] = [resident['by_meal'].get(meal, 0) for meal in meal_types]
+    return {
+        'since': since,
+        'weeks': weeks,
+        'meal_types': meal_types,
+        'residents': resident_rows,
+        'resident_count': len(resident_rows),
+        'headcounts': sorted(headcounts.values(), key=lambda h: (h['week'], h['meal_type']), reverse=True),
+        'totals': {field: sum(r[field] for r in resident_rows) for field in ('consumed', 'missed', 'cancelled')},
+    }
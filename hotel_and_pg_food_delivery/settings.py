@@ -44,10 +44,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'food_delivery.assets.AssetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'food_delivery.routers.ReplicaPinMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'food_delivery.sharding.TenantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -58,13 +61,20 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Compile each template (and every include) once per process. The
+            # development autoreloader still clears this cache when a template changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -82,6 +92,38 @@ DATABASES = {
     }
 }
 
+# Read replica for dashboards and history pages (see food_delivery/routers.py).
+# Locally it is a copy of db.sqlite3 refreshed with `manage.py sync_replica`; until the
+# first copy exists every read stays on default. Point 'replica' at a real replica in
+# production and nothing else needs to change.
+REPLICA_SQLITE_PATH = BASE_DIR / 'db.replica.sqlite3'
+if REPLICA_SQLITE_PATH.exists():
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': REPLICA_SQLITE_PATH,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Per-hostel shard files (see food_delivery/sharding.py). A hostel moved with
+# `manage.py create_shard --warden <id>` keeps its residents' subscriptions, orders
+# and payments in SHARD_DIR/tenant_<id>.sqlite3; shards created while the app runs
+# are picked up on first use.
+SHARD_DIR = BASE_DIR / 'shards'
+for shard_path in sorted(SHARD_DIR.glob('tenant_*.sqlite3')):
+    DATABASES[shard_path.stem] = {
+        'ENGINE': 'food_delivery.shard_backend',
+        'NAME': shard_path,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['food_delivery.sharding.TenantRouter', 'food_delivery.routers.ReplicaRouter']
+
+# Monthly statements written by `manage.py generate_statements`, one directory per month
+STATEMENT_DIR = BASE_DIR / 'statements'
+
+# Seconds a browser keeps reading from default after it wrote something
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -118,15 +160,90 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# collectstatic writes content-hashed copies plus .gz/.br variants to STATIC_ROOT;
+# food_delivery.assets.AssetMiddleware serves them (hashed names as immutable).
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'food_delivery.assets.CompressedManifestStaticFilesStorage'},
+}
+# Unhashed static names may change on the next deploy, so only cache them briefly
+STATIC_MAX_AGE = 60
+# Serve uploads from MEDIA_ROOT too, for deployments without a separate web server
+SERVE_MEDIA = True
+MEDIA_MAX_AGE = 86400
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Sessions
+# 'cached_db' answers session reads from the in-process cache below and only writes
+# django_session when the session actually changes; 'signed_cookies' keeps sessions out
+# of the database entirely; 'db' is Django's default. With several worker processes,
+# point the 'sessions' cache at a shared backend (e.g. Redis) so logouts are seen everywhere.
+SESSION_MODE = 'cached_db'
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_MODE]
+SESSION_CACHE_ALIAS = 'sessions'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+        'TIMEOUT': 300,
+    },
+}
+
+# Flash messages ride in a cookie instead of adding session writes to almost every view
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Resident notifications for order status changes (see food_delivery/notifications.py).
+# Events are batched per resident for NOTIFICATION_BATCH_SECONDS by a background thread;
+# an empty NOTIFICATION_BACKENDS turns notifications off.
+NOTIFICATION_BACKENDS = [
+    'food_delivery.notifications.EmailNotificationBackend',
+    'food_delivery.notifications.SMSNotificationBackend',
+]
+NOTIFICATION_BATCH_SECONDS = 5
+
+# Background tasks (see food_delivery/tasks.py), run by `manage.py run_worker`.
+# Recurring entries are queued at most once per `every` seconds across all workers.
+TASK_SCHEDULE = {
+    'expire-subscriptions': {'task': 'food_delivery.tasks.run_command', 'args': ['expire_subscriptions'], 'every': 300},
+    'refresh-rollups': {'task': 'food_delivery.tasks.run_command', 'args': ['refresh_rollups'], 'every': 600},
+    'freeze-demand': {'task': 'food_delivery.tasks.run_command', 'args': ['freeze_demand'], 'every': 60},
+    'forecast-demand': {'task': 'food_delivery.tasks.run_command', 'args': ['forecast_demand'], 'every': 21600},
+    'reconcile-usage': {'task': 'food_delivery.tasks.run_command', 'args': ['reconcile_usage'], 'every': 86400},
+    'settle-vendors': {'task': 'food_delivery.tasks.run_command', 'args': ['settle_vendors'], 'every': 86400},
+    'purge-finished-tasks': {'task': 'food_delivery.tasks.purge_finished_tasks', 'every': 86400},
+}
+
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'FoodieExpress <no-reply@foodieexpress.local>'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'food_delivery': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'home'